@@ -1,8 +1,20 @@
 import random
-import uuid
 import numpy as np
 from collections import defaultdict
 from generator.data_collector import *
+from generator.problem import ProblemInstance
+from generator.solution import make_session, sessions_from_records, EncodedSolution
+from generator.warm_start import warm_start_sessions, seed_construction, WARM_SHARE
+from generator.conflict_graph import conflict_graph, DsaturOrder
+from generator.occupancy import Occupancy
+from generator.repair import session_templates
+from generator.constraints import constraint_tables
+from generator.evaluation.engine import evaluate_compact
+from generator.evaluation.cache import FitnessCache
+from generator.budget import Budget
+from generator.stopping import EarlyStopping
+from generator.evaluation.delta import DeltaEvaluator, F_ACTIVITY, F_DAY, F_START, F_LENGTH, F_ROOM, \
+    F_TEACHER, F_DURATION, F_STUDENTS, F_SPLIT, F_SUBGROUPS
 
 # BCO Parameters
 NUM_EMPLOYED_BEES = 30
@@ -11,1132 +23,714 @@ NUM_ITERATIONS = 10
 LIMIT = 5           # Max number of trials before abandoning a food source
 SCOUT_PERCENTAGE = 0.1
 MAX_TRIALS = 5
+INSERT_SAMPLES = 20  # placements compared by insert_unscheduled
 STUDENTS_PER_SUBGROUP = 40  
 
-# Global data holders (populated by get_data)
-days = []
-facilities = []
-modules = []
-periods = []
-students = []
-teachers = []
-years = []
-activities = []
-constraints = []
-
-# Add tracking for subgroup schedules
-subgroup_schedule = defaultdict(lambda: defaultdict(set))  # subgroup_schedule[subgroup_id][day_id] = {period_indices}
-
-def get_data():
+class BeeColonySolver:
     """
-    Loads data from the database (or any source) into the global lists.
+    Bee Colony Optimization for timetable scheduling.
+    Each instance owns its data and food sources, so several solvers can run at once.
     """
-    global days, facilities, modules, periods, students, teachers, years, activities, constraints
-    days = get_days()
-    facilities = get_spaces()
-    modules = get_modules()
-    periods = get_periods()
-    students = get_students()
-    teachers = get_teachers()
-    years = get_years()
-    activities = get_activities()
-    constraints = get_constraints()
 
-    # Add index to periods if it doesn't exist
-    for idx, period in enumerate(periods):
-        if "index" not in period:
-            period["index"] = idx
+    def __init__(self, on_iteration=None):
+        # Called as on_iteration(iteration, best_score) after every iteration
+        self.on_iteration = on_iteration
 
-def get_constraints():
-    """
-    Example function to fetch constraints from DB.
-    Adjust as needed for your actual data structure.
-    """
-    # For illustration purposes only:
-    constraints = list(db["constraints"].find())
-    return constraints
+        # Data holders (populated by get_data)
+        self.days = []
+        self.facilities = []
+        self.modules = []
+        self.periods = []
+        self.student_counts = {}
+        self.teachers = []
+        self.years = []
+        self.activities = []
+        self.constraints = []
+        self.problem = None  # ProblemInstance compiled from the lists above
+        self.conflict_graph = None  # activities that may not overlap (see generator.conflict_graph)
 
-def is_subgroup_available(subgroup_ids, day_id, period_indices):
-    """
-    Check if all subgroups are available for the given day and periods.
-    Returns True if all subgroups are available, False otherwise.
-    """
-    for sg in subgroup_ids:
-        for p_idx in period_indices:
-            if p_idx in subgroup_schedule[sg][day_id]:
-                return False
-    return True
+        # Colony state
+        self.food_sources = []         # DeltaEvaluator holding each food source's timetable
+        self.food_source_fitness = []  # Fitness of each food source
+        self.food_source_trials = []   # Trials (number of times no improvement) for each source
+        self.best_solution = None      # Encoded copy of the best timetable found
+        self.best_fitness = float('inf')
+        self.skipped_moves = 0         # Neighbor moves rejected without scoring (no-ops)
+        self.warm_start = None         # Encoded sessions kept from a stored timetable
+        
+        self.cache = FitnessCache()  # full evaluations of the current run
+        self.budget = Budget()  # time / evaluation limits of the current run
+        self.stats = {}  # run statistics, filled in by run()
 
-def update_subgroup_schedules(subgroup_ids, day_id, period_indices):
-    """
-    Mark the periods as scheduled for all subgroups.
-    """
-    for sg in subgroup_ids:
-        for p_idx in period_indices:
-            subgroup_schedule[sg][day_id].add(p_idx)
+    def get_data(self, snapshot=None):
+        """
+        Loads data from the database (or any source) into this solver.
+        A snapshot from load_snapshot() can be passed instead; its documents
+        are modified in place, so each solver needs its own copy.
+        """
+        if snapshot is None:
+            snapshot = load_snapshot()
+        self.days = snapshot["days"]
+        self.facilities = snapshot["spaces"]
+        self.modules = snapshot["modules"]
+        self.periods = snapshot["periods"]
+        self.student_counts = snapshot["student_counts"]
+        self.teachers = snapshot["teachers"]
+        self.years = snapshot["years"]
+        self.activities = snapshot["activities"]
+        self.constraints = snapshot["constraints"]
 
-def evaluate_solution(solution):
-    """
-    Evaluate the solution's quality in terms of constraints.
-    
-    Hard constraints (multiplied by 1000) include:
-      - Room conflicts, teacher conflicts, interval conflicts,
-        teacher availability conflicts, room capacity conflicts,
-        unscheduled activities, duplicate activities, room type mismatches.
-      - Additional hard penalties:
-          TC-004: Teacher maximum consecutive periods
-          TC-009: Maximum teaching hours per day
-          TC-011: Room availability
-          TC-014: Activity duration check
-          
-    Soft constraints include:
-      - Violations on teacher working days (max/min days) and split activities penalty.
-      - Additional soft penalties:
-          TC-003: Teacher preferred time
-          TC-005: Student set preferred time
-          TC-008: Minimum gap between classes for teacher
-          TC-010: Student set maximum classes per day
-          TC-012: Teacher subject preference
-    """
-    # Base conflict checks (as before)
-    room_conflicts = 0
-    teacher_conflicts = 0
-    interval_conflicts = 0
-    teacher_availability_conflicts = 0
-    capacity_conflicts = 0
-    duplicate_activities = 0
-    room_type_mismatches = 0
-    split_activities_penalty = 0
-    
-    max_days_violations = 0
-    min_days_violations = 0
-    
-    scheduled_map = defaultdict(list)  # (day_id, period_id) -> list of scheduled items
-    teacher_working_days = defaultdict(set)
-    scheduled_activities_count = defaultdict(int)
-    activity_scheduled_subgroups = defaultdict(set)
-    
-    subgroup_conflicts = 0
-    sg_schedule_check = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-    
-    for item in solution:
-        day_id = item["day"]["_id"]
-        teacher_id = item["teacher"]
-        activity_id = item["activity_id"]
-        subgroups = item["subgroup"]
-        # Use default type "Lecture" if not provided
-        activity_type = item.get("activity_type", "Lecture+Tutorial")
+        # Add index to periods if it doesn't exist
+        for idx, period in enumerate(self.periods):
+            if "index" not in period:
+                period["index"] = idx
+
+        self.problem = ProblemInstance(self.days, self.periods, self.facilities, self.activities,
+                                       teachers=self.teachers, student_counts=self.student_counts, modules=self.modules,
+                                       years=self.years, constraints=self.constraints)
+        self.conflict_graph = conflict_graph(self.problem)
+
+    def evaluate_solution(self, solution):
+        """
+        Evaluate the solution's quality in terms of constraints.
         
-        for sg in subgroups:
-            activity_scheduled_subgroups[activity_id].add(sg)
-        scheduled_activities_count[activity_id] += 1
+        Hard constraints (multiplied by 1000) include:
+          - Room conflicts, teacher conflicts, interval conflicts,
+            teacher availability conflicts, room capacity conflicts,
+            unscheduled activities, duplicate activities, room type mismatches.
+          - Additional hard penalties:
+              TC-004: Teacher maximum consecutive periods
+              TC-009: Maximum teaching hours per day
+              TC-011: Room availability
+              TC-014: Activity duration check
+              
+        Soft constraints include:
+          - Violations on teacher working days (max/min days) and split activities penalty.
+          - Additional soft penalties:
+              TC-003: Teacher preferred time
+              TC-005: Student set preferred time
+              TC-008: Minimum gap between classes for teacher
+              TC-010: Student set maximum classes per day
+              TC-012: Teacher subject preference
+        """
+        return self.cache.lookup(solution, self.score_solution)
+
+    def score_solution(self, solution):
+        """
+        Uncached evaluation of an encoded solution, cached by evaluate_solution.
+        """
+        return evaluate_compact(self.problem, solution, subgroup_conflicts=True)
+
+    def print_solution_stats(self, solution):
+        """
+        Print a summary of the solution's statistics and constraint violations.
+        """
+        (
+            hard_conflicts,
+            soft_violations,
+            room_conflicts,
+            teacher_conflicts,
+            interval_conflicts,
+            teacher_availability_conflicts,
+            capacity_conflicts,
+            unscheduled_activities,
+            duplicate_activities,
+            room_type_mismatches,
+            min_days_violations,
+            max_days_violations,
+            split_activities_penalty,
+            new_hard,
+            new_soft,
+            subgroup_conflicts  # Added to match the evaluate_solution return tuple
+        ) = self.evaluate_solution(solution)
         
-        # Check room capacity
-        student_count = item.get("student_count", 0)
-        capacity = item["room"]["capacity"]
-        if student_count > capacity:
-            capacity_conflicts += 1
+        print("\nSolution Statistics:")
+        print(f"  Total scheduled entries: {len(solution)}")
+        unique_activities = set(solution["activity"].tolist())
+        print(f"  Unique activities scheduled: {len(unique_activities)}")
+        print(f"  Activities not scheduled: {unscheduled_activities}")
+        print(f"  Activities scheduled multiple times: {duplicate_activities}")
+        print(f"  Hard constraint violations: {hard_conflicts}")
+        print(f"    - Room conflicts: {room_conflicts}")
+        print(f"    - Teacher conflicts: {teacher_conflicts}")
+        print(f"    - Interval conflicts: {interval_conflicts}")
+        print(f"    - Teacher availability conflicts: {teacher_availability_conflicts}")
+        print(f"    - Room capacity conflicts: {capacity_conflicts}")
+        print(f"    - Room type mismatches: {room_type_mismatches}")
+        print(f"    - Subgroup conflicts: {subgroup_conflicts}")
+        print(f"    - New hard penalties (TC-004, TC-009, TC-011, TC-014): {new_hard}")
+        print(f"  Soft constraint violations: {soft_violations}")
+        print(f"    - Max/min days violations: {max_days_violations + min_days_violations}")
+        print(f"    - Split activities penalty: {split_activities_penalty}")
+        print(f"    - New soft penalties (TC-003, TC-005, TC-008, TC-010, TC-012): {new_soft}")
         
-        # Check if room is suitable for the activity type
-        if not is_space_suitable(item["room"], activity_type, []):
-            room_type_mismatches += 1
+        split_labs = np.flatnonzero(solution["split"])
+        print(f"  Lab activities split into multiple sessions: {len(split_labs)}")
         
-        teacher_working_days[teacher_id].add(day_id)
+        activities_per_day = defaultdict(int)
+        for d_idx in solution["day"].tolist():
+            activities_per_day[d_idx] += 1
+        print("\nActivities per day:")
+        for d_idx, count in activities_per_day.items():
+            day_name = self.problem.days[d_idx].get("name", str(d_idx))
+            print(f"  {day_name}: {count}")
         
-        for p in item["period"]:
-            period_id = p["_id"]
-            period_index = p["index"]
-            if not get_teacher_availability(teacher_id, day_id, period_index):
-                teacher_availability_conflicts += 1
-            if p.get("is_interval", False):
-                interval_conflicts += 1
-            scheduled_map[(day_id, period_id)].append(item)
+        teacher_counts = defaultdict(int)
+        for t_idx in solution["teacher"].tolist():
+            teacher_counts[self.problem.teacher_ids[t_idx]] += 1
+        top_teachers = sorted(teacher_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        print("\nActivities per teacher (top 5):")
+        for t_id, count in top_teachers:
+            t_name = next((t["name"] for t in self.teachers if t["_id"] == t_id), str(t_id))
+            print(f"  {t_name}: {count}")
         
-        # Track subgroup schedules for conflict checking
-        for sg in subgroups:
-            for p in item["period"]:
-                idx = p["index"]
-                sg_schedule_check[sg][day_id][idx].append(item)
-    
-    for act_id, count in scheduled_activities_count.items():
-        activity = next((a for a in activities if a["code"] == act_id), None)
-        if not activity:
-            continue
-        expected_count = 1
-        act_type = activity.get("type", "Lecture+Tutorial")
-        if act_type == "Lab":
-            subgroup_count = len(activity.get("subgroup_ids", []))
-            expected_count = subgroup_count
-            scheduled_subgroups = len(activity_scheduled_subgroups[act_id])
-            if scheduled_subgroups < subgroup_count:
-                split_activities_penalty += (subgroup_count - scheduled_subgroups) * 10
-        elif act_type != "Lab" and count > expected_count:
-            duplicate_activities += (count - expected_count)
-    
-    all_codes = set(a["code"] for a in activities)
-    scheduled_codes = set(x["activity_id"] for x in solution)
-    unscheduled_activities = len(all_codes - scheduled_codes)
-    
-    for _, items_in_slot, in scheduled_map.items():
         room_usage = defaultdict(int)
-        teacher_usage = defaultdict(int)
-        for it in items_in_slot:
-            room_usage[it["room"]["code"]] += 1
-            teacher_usage[it["teacher"]] += 1
-        for c in room_usage.values():
-            if c > 1:
-                room_conflicts += (c - 1)
-        for c in teacher_usage.values():
-            if c > 1:
-                teacher_conflicts += (c - 1)
-    
-    # Check subgroup conflicts
-    for sg, days_dict in sg_schedule_check.items():
-        for day_id, periods_dict in days_dict.items():
-            for period_idx, items in periods_dict.items():
-                if len(items) > 1:
-                    subgroup_conflicts += len(items) - 1
-    
-    # Soft constraints: teacher working days vs. max/min days
-    max_days_constraint = next((c for c in constraints if c["code"] == "TC-002"), None)
-    min_days_constraint = next((c for c in constraints if c["code"] == "TC-003"), None)
-    
-    max_days_weight = max_days_constraint["weight"] if max_days_constraint else 5
-    min_days_weight = min_days_constraint["weight"] if min_days_constraint else 5
-    default_max_days = 5
-    default_min_days = 1
-    
-    for t_id, days_set in teacher_working_days.items():
-        days_worked = len(days_set)
-        teacher_max_days = max_days_constraint.get("details", {}).get(t_id, default_max_days) if max_days_constraint else default_max_days
-        teacher_min_days = min_days_constraint.get("details", {}).get(t_id, default_min_days) if min_days_constraint else default_min_days
-        
-        if days_worked > teacher_max_days:
-            max_days_violations += (days_worked - teacher_max_days) * max_days_weight
-        if days_worked < teacher_min_days:
-            min_days_violations += (teacher_min_days - days_worked) * min_days_weight
-    
-    base_hard = room_conflicts + teacher_conflicts + interval_conflicts + teacher_availability_conflicts + capacity_conflicts + unscheduled_activities + duplicate_activities + room_type_mismatches
-    # Additional Constraint Checks
-    new_hard_penalties = 0
-    new_soft_penalties = 0
-    
-    # Build helper dictionaries from constraints
-    teacher_pref = {}
-    tc003 = next((c for c in constraints if c["code"] == "TC-003"), None)
-    if tc003:
-        for tp in tc003["details"].get("teacher_preferred_times", []):
-            teacher_pref[tp["teacher_id"]] = tp["preferred_times"]
-    
-    teacher_max_consec = {}
-    tc004 = next((c for c in constraints if c["code"] == "TC-004"), None)
-    if tc004:
-        for m in tc004["details"].get("max_consecutive_periods", []):
-            teacher_max_consec[m["teacher_id"]] = m["max_periods"]
-    
-    student_pref = {}
-    tc005 = next((c for c in constraints if c["code"] == "TC-005"), None)
-    if tc005:
-        for sp in tc005["details"].get("student_preferred_times", []):
-            student_pref[sp["subgroup_id"]] = sp["preferred_times"]
-    
-    teacher_min_gap = {}
-    tc008 = next((c for c in constraints if c["code"] == "TC-008"), None)
-    if tc008:
-        for mg in tc008["details"].get("min_gap_between_classes", []):
-            teacher_min_gap[mg["teacher_id"]] = mg["min_gap"]
-    
-    teacher_max_hours = {}
-    tc009 = next((c for c in constraints if c["code"] == "TC-009"), None)
-    if tc009:
-        for mh in tc009["details"].get("max_teaching_hours_per_day", []):
-            teacher_max_hours[mh["teacher_id"]] = mh["max_hours"]
-    
-    student_max_classes = {}
-    tc010 = next((c for c in constraints if c["code"] == "TC-010"), None)
-    if tc010:
-        for sc in tc010["details"].get("max_classes_per_day", []):
-            student_max_classes[sc["subgroup_id"]] = sc["max_classes"]
-    
-    room_unavail = {}
-    tc011 = next((c for c in constraints if c["code"] == "TC-011"), None)
-    if tc011:
-        for ru in tc011["details"].get("room_unavailability", []):
-            room_unavail[ru["room_id"]] = ru["unavailable_times"]
-    
-    teacher_subject_pref = {}
-    tc012 = next((c for c in constraints if c["code"] == "TC-012"), None)
-    if tc012:
-        for tsp in tc012["details"].get("teacher_subject_preference", []):
-            teacher_subject_pref[tsp["teacher_id"]] = tsp["preferred_subjects"]
-    
-    # Build teacher blocks and day durations; count classes per subgroup per day
-    teacher_blocks = defaultdict(lambda: defaultdict(list))
-    teacher_day_durations = defaultdict(lambda: defaultdict(int))
-    subgroup_day_counts = defaultdict(lambda: defaultdict(int))
-    
-    for item in solution:
-        day_id = item["day"]["_id"]
-        teacher_id = item["teacher"]
-        period_indices = [p["index"] for p in item["period"]]
-        start = min(period_indices)
-        end = max(period_indices)
-        teacher_blocks[teacher_id][day_id].append((start, end))
-        teacher_day_durations[teacher_id][day_id] += item["duration"]
-        for sg in item["subgroup"]:
-            subgroup_day_counts[sg][day_id] += 1
+        for r_idx in solution["room"].tolist():
+            room_usage[self.problem.room_codes[r_idx]] += 1
+        top_rooms = sorted(room_usage.items(), key=lambda x: x[1], reverse=True)[:5]
+        print("\nRoom utilization (top 5):")
+        for r_code, count in top_rooms:
+            r = self.problem.room_by_code(r_code) or {}
+            r_name = r.get("name", r_code)
+            r_capacity = r.get("capacity", "Unknown")
+            print(f"  {r_name} (Capacity: {r_capacity}): {count} activities")
         
-        # TC-003: Teacher preferred time (soft)
-        if teacher_id in teacher_pref:
-            pref_found = False
-            for pref in teacher_pref[teacher_id]:
-                if pref["day_id"] == day_id:
-                    preferred_periods = pref.get("periods", [])
-                    if any(p["_id"] in preferred_periods for p in item["period"]):
-                        pref_found = True
-                        break
-            if not pref_found:
-                new_soft_penalties += tc003["weight"]
+        room_type_counts = defaultdict(int)
+        for a_idx in solution["activity"].tolist():
+            act_type = self.problem.activities[a_idx].get("type", "Lecture+Tutorial")
+            room_type_counts[act_type] += 1
+        print("\nActivity types distribution:")
+        for act_type, count in room_type_counts.items():
+            print(f"  {act_type}: {count}")
+
+    # CONSTRUCTING A NEW SOLUTION
+
+    def construct_solution(self, seed=None):
+        """
+        Constructs a single timetable solution using a greedy + random approach.
+        Used for both initial solutions and for scout bees' random exploration.
+        Updated to prevent subgroup overlaps.
+        Activities are placed most constrained first (DSATUR order, see generator.conflict_graph).
+        With a seed (warm-start sessions) only the activities it leaves out are placed.
+        """
+        records = []
         
-        # TC-012: Teacher subject preference (soft)
-        if teacher_id in teacher_subject_pref:
-            if item["subject"] not in teacher_subject_pref[teacher_id]:
-                new_soft_penalties += tc012["weight"]
+        # Busy periods of every teacher, room and subgroup per day
+        occupancy = Occupancy(self.problem)
+        if seed is not None:
+            records = seed_construction(self.problem, seed, occupancy)
         
-        # TC-014: Activity duration check (hard)
-        expected_duration = item["duration"]
-        actual_duration = len(item["period"])
-        if actual_duration != expected_duration:
-            new_hard_penalties += abs(actual_duration - expected_duration) * 10
+        unavailable = constraint_tables(self.problem).teacher_unavailable_mask
         
-        # TC-011: Room availability (hard)
-        room_code = item["room"]["code"]
-        if room_code in room_unavail:
-            for unavail in room_unavail[room_code]:
-                if unavail["day_id"] == day_id:
-                    unavailable_periods = unavail.get("periods", [])
-                    if any(p["_id"] in unavailable_periods for p in item["period"]):
-                        new_hard_penalties += tc011["weight"]
+        # Most constrained activities first: DSATUR order over the conflict graph
+        order = DsaturOrder(self.problem, self.conflict_graph, records)
         
-        # TC-005: Student set preferred time (soft)
-        for sg in item["subgroup"]:
-            if sg in student_pref:
-                pref_found = False
-                for pref in student_pref[sg]:
-                    if pref["day_id"] == day_id:
-                        preferred_periods = pref.get("periods", [])
-                        if any(p["_id"] in preferred_periods for p in item["period"]):
-                            pref_found = True
+        for a_idx in order:
+            activity = self.problem.activities[a_idx]
+            
+            subgroup_ids = activity.get("subgroup_ids", [])
+            sg_indices = [self.problem.subgroup_index[sg] for sg in subgroup_ids]
+            subgroup_count = len(subgroup_ids)
+            total_students = subgroup_count * STUDENTS_PER_SUBGROUP
+            activity_type = activity.get("type", "Lecture+Tutorial")
+            
+            candidates = self.problem.activity_candidate_rooms[a_idx]
+            valid_rooms = [self.problem.rooms[r] for r in candidates]
+            if not valid_rooms:
+                continue
+            
+            teacher_ids = activity.get("teacher_ids", [])
+            random.shuffle(teacher_ids)
+            
+            need_to_split = activity_type == "Lab" and len(self.problem.activity_fitting_rooms[a_idx]) < len(candidates)
+            
+            if not need_to_split:
+                suitable_rooms = [self.problem.rooms[r] for r in self.problem.activity_fitting_rooms[a_idx]]
+                if not suitable_rooms:
+                    continue
+                activity_scheduled = False
+                for teacher_id in teacher_ids:
+                    if activity_scheduled:
+                        break
+                    shuffled_days = random.sample(self.days, len(self.days))
+                    for day in shuffled_days:
+                        if activity_scheduled:
                             break
-                if not pref_found:
-                    new_soft_penalties += tc005["weight"]
-    
-    # TC-004: Teacher max consecutive periods (hard)
-    for teacher_id, days_blocks in teacher_blocks.items():
-        if teacher_id in teacher_max_consec:
-            allowed = teacher_max_consec[teacher_id]
-            for day_id, blocks in days_blocks.items():
-                for (start, end) in blocks:
-                    block_length = end - start + 1
-                    if block_length > allowed:
-                        new_hard_penalties += (block_length - allowed) * tc004["weight"]
-    
-    # TC-008: Minimum gap between classes for teacher (soft)
-    for teacher_id, day_blocks in teacher_blocks.items():
-        if teacher_id in teacher_min_gap:
-            min_gap = teacher_min_gap[teacher_id]
-            for day_id, blocks in day_blocks.items():
-                blocks_sorted = sorted(blocks, key=lambda b: b[0])
-                for i in range(len(blocks_sorted) - 1):
-                    gap = blocks_sorted[i+1][0] - blocks_sorted[i][1] - 1
-                    if gap < min_gap:
-                        new_soft_penalties += (min_gap - gap) * tc008["weight"]
-    
-    # TC-009: Maximum teaching hours per day for teacher (hard)
-    for teacher_id, day_durations in teacher_day_durations.items():
-        if teacher_id in teacher_max_hours:
-            max_hours = teacher_max_hours[teacher_id]
-            for day_id, total in day_durations.items():
-                if total > max_hours:
-                    new_hard_penalties += (total - max_hours) * tc009["weight"]
-    
-    # TC-010: Student set maximum classes per day (soft)
-    for sg, day_counts in subgroup_day_counts.items():
-        if sg in student_max_classes:
-            max_classes = student_max_classes[sg]
-            for day_id, count in day_counts.items():
-                if count > max_classes:
-                    new_soft_penalties += (count - max_classes) * tc010["weight"]
-    
-    hard_conflicts = 10 * (base_hard + subgroup_conflicts) + new_hard_penalties
-    soft_violations = max_days_violations + min_days_violations + split_activities_penalty + new_soft_penalties
-    
-    return (
-        hard_conflicts,
-        soft_violations,
-        room_conflicts,
-        teacher_conflicts,
-        interval_conflicts,
-        teacher_availability_conflicts,
-        capacity_conflicts,
-        unscheduled_activities,
-        duplicate_activities,
-        room_type_mismatches,
-        min_days_violations,
-        max_days_violations,
-        split_activities_penalty,
-        new_hard_penalties,
-        new_soft_penalties,
-        subgroup_conflicts  # Added subgroup_conflicts to the return tuple
-    )
-
-def print_solution_stats(solution):
-    """
-    Print a summary of the solution's statistics and constraint violations.
-    """
-    (
-        hard_conflicts,
-        soft_violations,
-        room_conflicts,
-        teacher_conflicts,
-        interval_conflicts,
-        teacher_availability_conflicts,
-        capacity_conflicts,
-        unscheduled_activities,
-        duplicate_activities,
-        room_type_mismatches,
-        min_days_violations,
-        max_days_violations,
-        split_activities_penalty,
-        new_hard,
-        new_soft,
-        subgroup_conflicts  # Added to match the evaluate_solution return tuple
-    ) = evaluate_solution(solution)
-    
-    print("\nSolution Statistics:")
-    print(f"  Total scheduled entries: {len(solution)}")
-    unique_activities = {s['activity_id'] for s in solution}
-    print(f"  Unique activities scheduled: {len(unique_activities)}")
-    print(f"  Activities not scheduled: {unscheduled_activities}")
-    print(f"  Activities scheduled multiple times: {duplicate_activities}")
-    print(f"  Hard constraint violations: {hard_conflicts}")
-    print(f"    - Room conflicts: {room_conflicts}")
-    print(f"    - Teacher conflicts: {teacher_conflicts}")
-    print(f"    - Interval conflicts: {interval_conflicts}")
-    print(f"    - Teacher availability conflicts: {teacher_availability_conflicts}")
-    print(f"    - Room capacity conflicts: {capacity_conflicts}")
-    print(f"    - Room type mismatches: {room_type_mismatches}")
-    print(f"    - Subgroup conflicts: {subgroup_conflicts}")
-    print(f"    - New hard penalties (TC-004, TC-009, TC-011, TC-014): {new_hard}")
-    print(f"  Soft constraint violations: {soft_violations}")
-    print(f"    - Max/min days violations: {max_days_violations + min_days_violations}")
-    print(f"    - Split activities penalty: {split_activities_penalty}")
-    print(f"    - New soft penalties (TC-003, TC-005, TC-008, TC-010, TC-012): {new_soft}")
-    
-    split_labs = [s for s in solution if s.get("is_split", False)]
-    print(f"  Lab activities split into multiple sessions: {len(split_labs)}")
-    
-    activities_per_day = defaultdict(int)
-    for s in solution:
-        activities_per_day[s["day"]["_id"]] += 1
-    print("\nActivities per day:")
-    for d_id, count in activities_per_day.items():
-        day_name = next((d["name"] for d in days if d["_id"] == d_id), str(d_id))
-        print(f"  {day_name}: {count}")
-    
-    teacher_counts = defaultdict(int)
-    for s in solution:
-        teacher_counts[s["teacher"]] += 1
-    top_teachers = sorted(teacher_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    print("\nActivities per teacher (top 5):")
-    for t_id, count in top_teachers:
-        t_name = next((t["name"] for t in teachers if t["_id"] == t_id), str(t_id))
-        print(f"  {t_name}: {count}")
-    
-    room_usage = defaultdict(int)
-    for s in solution:
-        room_usage[s["room"]["code"]] += 1
-    top_rooms = sorted(room_usage.items(), key=lambda x: x[1], reverse=True)[:5]
-    print("\nRoom utilization (top 5):")
-    for r_code, count in top_rooms:
-        r = next((r for r in facilities if r["code"] == r_code), {})
-        r_name = r.get("name", r_code)
-        r_capacity = r.get("capacity", "Unknown")
-        print(f"  {r_name} (Capacity: {r_capacity}): {count} activities")
-    
-    room_type_counts = defaultdict(int)
-    for s in solution:
-        act_type = s.get("activity_type", "Lecture+Tutorial")
-        room_type_counts[act_type] += 1
-    print("\nActivity types distribution:")
-    for act_type, count in room_type_counts.items():
-        print(f"  {act_type}: {count}")
-
-# HELPER FUNCTIONS FOR SCHEDULING
-
-def find_consecutive_periods(duration, valid_periods):
-    """
-    Given a duration and a list of valid (non-interval) periods sorted by 'index',
-    return all possible consecutive blocks of length 'duration' 
-    where no intermediate period indices are skipped.
-    
-    Enhanced to prioritize blocks that:
-    1. Have no breaks/gaps
-    2. Are earliest in the day when possible
-    3. Follow natural time blocks (morning/afternoon)
-    """
-    if not valid_periods or len(valid_periods) < duration:
-        return []
-        
-    # First sort by index to ensure chronological order
-    valid_periods_sorted = sorted(valid_periods, key=lambda p: p["index"])
-    
-    if len(valid_periods_sorted) < duration:
-        return []
-    
-    consecutive_blocks = []
-    
-    # Find all possible consecutive blocks
-    for i in range(len(valid_periods_sorted) - duration + 1):
-        block = valid_periods_sorted[i:i+duration]
-        indices = [p["index"] for p in block]
+                        day_id = day["_id"]
+                        for room in suitable_rooms:
+                            t_idx = self.problem.teacher_index[teacher_id]
+                            d_idx = self.problem.day_index[day_id]
+                            r_idx = self.problem.room_index[room["code"]]
+                            busy = occupancy.busy(d_idx, teacher=t_idx, room=r_idx) | unavailable[t_idx][d_idx]
+                            blocks = self.problem.free_blocks(activity["duration"], busy)
+                            
+                            for positions in blocks:
+                                mask = self.problem.period_mask(positions)
+                                # Check if all subgroups are available during these periods
+                                if occupancy.is_free(d_idx, mask, subgroups=sg_indices):
+                                    records.append(make_session(self.problem, activity, d_idx, positions[0], r_idx, t_idx, subgroup_ids, total_students))
+                                    activity_scheduled = True
+                                    
+                                    # Update schedules
+                                    occupancy.reserve(d_idx, mask, teacher=t_idx, room=r_idx, subgroups=sg_indices)
+                                    order.placed(a_idx, d_idx, mask, t_idx, sg_indices)
+                                    break
+                            
+                            if activity_scheduled:
+                                break
+            else:
+                lab_rooms = [self.problem.rooms[r] for r in candidates
+                             if self.problem.room_capacity[r] <= 60 and self.problem.lab_room_suitable[r]]
+                if not lab_rooms:
+                    continue
+                subgroup_scheduled = [False] * len(subgroup_ids)
+                for i, subgroup_id in enumerate(subgroup_ids):
+                    if subgroup_scheduled[i]:
+                        continue
+                    random.shuffle(teacher_ids)
+                    for teacher_id in teacher_ids:
+                        if subgroup_scheduled[i]:
+                            break
+                        shuffled_days = random.sample(self.days, len(self.days))
+                        for day in shuffled_days:
+                            if subgroup_scheduled[i]:
+                                break
+                            day_id = day["_id"]
+                            shuffled_labs = random.sample(lab_rooms, len(lab_rooms))
+                            for room in shuffled_labs:
+                                t_idx = self.problem.teacher_index[teacher_id]
+                                d_idx = self.problem.day_index[day_id]
+                                r_idx = self.problem.room_index[room["code"]]
+                                busy = occupancy.busy(d_idx, teacher=t_idx, room=r_idx) | unavailable[t_idx][d_idx]
+                                blocks = self.problem.free_blocks(activity["duration"], busy)
+                                
+                                for positions in blocks:
+                                    mask = self.problem.period_mask(positions)
+                                    # Check if the subgroup is available during these periods
+                                    if occupancy.is_free(d_idx, mask, subgroups=sg_indices[i:i + 1]):
+                                        records.append(make_session(self.problem, activity, d_idx, positions[0], r_idx, t_idx, [subgroup_id], STUDENTS_PER_SUBGROUP, True))
+                                        subgroup_scheduled[i] = True
+                                        
+                                        # Update schedules
+                                        occupancy.reserve(d_idx, mask, teacher=t_idx, room=r_idx, subgroups=sg_indices[i:i + 1])
+                                        order.placed(a_idx, d_idx, mask, t_idx, sg_indices[i:i + 1])
+                                        break
+                                
+                                if subgroup_scheduled[i]:
+                                    break
         
-        # Check if block has consecutive indices (no gaps)
-        if all(indices[j+1] == indices[j] + 1 for j in range(len(indices) - 1)):
-            # Calculate a priority score for this block (lower is better)
-            # Prefer earlier blocks and natural time boundaries
-            start_time = indices[0]
-            priority_score = start_time  # Lower start times are preferred
-            
-            # Add the block with its priority score
-            consecutive_blocks.append((block, priority_score))
-    
-    # Sort blocks by priority score
-    consecutive_blocks.sort(key=lambda x: x[1])
-    
-    # Return just the blocks, not the scores
-    return [block for block, _ in consecutive_blocks]
+        return sessions_from_records(self.problem, records)
 
-def get_teacher_availability(teacher_id, day_id, period_index):
-    """
-    Checks if a teacher is available (based on a 'TC-001' constraint).
-    Return True if available, False if not.
-    """
-    availability_constraint = next((c for c in constraints if c["code"] == "TC-001"), None)
-    if not availability_constraint:
-        return True
-    teacher_unavailability = availability_constraint.get("details", {}).get(teacher_id, {})
-    day_unavailability = teacher_unavailability.get(day_id, [])
-    return (period_index not in day_unavailability)
+    def free_block_starts(self, state, duration, day_idx, teacher_idx, room_idx):
+        """
+        Blocks (earliest first) where the teacher and room are free and the teacher is available.
+        """
+        unavailable = state.tables.teacher_unavailable_mask[teacher_idx][day_idx]
+        return [
+            positions[0] for positions in self.problem.free_blocks(duration, unavailable)
+            if state.block_is_free(day_idx, positions[0], duration, teacher=teacher_idx, room=room_idx)
+        ]
 
-def is_space_suitable(room, activity_type, space_requirements):
-    """
-    Determines if a space is suitable for an activity based on type and requirements.
-    """
-    attributes = room.get("attributes", {})
-    room_name = room.get("name", "").lower()
-    room_code = room.get("code", "").lower()
-    
-    if activity_type in ("Lecture+Tutorial"):
-        if ("lecture" in room_name or "lh" in room_code or room.get("capacity", 0) >= 100):
-            return True
-    elif activity_type == "Lab":
-        if ("lab" in room_name or "lab" in room_code or attributes.get("computers") == "Yes"):
-            return True
-    if space_requirements:
-        for req in space_requirements:
-            req_lower = req.lower()
-            if "lecture hall" in req_lower and ("lecture" in room_name or "lh" in room_code):
-                return True
-            elif "lab" in req_lower and ("lab" in room_name or attributes.get("computers") == "Yes"):
-                return True
-    return False
-
-# CONSTRUCTING A NEW SOLUTION
-
-def construct_solution():
-    """
-    Constructs a single timetable solution using a greedy + random approach.
-    Used for both initial solutions and for scout bees' random exploration.
-    Updated to prevent subgroup overlaps.
-    """
-    global subgroup_schedule
-    solution = []
-    scheduled_activities = set()
-    
-    # Reset subgroup schedules for this solution
-    subgroup_schedule.clear()
-    
-    # For each teacher & room, track occupied periods on each day
-    teacher_schedule = defaultdict(lambda: defaultdict(set))
-    room_schedule = defaultdict(lambda: defaultdict(set))
-    
-    valid_non_interval_periods = [p for p in periods if not p.get("is_interval", False)]
-    
-    sorted_activities = sorted(activities, key=lambda act: -len(act.get("subgroup_ids", [])))
-    
-    for activity in sorted_activities:
-        if activity["code"] in scheduled_activities:
-            continue
-        
+    def schedule_single_activity(self, activity, state, split_subgroups=None):
+        """
+        Schedules a single activity around the sessions already held by 'state'.
+        Returns a list of session records for that activity.
+        Updated to prevent subgroup overlaps.
+        With split_subgroups (subgroup ids) only split lab sessions for those
+        subgroups are placed, e.g. to re-place one session of a split lab.
+        """
+        result = []
         subgroup_ids = activity.get("subgroup_ids", [])
         subgroup_count = len(subgroup_ids)
         total_students = subgroup_count * STUDENTS_PER_SUBGROUP
-        activity_type = activity.get("type", "Lecture+Tutorial")
-        space_requirements = activity.get("space_requirements", [])
+        act_type = activity.get("type", "Lecture+Tutorial")
         
-        valid_rooms = [room for room in facilities if is_space_suitable(room, activity_type, space_requirements)]
-        valid_rooms.sort(key=lambda r: r["capacity"], reverse=True)
+        a_idx = self.problem.activity_index[activity["code"]]
+        candidates = self.problem.activity_candidate_rooms[a_idx]
+        valid_rooms = [self.problem.rooms[r] for r in candidates]
         if not valid_rooms:
-            continue
+            return result
         
         teacher_ids = activity.get("teacher_ids", [])
         random.shuffle(teacher_ids)
         
-        need_to_split = (activity_type == "Lab") and any(room["capacity"] < total_students for room in valid_rooms)
+        need_to_split = act_type == "Lab" and len(self.problem.activity_fitting_rooms[a_idx]) < len(candidates)
         
-        if not need_to_split:
-            suitable_rooms = [room for room in valid_rooms if room["capacity"] >= total_students]
+        if not need_to_split and split_subgroups is None:
+            suitable_rooms = [self.problem.rooms[r] for r in self.problem.activity_fitting_rooms[a_idx]]
             if not suitable_rooms:
-                continue
-            activity_scheduled = False
-            for teacher_id in teacher_ids:
-                if activity_scheduled:
-                    break
-                shuffled_days = random.sample(days, len(days))
-                for day in shuffled_days:
-                    if activity_scheduled:
-                        break
-                    day_id = day["_id"]
+                return result
+            sg_indices = [self.problem.subgroup_index[sg] for sg in subgroup_ids]
+            for t_id in teacher_ids:
+                t_idx = self.problem.teacher_index[t_id]
+                for day in random.sample(self.days, len(self.days)):
+                    d_idx = self.problem.day_index[day["_id"]]
                     for room in suitable_rooms:
-                        free_periods = []
-                        for p in valid_non_interval_periods:
-                            idx = p["index"]
-                            if (idx not in teacher_schedule[teacher_id][day_id] and 
-                                idx not in room_schedule[room["code"]][day_id] and 
-                                get_teacher_availability(teacher_id, day_id, idx)):
-                                free_periods.append(p)
-                        blocks = find_consecutive_periods(activity["duration"], free_periods)
-                        
-                        for block in blocks:
-                            block_indices = [p["index"] for p in block]
-                            # Check if all subgroups are available during these periods
-                            if is_subgroup_available(subgroup_ids, day_id, block_indices):
-                                solution.append({
-                                    "session_id" : str(uuid.uuid4()),
-                                    "subgroup": subgroup_ids,
-                                    "activity_id": activity["code"],
-                                    "day": day,
-                                    "period": block,
-                                    "room": room,
-                                    "teacher": teacher_id,
-                                    "duration": activity["duration"],
-                                    "subject": activity["subject"],
-                                    "student_count": total_students,
-                                    "activity_type": activity_type
-                                })
-                                scheduled_activities.add(activity["code"])
-                                activity_scheduled = True
-                                
-                                # Update schedules
-                                for p_obj in block:
-                                    p_idx = p_obj["index"]
-                                    teacher_schedule[teacher_id][day_id].add(p_idx)
-                                    room_schedule[room["code"]][day_id].add(p_idx)
-                                
-                                # Update subgroup schedules
-                                update_subgroup_schedules(subgroup_ids, day_id, block_indices)
-                                break
-                        
-                        if activity_scheduled:
-                            break
+                        r_idx = self.problem.room_index[room["code"]]
+                        for start in self.free_block_starts(state, activity["duration"], d_idx, t_idx, r_idx):
+                            # Check if subgroups are available
+                            if state.block_is_free(d_idx, start, activity["duration"], subgroups=sg_indices):
+                                result.append(make_session(self.problem, activity, d_idx, start, r_idx, t_idx, subgroup_ids, total_students))
+                                return result
+            return result
         else:
-            lab_rooms = [r for r in valid_rooms if r["capacity"] <= 60 and is_space_suitable(r, "Lab", ["Lab Room"])]
+            lab_rooms = [self.problem.rooms[r] for r in candidates
+                         if self.problem.room_capacity[r] <= 60 and self.problem.lab_room_suitable[r]]
             if not lab_rooms:
-                continue
-            subgroup_scheduled = [False] * len(subgroup_ids)
-            for i, subgroup_id in enumerate(subgroup_ids):
-                if subgroup_scheduled[i]:
-                    continue
+                return result
+            # Sessions placed here are applied to the state so later subgroups see them
+            tokens = []
+            for sg in subgroup_ids if split_subgroups is None else split_subgroups:
+                sg_idx = self.problem.subgroup_index[sg]
                 random.shuffle(teacher_ids)
-                for teacher_id in teacher_ids:
-                    if subgroup_scheduled[i]:
-                        break
-                    shuffled_days = random.sample(days, len(days))
-                    for day in shuffled_days:
-                        if subgroup_scheduled[i]:
-                            break
-                        day_id = day["_id"]
-                        shuffled_labs = random.sample(lab_rooms, len(lab_rooms))
-                        for room in shuffled_labs:
-                            free_periods = []
-                            for p in valid_non_interval_periods:
-                                idx = p["index"]
-                                if (idx not in teacher_schedule[teacher_id][day_id] and
-                                    idx not in room_schedule[room["code"]][day_id] and
-                                    get_teacher_availability(teacher_id, day_id, idx)):
-                                    free_periods.append(p)
-                            blocks = find_consecutive_periods(activity["duration"], free_periods)
-                            
-                            for block in blocks:
-                                block_indices = [p["index"] for p in block]
-                                # Check if the subgroup is available during these periods
-                                if is_subgroup_available([subgroup_id], day_id, block_indices):
-                                    solution.append({
-                                        "session_id" : str(uuid.uuid4()),
-                                        "subgroup": [subgroup_id],
-                                        "activity_id": activity["code"],
-                                        "day": day,
-                                        "period": block,
-                                        "room": room,
-                                        "teacher": teacher_id,
-                                        "duration": activity["duration"],
-                                        "subject": activity["subject"],
-                                        "student_count": STUDENTS_PER_SUBGROUP,
-                                        "activity_type": activity_type,
-                                        "is_split": True
-                                    })
-                                    subgroup_scheduled[i] = True
-                                    
-                                    # Update schedules
-                                    for p_obj in block:
-                                        p_idx = p_obj["index"]
-                                        teacher_schedule[teacher_id][day_id].add(p_idx)
-                                        room_schedule[room["code"]][day_id].add(p_idx)
-                                    
-                                    # Update subgroup schedules
-                                    update_subgroup_schedules([subgroup_id], day_id, block_indices)
+                placed = None
+                for t_id in teacher_ids:
+                    t_idx = self.problem.teacher_index[t_id]
+                    for day in random.sample(self.days, len(self.days)):
+                        d_idx = self.problem.day_index[day["_id"]]
+                        for r in random.sample(lab_rooms, len(lab_rooms)):
+                            r_idx = self.problem.room_index[r["code"]]
+                            for start in self.free_block_starts(state, activity["duration"], d_idx, t_idx, r_idx):
+                                if state.block_is_free(d_idx, start, activity["duration"], subgroups=[sg_idx]):
+                                    placed = make_session(self.problem, activity, d_idx, start, r_idx, t_idx, [sg], STUDENTS_PER_SUBGROUP, True)
                                     break
-                            
-                            if subgroup_scheduled[i]:
+                            if placed:
                                 break
-            if all(subgroup_scheduled):
-                scheduled_activities.add(activity["code"])
-    
-    return solution
-
-def schedule_single_activity(activity, current_solution):
-    """
-    Schedules a single activity, given the current solution.
-    Returns a list of scheduling entries for that activity.
-    Updated to prevent subgroup overlaps.
-    """
-    result = []
-    subgroup_ids = activity.get("subgroup_ids", [])
-    subgroup_count = len(subgroup_ids)
-    total_students = subgroup_count * STUDENTS_PER_SUBGROUP
-    act_type = activity.get("type", "Lecture+Tutorial")
-    space_req = activity.get("space_requirements", [])
-    
-    # Build current schedules to check conflicts
-    teacher_schedule = defaultdict(lambda: defaultdict(set))
-    room_schedule = defaultdict(lambda: defaultdict(set))
-    local_subgroup_schedule = defaultdict(lambda: defaultdict(set))
-    
-    for item in current_solution:
-        t_id = item["teacher"]
-        r_code = item["room"]["code"]
-        d_id = item["day"]["_id"]
-        for p in item["period"]:
-            idx = p["index"]
-            teacher_schedule[t_id][d_id].add(idx)
-            room_schedule[r_code][d_id].add(idx)
-            
-            # Track subgroup schedules
-            for sg in item["subgroup"]:
-                local_subgroup_schedule[sg][d_id].add(idx)
-    
-    valid_rooms = [r for r in facilities if is_space_suitable(r, act_type, space_req)]
-    valid_rooms.sort(key=lambda r: r["capacity"], reverse=True)
-    if not valid_rooms:
-        return result
-    
-    valid_non_interval_periods = [p for p in periods if not p.get("is_interval", False)]
-    teacher_ids = activity.get("teacher_ids", [])
-    random.shuffle(teacher_ids)
-    
-    need_to_split = (act_type == "Lab") and any(r["capacity"] < total_students for r in valid_rooms)
-    
-    if not need_to_split:
-        suitable_rooms = [r for r in valid_rooms if r["capacity"] >= total_students]
-        if not suitable_rooms:
-            return result
-        scheduled = False
-        for t_id in teacher_ids:
-            if scheduled:
-                break
-            random_days = random.sample(days, len(days))
-            for day in random_days:
-                day_id = day["_id"]
-                for room in suitable_rooms:
-                    free_periods = []
-                    for p in valid_non_interval_periods:
-                        idx = p["index"]
-                        if (idx not in teacher_schedule[t_id][day_id] and
-                            idx not in room_schedule[room["code"]][day_id] and
-                            get_teacher_availability(t_id, day_id, idx)):
-                            free_periods.append(p)
-                    blocks = find_consecutive_periods(activity["duration"], free_periods)
-                    
-                    for block in blocks:
-                        block_indices = [p["index"] for p in block]
-                        # Check if subgroups are available
-                        subgroups_available = True
-                        for sg in subgroup_ids:
-                            for idx in block_indices:
-                                if idx in local_subgroup_schedule[sg][day_id]:
-                                    subgroups_available = False
-                                    break
-                            if not subgroups_available:
-                                break
-                        
-                        if subgroups_available:
-                            result.append({
-                                "session_id" : str(uuid.uuid4()),
-                                "subgroup": subgroup_ids,
-                                "activity_id": activity["code"],
-                                "day": day,
-                                "period": block,
-                                "room": room,
-                                "teacher": t_id,
-                                "duration": activity["duration"],
-                                "subject": activity["subject"],
-                                "student_count": total_students,
-                                "activity_type": act_type
-                            })
-                            scheduled = True
+                        if placed:
                             break
-                    
-                    if scheduled:
+                    if placed:
                         break
-                if scheduled:
-                    break
-        return result
-    else:
-        lab_rooms = [r for r in valid_rooms if r["capacity"] <= 60 and is_space_suitable(r, "Lab", ["Lab Room"])]
-        if not lab_rooms:
+                if placed:
+                    result.append(placed)
+                    tokens.append(state.apply([(None, placed)]))
+            for token in reversed(tokens):
+                state.undo(token)
             return result
-        subgroup_scheduled = [False] * len(subgroup_ids)
-        for i, sg in enumerate(subgroup_ids):
-            if subgroup_scheduled[i]:
-                continue
-            random.shuffle(teacher_ids)
-            for t_id in teacher_ids:
-                if subgroup_scheduled[i]:
-                    break
-                random_days = random.sample(days, len(days))
-                for day in random_days:
-                    day_id = day["_id"]
-                    random_labs = random.sample(lab_rooms, len(lab_rooms))
-                    for r in random_labs:
-                        free_periods = []
-                        for p in valid_non_interval_periods:
-                            idx = p["index"]
-                            if (idx not in teacher_schedule[t_id][day_id] and
-                                idx not in room_schedule[r["code"]][day_id] and
-                                get_teacher_availability(t_id, day_id, idx)):
-                                free_periods.append(p)
-                        blocks = find_consecutive_periods(activity["duration"], free_periods)
-                        
-                        for block in blocks:
-                            block_indices = [p["index"] for p in block]
-                            # Check if the subgroup is available
-                            sg_available = True
-                            for idx in block_indices:
-                                if idx in local_subgroup_schedule[sg][day_id]:
-                                    sg_available = False
-                                    break
-                            
-                            if sg_available:
-                                result.append({
-                                    "session_id" : str(uuid.uuid4()),
-                                    "subgroup": [sg],
-                                    "activity_id": activity["code"],
-                                    "day": day,
-                                    "period": block,
-                                    "room": r,
-                                    "teacher": t_id,
-                                    "duration": activity["duration"],
-                                    "subject": activity["subject"],
-                                    "student_count": STUDENTS_PER_SUBGROUP,
-                                    "activity_type": act_type,
-                                    "is_split": True
-                                })
-                                subgroup_scheduled[i] = True
-                                
-                                # Update tracking for further scheduling in this function
-                                for p_obj in block:
-                                    p_idx = p_obj["index"]
-                                    teacher_schedule[t_id][day_id].add(p_idx)
-                                    room_schedule[r["code"]][day_id].add(p_idx)
-                                    local_subgroup_schedule[sg][day_id].add(p_idx)
-                                break
-                        
-                        if subgroup_scheduled[i]:
-                            break
-        return result
 
-# NEIGHBORHOOD SEARCH
+    # NEIGHBORHOOD SEARCH
 
-def neighborhood_search(solution):
-    """
-    Performs a neighborhood search on the given solution to produce a 'nearby' solution.
-    Strategies include rescheduling, swapping, moving, and changing room/teacher.
-    Updated to maintain subgroup schedule integrity.
-    """
-    if not solution:
-        return construct_solution()
-    
-    new_solution = solution.copy()
-    strategy = random.choices(
-        ["reschedule", "swap", "move", "change_room", "change_teacher"],
-        weights=[0.1, 0.2, 0.3, 0.2, 0.2],
-        k=1
-    )[0]
-    
-    # For move and swap operations, need to verify subgroup schedule integrity
-    
-    if strategy == "reschedule" and len(new_solution) > 0:
-        # This uses schedule_single_activity which already has subgroup conflict prevention
-        idx_to_remove = random.randrange(len(new_solution))
-        activity_to_reschedule = new_solution.pop(idx_to_remove)
-        activity_id = activity_to_reschedule["activity_id"]
-        activity = next((a for a in activities if a["code"] == activity_id), None)
-        if activity:
-            new_activity_schedule = schedule_single_activity(activity, new_solution)
-            if new_activity_schedule:
-                new_solution.extend(new_activity_schedule)
-    
-    elif strategy == "swap" and len(new_solution) >= 2:
-        # For swap, need to check if subgroups would conflict after swap
-        idx1, idx2 = random.sample(range(len(new_solution)), 2)
-        act1, act2 = new_solution[idx1], new_solution[idx2]
+    def neighborhood_search(self, state):
+        """
+        Proposes a move in the neighborhood of the solution held by 'state'.
+        Strategies include rescheduling, swapping, moving, and changing room/teacher.
+        Returns a list of (slot, record) changes for DeltaEvaluator (empty if no
+        feasible neighbor was found); subgroup schedules stay conflict free.
+        """
+        live = state.live_slots()
+        if not live:
+            return []
         
-        if act1["duration"] == act2["duration"]:
-            # Check if subgroups would conflict after swap
-            can_swap = True
-            
-            # Build subgroup schedule excluding the two items to swap
-            local_sg_schedule = defaultdict(lambda: defaultdict(set))
-            for i, item in enumerate(new_solution):
-                if i != idx1 and i != idx2:
-                    d_id = item["day"]["_id"]
-                    for sg in item["subgroup"]:
-                        for p in item["period"]:
-                            local_sg_schedule[sg][d_id].add(p["index"])
-            
-            # Check if act1's subgroups at act2's time would conflict
-            day2_id = act2["day"]["_id"]
-            period2_indices = [p["index"] for p in act2["period"]]
-            for sg in act1["subgroup"]:
-                for idx in period2_indices:
-                    if idx in local_sg_schedule[sg][day2_id]:
-                        can_swap = False
-                        break
-                if not can_swap:
-                    break
-            
-            # Check if act2's subgroups at act1's time would conflict
-            if can_swap:
-                day1_id = act1["day"]["_id"]
-                period1_indices = [p["index"] for p in act1["period"]]
-                for sg in act2["subgroup"]:
-                    for idx in period1_indices:
-                        if idx in local_sg_schedule[sg][day1_id]:
-                            can_swap = False
-                            break
-                    if not can_swap:
-                        break
-            
-            if can_swap:
-                new_solution[idx1]["day"], new_solution[idx2]["day"] = act2["day"], act1["day"]
-                new_solution[idx1]["period"], new_solution[idx2]["period"] = act2["period"], act1["period"]
-                new_solution[idx1]["room"], new_solution[idx2]["room"] = act2["room"], act1["room"]
-    
-    elif strategy == "move" and len(new_solution) > 0:
-        idx_to_move = random.randrange(len(new_solution))
-        activity_to_move = new_solution[idx_to_move]
-        valid_days = random.sample(days, len(days))
-        valid_periods = [p for p in periods if not p.get("is_interval", False)]
+        strategy = random.choices(
+            ["reschedule", "swap", "move", "change_room", "change_teacher"],
+            weights=[0.1, 0.2, 0.3, 0.2, 0.2],
+            k=1
+        )[0]
         
-        # Build schedules excluding the item to move
-        teacher_schedule = defaultdict(lambda: defaultdict(set))
-        room_schedule = defaultdict(lambda: defaultdict(set))
-        local_sg_schedule = defaultdict(lambda: defaultdict(set))
+        if strategy == "reschedule":
+            slot = random.choice(live)
+            record = state.slots[slot]
+            if record[F_ACTIVITY] < 0:
+                return [(slot, None)]
+            activity = self.problem.activities[record[F_ACTIVITY]]
+            # A split lab session is re-placed alone; the other subgroups' sessions stay
+            split_subgroups = [self.problem.subgroup_ids[sg] for sg in record[F_SUBGROUPS]] if record[F_SPLIT] else None
+            token = state.apply([(slot, None)])
+            new_records = self.schedule_single_activity(activity, state, split_subgroups)
+            state.undo(token)
+            return [(slot, None)] + [(None, r) for r in new_records]
         
-        for j, item in enumerate(new_solution):
-            if j == idx_to_move:
-                continue
-            t = item["teacher"]
-            r = item["room"]["code"]
-            d = item["day"]["_id"]
-            for block_p in item["period"]:
-                idx = block_p["index"]
-                teacher_schedule[t][d].add(idx)
-                room_schedule[r][d].add(idx)
-                # Track subgroup schedules
-                for sg in item["subgroup"]:
-                    local_sg_schedule[sg][d].add(idx)
+        if strategy == "swap":
+            if len(live) < 2:
+                return []
+            slot1, slot2 = random.sample(live, 2)
+            rec1, rec2 = state.slots[slot1], state.slots[slot2]
+            if rec1[F_DURATION] != rec2[F_DURATION]:
+                return []
+            # Check if subgroups would conflict after swap, excluding the two items
+            token = state.apply([(slot1, None), (slot2, None)])
+            can_swap = (
+                state.block_is_free(rec2[F_DAY], rec2[F_START], rec2[F_LENGTH], subgroups=rec1[F_SUBGROUPS]) and
+                state.block_is_free(rec1[F_DAY], rec1[F_START], rec1[F_LENGTH], subgroups=rec2[F_SUBGROUPS])
+            )
+            state.undo(token)
+            if not can_swap:
+                return []
+            new1 = rec1[:F_DAY] + (rec2[F_DAY], rec2[F_START], rec2[F_LENGTH], rec2[F_ROOM]) + rec1[F_TEACHER:]
+            new2 = rec2[:F_DAY] + (rec1[F_DAY], rec1[F_START], rec1[F_LENGTH], rec1[F_ROOM]) + rec2[F_TEACHER:]
+            return [(slot1, new1), (slot2, new2)]
         
-        for day in valid_days:
-            day_id = day["_id"]
-            t_id = activity_to_move["teacher"]
-            r_code = activity_to_move["room"]["code"]
-            free_periods = []
-            
-            for p in valid_periods:
-                idx = p["index"]
-                if (idx not in teacher_schedule[t_id][day_id] and 
-                    idx not in room_schedule[r_code][day_id] and 
-                    get_teacher_availability(t_id, day_id, idx)):
-                    free_periods.append(p)
-            
-            possible_blocks = find_consecutive_periods(activity_to_move["duration"], free_periods)
-            
-            for block in possible_blocks:
-                block_indices = [p["index"] for p in block]
-                # Check if subgroups are available
-                subgroups_available = True
-                for sg in activity_to_move["subgroup"]:
-                    for idx in block_indices:
-                        if idx in local_sg_schedule[sg][day_id]:
-                            subgroups_available = False
-                            break
-                    if not subgroups_available:
+        slot = random.choice(live)
+        record = state.slots[slot]
+        day_idx, start, length = record[F_DAY], record[F_START], record[F_LENGTH]
+        token = state.apply([(slot, None)])
+        new_record = None
+        
+        if strategy == "move":
+            for day in random.sample(self.days, len(self.days)):
+                d_idx = self.problem.day_index[day["_id"]]
+                for s in self.free_block_starts(state, record[F_DURATION], d_idx, record[F_TEACHER], record[F_ROOM]):
+                    if state.block_is_free(d_idx, s, record[F_DURATION], subgroups=record[F_SUBGROUPS]):
+                        new_record = record[:F_DAY] + (d_idx, s, record[F_DURATION]) + record[F_ROOM:]
                         break
-                
-                if subgroups_available:
-                    new_solution[idx_to_move]["day"] = day
-                    new_solution[idx_to_move]["period"] = block
+                if new_record:
                     break
-            
-            # If we found a valid move
-            if new_solution[idx_to_move]["day"]["_id"] == day_id:
+        
+        elif strategy == "change_room" and record[F_ACTIVITY] >= 0:
+            rooms = np.flatnonzero(self.problem.activity_room_suitable[record[F_ACTIVITY]]
+                                   & (self.problem.room_capacity >= record[F_STUDENTS])).tolist()
+            for r_idx in random.sample(rooms, len(rooms)):
+                if r_idx != record[F_ROOM] and state.block_is_free(day_idx, start, length, room=r_idx):
+                    new_record = record[:F_ROOM] + (r_idx,) + record[F_ROOM + 1:]
+                    break
+        
+        elif strategy == "change_teacher" and record[F_ACTIVITY] >= 0:
+            teacher_ids = list(self.problem.activity_teacher_list[record[F_ACTIVITY]])
+            unavailable = state.tables.teacher_unavailable
+            for t_idx in random.sample(teacher_ids, len(teacher_ids)):
+                t_idx = int(t_idx)
+                if (t_idx != record[F_TEACHER] and not unavailable[t_idx, day_idx, start:start + length].any()
+                        and state.block_is_free(day_idx, start, length, teacher=t_idx)):
+                    new_record = record[:F_TEACHER] + (t_idx,) + record[F_TEACHER + 1:]
+                    break
+        
+        state.undo(token)
+        return [(slot, new_record)] if new_record else []
+
+    def insert_unscheduled(self, state):
+        """
+        Proposes placing a session of an activity that has none, unscheduling
+        the sessions it would clash with. Of INSERT_SAMPLES random placements
+        (teacher available, room suitable) the one with the fewest clashes is
+        used, so chains of such moves can end in a clash-free fit. Not used by
+        the colony itself; the single trajectory engines (SA, TS) need it since
+        the other moves never schedule a missing activity.
+        Returns a list of (slot, record) changes.
+        """
+        missing = [a_idx for a_idx, count in enumerate(state.act_count) if count == 0]
+        if not missing:
+            return []
+        a_idx = random.choice(missing)
+        activity = self.problem.activities[a_idx]
+        subgroup_ids, students, split, rooms = random.choice(session_templates(self.problem, a_idx))
+        teachers = self.problem.activity_teacher_list[a_idx].tolist()
+        if not rooms or not teachers:
+            return []
+        live = [(slot, state.slots[slot]) for slot in state.live_slots()]
+        best = None
+        for _ in range(INSERT_SAMPLES):
+            t_idx = random.choice(teachers)
+            d_idx = random.randrange(self.problem.n_days)
+            blocks = self.problem.free_blocks(activity["duration"], state.tables.teacher_unavailable_mask[t_idx][d_idx])
+            if not blocks:
+                continue
+            start = random.choice(blocks)[0]
+            record = make_session(self.problem, activity, d_idx, start, random.choice(rooms), t_idx, subgroup_ids,
+                                  students, split)
+            end = start + record[F_LENGTH]
+            clashes = [
+                slot for slot, other in live
+                if other[F_DAY] == d_idx and other[F_START] < end and start < other[F_START] + other[F_LENGTH]
+                and (other[F_TEACHER] == t_idx or other[F_ROOM] == record[F_ROOM]
+                     or not set(other[F_SUBGROUPS]).isdisjoint(record[F_SUBGROUPS]))
+            ]
+            if best is None or len(clashes) < len(best[1]):
+                best = (record, clashes)
+            if not clashes:
                 break
-    
-    
+        if best is None:
+            return []
+        record, clashes = best
+        return [(slot, None) for slot in clashes] + [(None, record)]
 
-    return new_solution
+    # BCO PHASES
 
-# BCO PHASES
+    def new_food_source(self, seed=None):
+        """
+        Construct a fresh timetable (from seed sessions if given) and wrap it
+        for incremental evaluation.
+        """
+        self.budget.spend()
+        return DeltaEvaluator(self.problem, self.construct_solution(seed))
 
-food_sources = []         # Each is a complete timetable solution
-food_source_fitness = []  # Fitness of each food source
-food_source_trials = []   # Trials (number of times no improvement) for each source
-best_solution = None
-best_fitness = float('inf')
+    def is_noop(self, state, changes):
+        """
+        True if a move puts back exactly the sessions it removes, so the fitness
+        of the food source cannot change.
+        """
+        removed = sorted(state.slots[slot] for slot, _ in changes if slot is not None)
+        added = sorted(record for _, record in changes if record is not None)
+        return removed == added
 
-def initialize_food_sources():
-    """
-    Initialize the employed bees' food sources.
-    """
-    global food_sources, food_source_fitness, food_source_trials, best_solution, best_fitness
-    food_sources = []
-    food_source_fitness = []
-    food_source_trials = []
-    best_solution = None
-    best_fitness = float('inf')
-    
-    for i in range(NUM_EMPLOYED_BEES):
-        sol = construct_solution()
-        hc, sc, *_ = evaluate_solution(sol)
-        fit = hc + sc
-        food_sources.append(sol)
-        food_source_fitness.append(fit)
-        food_source_trials.append(0)
-        if fit < best_fitness:
-            best_fitness = fit
-            best_solution = sol
-            print(f"New best solution during initialization! Fitness = {best_fitness}")
-            
-def employed_bee_phase():
-    """
-    Employed bees search in the neighborhood of their current food source.
-    """
-    global food_sources, food_source_fitness, food_source_trials, best_solution, best_fitness
-    for i in range(NUM_EMPLOYED_BEES):
-        neighbor = neighborhood_search(food_sources[i])
-        hc, sc, *_ = evaluate_solution(neighbor)
-        neighbor_fit = hc + sc
-        if neighbor_fit < food_source_fitness[i]:
-            food_sources[i] = neighbor
-            food_source_fitness[i] = neighbor_fit
-            food_source_trials[i] = 0
-            if neighbor_fit < best_fitness:
-                best_fitness = neighbor_fit
-                best_solution = neighbor
-                print(f"New best solution in employed bee phase! Fitness = {best_fitness}")
+    def explore(self, i):
+        """
+        Try one neighbor of food source i, keeping it only if it improves the fitness.
+        Returns True when the food source improved.
+        """
+        state = self.food_sources[i]
+        if not state.live_slots():
+            candidate = self.new_food_source()
+            if candidate.fitness() < self.food_source_fitness[i]:
+                self.food_sources[i] = state = candidate
+            else:
+                return False
         else:
-            food_source_trials[i] += 1
+            changes = self.neighborhood_search(state)
+            if not changes:
+                return False
+            if self.is_noop(state, changes):
+                self.skipped_moves += 1
+                return False
+            self.budget.spend()
+            if state.score_change(changes) >= 0:
+                return False
+            state.apply(changes)
+        self.food_source_fitness[i] = state.fitness()
+        if self.food_source_fitness[i] < self.best_fitness:
+            self.best_fitness = self.food_source_fitness[i]
+            self.best_solution = state.sessions()
+            return "best"
+        return True
 
-def onlooker_bee_phase():
-    """
-    Onlooker bees choose a food source based on selection probability 
-    and explore around that source (neighborhood search).
-    """
-    global food_sources, food_source_fitness, food_source_trials, best_solution, best_fitness
-    max_fitness = max(food_source_fitness) + 1
-    inverted_fitness = [max_fitness - f for f in food_source_fitness]
-    total_inv_fit = sum(inverted_fitness)
-    if total_inv_fit == 0:
-        probabilities = [1.0 / NUM_EMPLOYED_BEES] * NUM_EMPLOYED_BEES
-    else:
-        probabilities = [val / total_inv_fit for val in inverted_fitness]
-    for _ in range(NUM_ONLOOKER_BEES):
-        selected_idx = np.random.choice(NUM_EMPLOYED_BEES, p=probabilities)
-        neighbor = neighborhood_search(food_sources[selected_idx])
-        hc, sc, *_ = evaluate_solution(neighbor)
-        neighbor_fit = hc + sc
-        if neighbor_fit < food_source_fitness[selected_idx]:
-            food_sources[selected_idx] = neighbor
-            food_source_fitness[selected_idx] = neighbor_fit
-            food_source_trials[selected_idx] = 0
-            if neighbor_fit < best_fitness:
-                best_fitness = neighbor_fit
-                best_solution = neighbor
-                print(f"New best solution in onlooker bee phase! Fitness = {best_fitness}")
+    def initialize_food_sources(self):
+        """
+        Initialize the employed bees' food sources. With a warm start the
+        first WARM_SHARE of them are repaired copies of the stored timetable.
+        """
+        self.food_sources = []
+        self.food_source_fitness = []
+        self.food_source_trials = []
+        self.best_solution = None
+        self.best_fitness = float('inf')
+        
+        for i in range(NUM_EMPLOYED_BEES):
+            # Out of budget: carry on with the food sources found so far
+            if self.food_sources and self.budget.exhausted():
+                break
+            warm = self.warm_start is not None and i < NUM_EMPLOYED_BEES * WARM_SHARE
+            state = self.new_food_source(self.warm_start if warm else None)
+            fit = state.fitness()
+            self.food_sources.append(state)
+            self.food_source_fitness.append(fit)
+            self.food_source_trials.append(0)
+            if fit < self.best_fitness:
+                self.best_fitness = fit
+                self.best_solution = state.sessions()
+                print(f"New best solution during initialization! Fitness = {self.best_fitness}")
+
+    def employed_bee_phase(self):
+        """
+        Employed bees search in the neighborhood of their current food source.
+        """
+        for i in range(len(self.food_sources)):
+            if self.budget.exhausted():
+                return
+            improved = self.explore(i)
+            if improved:
+                self.food_source_trials[i] = 0
+                if improved == "best":
+                    print(f"New best solution in employed bee phase! Fitness = {self.best_fitness}")
+            else:
+                self.food_source_trials[i] += 1
+
+    def onlooker_bee_phase(self):
+        """
+        Onlooker bees choose a food source based on selection probability 
+        and explore around that source (neighborhood search).
+        """
+        max_fitness = max(self.food_source_fitness) + 1
+        inverted_fitness = [max_fitness - f for f in self.food_source_fitness]
+        total_inv_fit = sum(inverted_fitness)
+        if total_inv_fit == 0:
+            probabilities = [1.0 / len(self.food_sources)] * len(self.food_sources)
         else:
-            food_source_trials[selected_idx] += 1
+            probabilities = [val / total_inv_fit for val in inverted_fitness]
+        for _ in range(NUM_ONLOOKER_BEES):
+            if self.budget.exhausted():
+                return
+            selected_idx = np.random.choice(len(self.food_sources), p=probabilities)
+            improved = self.explore(selected_idx)
+            if improved:
+                self.food_source_trials[selected_idx] = 0
+                if improved == "best":
+                    print(f"New best solution in onlooker bee phase! Fitness = {self.best_fitness}")
+            else:
+                self.food_source_trials[selected_idx] += 1
 
-def scout_bee_phase():
-    """
-    Scout bees abandon food sources that haven't improved for too long and replace them with new random solutions.
-    """
-    global food_sources, food_source_fitness, food_source_trials, best_solution, best_fitness
-    for i in range(NUM_EMPLOYED_BEES):
-        if food_source_trials[i] > LIMIT:
-            print(f"Scout bee abandoning food source {i} after {food_source_trials[i]} trials.")
-            new_sol = construct_solution()
-            hc, sc, *_ = evaluate_solution(new_sol)
-            new_fit = hc + sc
-            food_sources[i] = new_sol
-            food_source_fitness[i] = new_fit
-            food_source_trials[i] = 0
-            if new_fit < best_fitness:
-                best_fitness = new_fit
-                best_solution = new_sol
-                print(f"New best solution in scout bee phase! Fitness = {best_fitness}")
+    def scout_bee_phase(self):
+        """
+        Scout bees abandon food sources that haven't improved for too long and replace them with new random solutions.
+        """
+        for i in range(len(self.food_sources)):
+            if self.budget.exhausted():
+                return
+            if self.food_source_trials[i] > LIMIT:
+                print(f"Scout bee abandoning food source {i} after {self.food_source_trials[i]} trials.")
+                state = self.new_food_source()
+                new_fit = state.fitness()
+                self.food_sources[i] = state
+                self.food_source_fitness[i] = new_fit
+                self.food_source_trials[i] = 0
+                if new_fit < self.best_fitness:
+                    self.best_fitness = new_fit
+                    self.best_solution = state.sessions()
+                    print(f"New best solution in scout bee phase! Fitness = {self.best_fitness}")
 
-# MAIN BCO FUNCTION
+    # MAIN BCO FUNCTION
+
+    def run(self, time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
+        """
+        Main function to run Bee Colony Optimization for timetable scheduling.
+        time_limit (seconds) and max_evaluations (scored neighbors and new food
+        sources) bound the run; the bees stop as soon as either runs out.
+        stopping (an EarlyStopping) ends the run once the colony has converged.
+        warm_start (scheduled items of a stored timetable) seeds part of the
+        initial food sources.
+        """
+        if self.problem is None:
+            self.get_data()
+        self.cache = FitnessCache()
+        self.budget = Budget(time_limit, max_evaluations)
+        stopping = stopping or EarlyStopping()
+        self.stats = {"iterations": 0, "stop_reason": "completed"}
+        self.skipped_moves = 0
+        self.warm_start = warm_start_sessions(self.problem, warm_start) if warm_start else None
+        if self.warm_start is not None:
+            self.stats["warm_start_sessions"] = len(self.warm_start)
+            print(f"Warm start: {len(self.warm_start)} stored sessions kept.")
+        self.initialize_food_sources()
+        for iteration in range(NUM_ITERATIONS):
+            stop_reason = stopping.check(self.best_fitness, lambda: self.evaluate_solution(self.best_solution)[:2])
+            if stop_reason:
+                self.stats["stop_reason"] = stop_reason
+                break
+            print(f"\n=== BCO Iteration {iteration + 1} ===")
+            self.employed_bee_phase()
+            self.onlooker_bee_phase()
+            self.scout_bee_phase()
+            stop_reason = self.budget.exhausted()
+            if stop_reason:
+                # The iteration may have been cut short; it is not counted
+                self.stats["stop_reason"] = stop_reason
+                break
+            self.stats["iterations"] = iteration + 1
+            print(f"End of iteration {iteration + 1} | Current Best Fitness = {self.best_fitness}")
+            if self.on_iteration:
+                self.on_iteration(iteration + 1, self.best_fitness)
+        print("\n=== Final Best Solution ===")
+        self.print_solution_stats(self.best_solution)
+        self.stats.update(self.cache.stats(), skipped_moves=self.skipped_moves, **self.budget.stats())
+        print(f"  Fitness cache: {self.cache.hits} hits, {self.cache.misses} misses; "
+              f"{self.skipped_moves} no-op moves skipped")
+        print(f"  Iterations completed: {self.stats['iterations']} ({self.stats['stop_reason']})")
+        
+        # Store the latest score in the database
+        from routers.timetable_routes import store_latest_score
+        store_latest_score(self.best_fitness, "BC")
+        
+        return EncodedSolution(self.problem, self.best_solution)
 
-def generate_bco():
+def generate_bco(time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
     """
-    Main function to run Bee Colony Optimization for timetable scheduling.
+    Run BCO with a fresh solver and return the best timetable.
     """
-    global best_solution, best_fitness
-    get_data()
-    initialize_food_sources()
-    for iteration in range(NUM_ITERATIONS):
-        print(f"\n=== BCO Iteration {iteration + 1} ===")
-        employed_bee_phase()
-        onlooker_bee_phase()
-        scout_bee_phase()
-        print(f"End of iteration {iteration + 1} | Current Best Fitness = {best_fitness}")
-    print("\n=== Final Best Solution ===")
-    print_solution_stats(best_solution)
-    
-    # Store the latest score in the database
-    from routers.timetable_routes import store_latest_score
-    store_latest_score(best_fitness, "BC")
-    
-    return best_solution
+    return BeeColonySolver().run(time_limit, max_evaluations, stopping, warm_start)
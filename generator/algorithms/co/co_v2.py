@@ -1,7 +1,18 @@
 import random
-import uuid
+import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from generator.data_collector import *
+from generator.problem import ProblemInstance
+from generator.solution import make_session, sessions_from_records, EncodedSolution
+from generator.warm_start import warm_start_sessions, seed_construction
+from generator.conflict_graph import conflict_graph, DsaturOrder
+from generator.occupancy import Occupancy
+from generator.constraints import constraint_tables, activity_durations
+from generator.evaluation.engine import evaluate_compact
+from generator.evaluation.cache import FitnessCache, solution_key
+from generator.budget import Budget
+from generator.stopping import EarlyStopping
 
 # ACO Parameters
 NUM_ANTS = 60
@@ -10,782 +21,494 @@ EVAPORATION_RATE = 0.5
 ALPHA = 1
 BETA = 2
 Q = 100
+TAU_INIT = 1.0   # initial pheromone on every choice
+TAU_MIN = 0.01   # pheromone floor after evaporation
+EARLY_BIAS = 0.25  # slot heuristic factor per period later in the day; packs days like first-fit
 STUDENTS_PER_SUBGROUP = 40
+NUM_WORKERS = 1  # processes building ants; 1 keeps everything in this process
 
-# Global data holders (populated by get_data)
-days = []
-facilities = []
-modules = []
-periods = []
-students = []
-teachers = []
-years = []
-activities = []
-constraints = []
-
-# Add tracking for subgroup schedules
-subgroup_schedule = defaultdict(lambda: defaultdict(lambda: set()))  # subgroup_schedule[subgroup_id][day_id] = {period_indices}
-
-def get_data():
-    """
-    Loads data from the database (or any source) into the global lists.
-    """
-    global days, facilities, modules, periods, students, teachers, years, activities, constraints
-    days = get_days()
-    facilities = get_spaces()
-    modules = get_modules()
-    periods = get_periods()
-    students = get_students()
-    teachers = get_teachers()
-    years = get_years()
-    activities = get_activities()
-    constraints = get_constraints()
-
-    # Add index to periods if it doesn't exist
-    for idx, period in enumerate(periods):
-        if "index" not in period:
-            period["index"] = idx
-
-def get_constraints():
+class AntColonySolver:
     """
-    Example function to fetch constraints from DB.
-    Adjust as needed for your actual data structure.
+    Ant Colony Optimization for timetable scheduling.
+    Each instance owns its data, pheromone and heuristic tables, so several
+    solvers can run at once.
     """
-    # For illustration purposes only:
-    constraints = list(db["constraints"].find())
-    return constraints
 
-# NEW: Update each activity's duration using constraint TC-014.
-def update_activity_durations():
-    duration_constraint = next((c for c in constraints if c["code"] == "TC-014"), None)
-    if duration_constraint:
-        for ad in duration_constraint["details"].get("activity_durations", []):
-            activity_code = ad["activity_code"]
-            new_duration = ad["duration"]
-            for activity in activities:
-                if activity["code"] == activity_code:
-                    activity["duration"] = new_duration
-
-# Pheromone and heuristic structures
-pheromone = defaultdict(lambda: 1.0)
-heuristic = defaultdict(float)
-
-def initialize_heuristic():
-    """
-    Initialize heuristic information for each activity based on the number of students.
-    Higher student count = higher heuristic value => higher scheduling priority.
-    """
-    global heuristic
-    for activity in activities:
-        subgroup_count = len(activity.get("subgroup_ids", []))
-        total_students = subgroup_count * STUDENTS_PER_SUBGROUP
-        heuristic[activity["code"]] = total_students
-
-def find_consecutive_periods(duration, valid_periods):
-    """
-    Given a duration and a list of valid (non-interval) periods sorted by 'index',
-    return all possible blocks (each block is a list of consecutive period objects)
-    of length 'duration' that do not skip any intermediate period indices.
-    
-    Enhanced to prioritize blocks that:
-    1. Have no breaks/gaps
-    2. Are earliest in the day when possible 
-    3. Follow natural time blocks (morning/afternoon)
-    """
-    if not valid_periods or len(valid_periods) < duration:
-        return []
-        
-    # First sort by index to ensure chronological order
-    valid_periods_sorted = sorted(valid_periods, key=lambda p: p["index"])
-    
-    if len(valid_periods_sorted) < duration:
-        return []
-    
-    consecutive_blocks = []
-    
-    # Find all possible consecutive blocks
-    for i in range(len(valid_periods_sorted) - duration + 1):
-        block = valid_periods_sorted[i:i+duration]
-        indices = [p["index"] for p in block]
+    def __init__(self, on_iteration=None):
+        # Called as on_iteration(iteration, best_score) after every iteration
+        self.on_iteration = on_iteration
+
+        # Data holders (populated by get_data)
+        self.days = []
+        self.facilities = []
+        self.modules = []
+        self.periods = []
+        self.student_counts = {}
+        self.teachers = []
+        self.years = []
+        self.activities = []
+        self.constraints = []
+        self.problem = None  # ProblemInstance compiled from the lists above
+        self.conflict_graph = None  # activities that may not overlap (see generator.conflict_graph)
+
+        # Pheromone and heuristic arrays over (activity, day, start period) and (activity, room)
+        self.slot_pheromone = None
+        self.room_pheromone = None
+        self.slot_heuristic = None
+        self.room_heuristic = None
         
-        # Check if block has consecutive indices (no gaps)
-        if all(indices[j+1] == indices[j] + 1 for j in range(len(indices) - 1)):
-            # Calculate a priority score for this block (lower is better)
-            # Prefer earlier blocks and natural time boundaries
-            start_time = indices[0]
-            priority_score = start_time  # Lower start times are preferred
-            
-            # Add the block with its priority score
-            consecutive_blocks.append((block, priority_score))
-    
-    # Sort blocks by priority score
-    consecutive_blocks.sort(key=lambda x: x[1])
-    
-    # Return just the blocks, not the scores
-    return [block for block, _ in consecutive_blocks]
-
-def get_teacher_availability(teacher_id, day_id, period_index):
-    """
-    Checks if a teacher is available.
-    (In the original code, this used constraint "TC-001". With new constraints, teacher availability
-     is now handled in soft penalties. So here we simply return True if no explicit unavailability is found.)
-    """
-    # Look for a constraint that might define unavailability.
-    availability_constraint = next((c for c in constraints if c["code"] == "TC-001"), None)
-    if not availability_constraint:
-        return True
-    
-    teacher_unavailability = availability_constraint.get("details", {}).get(teacher_id, {})
-    day_unavailability = teacher_unavailability.get(day_id, [])
-    return (period_index not in day_unavailability)
-
-def is_space_suitable(room, activity_type, space_requirements):
-    """
-    Determines if a space is suitable for an activity based on type and requirements.
-    """
-    attributes = room.get("attributes", {})
-    room_name = room.get("name", "").lower()
-    room_code = room.get("code", "").lower()
-    
-    if activity_type == "Lecture+Tutorial":
-        if ("lecture" in room_name or 
-            "lh" in room_code or 
-            room.get("capacity", 0) >= 100):
-            return True
-    
-    elif activity_type == "Lab":
-        if ("lab" in room_name or 
-            "lab" in room_code or 
-            attributes.get("computers") == "Yes"):
-            return True
-    
-    if space_requirements:
-        for req in space_requirements:
-            req_lower = req.lower()
-            if "lecture hall" in req_lower and ("lecture" in room_name or "lh" in room_code):
-                return True
-            elif "lab" in req_lower and ("lab" in room_name or attributes.get("computers") == "Yes"):
-                return True
-    
-    return False
-
-def is_subgroup_available(subgroup_ids, day_id, period_indices):
-    """
-    Check if all subgroups are available for the given day and periods.
-    Returns True if all subgroups are available, False otherwise.
-    """
-    for sg in subgroup_ids:
-        for p_idx in period_indices:
-            if p_idx in subgroup_schedule[sg][day_id]:
-                return False
-    return True
-
-def update_subgroup_schedules(subgroup_ids, day_id, period_indices):
-    """
-    Mark the periods as scheduled for all subgroups.
-    """
-    for sg in subgroup_ids:
-        for p_idx in period_indices:
-            subgroup_schedule[sg][day_id].add(p_idx)
-
-def construct_solution():
-    """
-    Constructs a single timetable solution using a greedy + random approach guided by pheromone and heuristic values.
-    Key updates:
-      - Uses room type matching, teacher availability, and if needed splits lab subgroups.
-      - Activity duration used here comes directly from the activity data (updated by TC-014).
-      - Prevents scheduling overlaps for the same subgroup.
-    """
-    global subgroup_schedule
-    solution = []
-    scheduled_activities = set()
-    
-    # Reset subgroup schedules for this solution
-    subgroup_schedule.clear()
-    
-    teacher_schedule = defaultdict(lambda: defaultdict(set))  # teacher_schedule[teacher_id][day_id] = {period_indices}
-    room_schedule = defaultdict(lambda: defaultdict(set))     # room_schedule[room_code][day_id] = {period_indices}
-    
-    valid_non_interval_periods = [p for p in periods if not p.get("is_interval", False)]
-    
-    sorted_activities = sorted(activities, key=lambda act: -len(act.get("subgroup_ids", [])))
-    
-    for activity in sorted_activities:
-        if activity["code"] in scheduled_activities:
-            continue
-        
-        subgroup_ids = activity.get("subgroup_ids", [])
-        subgroup_count = len(subgroup_ids)
-        total_students = subgroup_count * STUDENTS_PER_SUBGROUP
-        
-        activity_type = activity.get("type", "Lecture+Tutorial")
-        space_requirements = activity.get("space_requirements", [])
-        
-        valid_rooms = [room for room in facilities if is_space_suitable(room, activity_type, space_requirements)]
-        valid_rooms.sort(key=lambda r: r["capacity"], reverse=True)
+        self.cache = FitnessCache()  # evaluation results of the current run
+        self.stats = {}  # run statistics, filled in by run()
+
+    def get_data(self, snapshot=None):
+        """
+        Loads data from the database (or any source) into this solver.
+        A snapshot from load_snapshot() can be passed instead; its documents
+        are modified in place, so each solver needs its own copy.
+        """
+        if snapshot is None:
+            snapshot = load_snapshot()
+        self.days = snapshot["days"]
+        self.facilities = snapshot["spaces"]
+        self.modules = snapshot["modules"]
+        self.periods = snapshot["periods"]
+        self.student_counts = snapshot["student_counts"]
+        self.teachers = snapshot["teachers"]
+        self.years = snapshot["years"]
+        self.activities = snapshot["activities"]
+        self.constraints = snapshot["constraints"]
+
+        # Add index to periods if it doesn't exist
+        for idx, period in enumerate(self.periods):
+            if "index" not in period:
+                period["index"] = idx
+
+        self.update_activity_durations()  # NEW: update activities from TC-014
+        self.problem = ProblemInstance(self.days, self.periods, self.facilities, self.activities,
+                                       teachers=self.teachers, student_counts=self.student_counts, modules=self.modules,
+                                       years=self.years, constraints=self.constraints)
+        self.conflict_graph = conflict_graph(self.problem)
+
+    def data(self):
+        """
+        The loaded data as a tuple, for set_data() on another solver.
+        """
+        return (self.days, self.facilities, self.modules, self.periods, self.student_counts, self.teachers,
+                self.years, self.activities, self.constraints, self.problem, self.conflict_graph)
+
+    def set_data(self, data):
+        """
+        Use data already loaded by another solver instead of reading the database.
+        """
+        (self.days, self.facilities, self.modules, self.periods, self.student_counts, self.teachers,
+         self.years, self.activities, self.constraints, self.problem, self.conflict_graph) = data
+
+    # NEW: Update each activity's duration using constraint TC-014.
+    def update_activity_durations(self):
+        durations = activity_durations(self.constraints)
+        for activity in self.activities:
+            if activity["code"] in durations:
+                activity["duration"] = durations[activity["code"]]
+
+    def initialize_heuristic(self):
+        """
+        Heuristic desirability of each choice, fixed for the run:
+          - slot (activity, day, start period): 1, plus 1 if a teacher of the
+            activity prefers that period (TC-003) and 1 if one of its subgroups does (TC-005),
+            scaled by EARLY_BIAS per period into the day. Without that bias
+            sessions scatter over the day and later activities no longer fit.
+          - room (activity, room): how tightly the room seats the activity, so
+            large halls are left for large activities.
+        """
+        problem = self.problem
+        tables = constraint_tables(problem)
+        self.slot_heuristic = np.ones((problem.n_activities, problem.n_days, problem.n_periods))
+        for a_idx in range(problem.n_activities):
+            self.slot_heuristic[a_idx] += tables.teacher_pref[problem.activity_teacher_list[a_idx]].any(axis=0)
+            self.slot_heuristic[a_idx] += tables.subgroup_pref[problem.activity_subgroup_list[a_idx]].any(axis=0)
+        self.slot_heuristic *= EARLY_BIAS ** np.argsort(np.argsort(problem.period_order))
+        counts = problem.activity_student_count[:, np.newaxis] + 1
+        self.room_heuristic = np.minimum(1.0, counts / (problem.room_capacity[np.newaxis, :] + 1))
+
+    def initialize_pheromone(self):
+        """
+        Uniform pheromone over (activity, day, start period) and (activity, room).
+        """
+        problem = self.problem
+        self.slot_pheromone = np.full((problem.n_activities, problem.n_days, problem.n_periods), TAU_INIT)
+        self.room_pheromone = np.full((problem.n_activities, problem.n_rooms), TAU_INIT)
+
+    def choose_placement(self, a_idx, rooms, sg_indices, occupancy, unavailable, slot_weights, room_weights):
+        """
+        Roulette selection of a clash-free placement for one session of an activity.
+        A (day, start) is drawn among the blocks where the subgroups, some teacher
+        and some of 'rooms' are free, weighted by slot_weights; then a free room
+        weighted by room_weights and a free teacher uniformly.
+        Returns (day, start, mask, teacher, room), or None if nothing fits.
+        """
+        problem = self.problem
+        teachers = problem.activity_teacher_list[a_idx].tolist()
+        slot_w = slot_weights[a_idx].tolist()
+        options = []
+        weights = []
+        for d_idx in range(problem.n_days):
+            subgroups_busy = occupancy.busy(d_idx, subgroups=sg_indices)
+            teachers_busy = [occupancy.busy(d_idx, teacher=t) | unavailable[t][d_idx] for t in teachers]
+            rooms_busy = [occupancy.busy(d_idx, room=r) for r in rooms]
+            for positions, mask in problem.block_table.get(problem.activities[a_idx]["duration"], []):
+                if mask & subgroups_busy:
+                    continue
+                free_teachers = [t for t, busy in zip(teachers, teachers_busy) if not busy & mask]
+                if not free_teachers or all(busy & mask for busy in rooms_busy):
+                    continue
+                options.append((d_idx, positions[0], mask, free_teachers))
+                weights.append(slot_w[d_idx][positions[0]])
+        if not options:
+            return None
+        d_idx, start, mask, free_teachers = random.choices(options, weights)[0]
+        free_rooms = [r for r in rooms if not occupancy.busy(d_idx, room=r) & mask]
+        r_idx = random.choices(free_rooms, room_weights[a_idx, free_rooms].tolist())[0]
+        return d_idx, start, mask, random.choice(free_teachers), r_idx
+
+    def construct_solution(self, seed=None):
+        """
+        Constructs a single timetable solution guided by pheromone and heuristic values.
+        Key updates:
+          - Uses room type matching, teacher availability, and if needed splits lab subgroups.
+          - Activity duration used here comes directly from the activity data (updated by TC-014).
+          - Prevents scheduling overlaps for the same subgroup.
+          - Each session's (day, start) and room are picked by roulette selection
+            weighted by pheromone^ALPHA * heuristic^BETA (see choose_placement).
+          - Activities are placed most constrained first (DSATUR order, see generator.conflict_graph).
+          - With a seed (warm-start sessions) only the activities it leaves out are placed.
+        """
+        records = []
         
-        if not valid_rooms:
-            continue
+        occupancy = Occupancy(self.problem)
+        if seed is not None:
+            records = seed_construction(self.problem, seed, occupancy)
         
-        teacher_ids = activity.get("teacher_ids", [])
-        random.shuffle(teacher_ids)
+        unavailable = constraint_tables(self.problem).teacher_unavailable_mask
+        slot_weights = self.slot_pheromone ** ALPHA * self.slot_heuristic ** BETA
+        room_weights = self.room_pheromone ** ALPHA * self.room_heuristic ** BETA
         
-        need_to_split = activity_type == "Lab" and any(room["capacity"] < total_students for room in valid_rooms)
+        # Most constrained activities first: DSATUR order over the conflict graph
+        order = DsaturOrder(self.problem, self.conflict_graph, records)
         
-        if not need_to_split:
-            suitable_rooms = [room for room in valid_rooms if room["capacity"] >= total_students]
-            if not suitable_rooms:
-                continue
-                
-            activity_scheduled = False
+        for a_idx in order:
+            activity = self.problem.activities[a_idx]
             
-            for teacher_id in teacher_ids:
-                if activity_scheduled:
-                    break
-                shuffled_days = random.sample(days, len(days))
-                for day in shuffled_days:
-                    if activity_scheduled:
-                        break
-                    day_id = day["_id"]
-                    for room in suitable_rooms:
-                        free_periods = []
-                        for p in valid_non_interval_periods:
-                            idx = p["index"]
-                            if idx not in teacher_schedule[teacher_id][day_id] and \
-                               idx not in room_schedule[room["code"]][day_id] and \
-                               get_teacher_availability(teacher_id, day_id, idx):
-                                free_periods.append(p)
-                        
-                        possible_blocks = find_consecutive_periods(activity["duration"], free_periods)
-                        
-                        for block in possible_blocks:
-                            block_indices = [p["index"] for p in block]
-                            # Check if all subgroups are available during these periods
-                            if is_subgroup_available(subgroup_ids, day_id, block_indices):
-                                solution.append({
-                                    "session_id" : str(uuid.uuid4()),
-                                    "subgroup": subgroup_ids,
-                                    "activity_id": activity["code"],
-                                    "day": day,
-                                    "period": block,
-                                    "room": room,
-                                    "teacher": teacher_id,
-                                    "duration": activity["duration"],
-                                    "subject": activity["subject"],
-                                    "student_count": total_students,
-                                    "activity_type": activity_type
-                                })
-                                
-                                scheduled_activities.add(activity["code"])
-                                activity_scheduled = True
-                                
-                                # Update schedules
-                                for period_obj in block:
-                                    idx = period_obj["index"]
-                                    teacher_schedule[teacher_id][day_id].add(idx)
-                                    room_schedule[room["code"]][day_id].add(idx)
-                                
-                                # Update subgroup schedules
-                                update_subgroup_schedules(subgroup_ids, day_id, block_indices)
-                                break
-                        
-                        if activity_scheduled:
-                            break
-        else:
-            lab_rooms = [room for room in valid_rooms if room["capacity"] <= 120 and is_space_suitable(room, "Lab", ["Lab Room"])]
-            if not lab_rooms:
+            subgroup_ids = activity.get("subgroup_ids", [])
+            sg_indices = [self.problem.subgroup_index[sg] for sg in subgroup_ids]
+            subgroup_count = len(subgroup_ids)
+            total_students = subgroup_count * STUDENTS_PER_SUBGROUP
+            
+            activity_type = activity.get("type", "Lecture+Tutorial")
+            
+            candidates = self.problem.activity_candidate_rooms[a_idx]
+            if not len(candidates):
                 continue
-                
-            students_per_subgroup = STUDENTS_PER_SUBGROUP
-            subgroup_scheduled = [False] * len(subgroup_ids)
             
-            for i, subgroup_id in enumerate(subgroup_ids):
-                if subgroup_scheduled[i]:
+            need_to_split = activity_type == "Lab" and len(self.problem.activity_fitting_rooms[a_idx]) < len(candidates)
+            
+            if not need_to_split:
+                suitable_rooms = self.problem.activity_fitting_rooms[a_idx].tolist()
+                placement = self.choose_placement(a_idx, suitable_rooms, sg_indices, occupancy, unavailable,
+                                                  slot_weights, room_weights)
+                if placement:
+                    d_idx, start, mask, t_idx, r_idx = placement
+                    records.append(make_session(self.problem, activity, d_idx, start, r_idx, t_idx, subgroup_ids, total_students))
+                    occupancy.reserve(d_idx, mask, teacher=t_idx, room=r_idx, subgroups=sg_indices)
+                    order.placed(a_idx, d_idx, mask, t_idx, sg_indices)
+            else:
+                lab_rooms = [r for r in candidates.tolist()
+                             if self.problem.room_capacity[r] <= 120 and self.problem.lab_room_suitable[r]]
+                if not lab_rooms:
                     continue
-                    
-                random.shuffle(teacher_ids)
-                for teacher_id in teacher_ids:
-                    if subgroup_scheduled[i]:
-                        break
-                    shuffled_days = random.sample(days, len(days))
-                    for day in shuffled_days:
-                        if subgroup_scheduled[i]:
-                            break
-                        day_id = day["_id"]
-                        shuffled_labs = random.sample(lab_rooms, len(lab_rooms))
-                        for room in shuffled_labs:
-                            free_periods = []
-                            for p in valid_non_interval_periods:
-                                idx = p["index"]
-                                if idx not in teacher_schedule[teacher_id][day_id] and \
-                                   idx not in room_schedule[room["code"]][day_id] and \
-                                   get_teacher_availability(teacher_id, day_id, idx):
-                                    free_periods.append(p)
-                            
-                            possible_blocks = find_consecutive_periods(activity["duration"], free_periods)
-                            
-                            for block in possible_blocks:
-                                block_indices = [p["index"] for p in block]
-                                # Check if the subgroup is available during these periods
-                                if is_subgroup_available([subgroup_id], day_id, block_indices):
-                                    solution.append({
-                                        "session_id" : str(uuid.uuid4()),
-                                        "subgroup": [subgroup_id],
-                                        "activity_id": activity["code"],
-                                        "day": day,
-                                        "period": block,
-                                        "room": room,
-                                        "teacher": teacher_id,
-                                        "duration": activity["duration"],
-                                        "subject": activity["subject"],
-                                        "student_count": students_per_subgroup,
-                                        "activity_type": activity_type,
-                                        "is_split": True
-                                    })
-                                    
-                                    subgroup_scheduled[i] = True
-                                    # Update schedules
-                                    for period_obj in block:
-                                        idx = period_obj["index"]
-                                        teacher_schedule[teacher_id][day_id].add(idx)
-                                        room_schedule[room["code"]][day_id].add(idx)
-                                    
-                                    # Update subgroup schedule
-                                    update_subgroup_schedules([subgroup_id], day_id, block_indices)
-                                    break
-                            
-                            if subgroup_scheduled[i]:
-                                break
-            if all(subgroup_scheduled):
-                scheduled_activities.add(activity["code"])
-    
-    return solution
-
-def evaluate_solution(solution):
-    """
-    Evaluate the solution's quality in terms of constraints.
-    Hard constraints => high penalty; soft constraints => lower penalty.
-    
-    Existing checks (room/teacher conflicts, capacity, duplicate scheduling, etc.)
-    are extended below with additional constraints from the DB:
-      - TC-003: Teacher preferred time (soft)
-      - TC-004: Teacher maximum consecutive periods (hard)
-      - TC-005: Student set preferred time (soft)
-      - TC-008: Minimum gap between classes for teacher (soft)
-      - TC-009: Maximum teaching hours per day for teacher (hard)
-      - TC-010: Student set maximum classes per day (soft)
-      - TC-011: Room availability (hard)
-      - TC-012: Teacher subject preference (soft)
-      - TC-014: Activity duration check (hard)
-    """
-    room_conflicts = 0
-    teacher_conflicts = 0
-    interval_conflicts = 0
-    teacher_availability_conflicts = 0
-    capacity_conflicts = 0
-    duplicate_activities = 0
-    room_type_mismatches = 0
-
-    max_days_violations = 0
-    min_days_violations = 0
-    split_activities_penalty = 0
+                
+                for i, subgroup_id in enumerate(subgroup_ids):
+                    placement = self.choose_placement(a_idx, lab_rooms, sg_indices[i:i + 1], occupancy, unavailable,
+                                                      slot_weights, room_weights)
+                    if placement:
+                        d_idx, start, mask, t_idx, r_idx = placement
+                        records.append(make_session(self.problem, activity, d_idx, start, r_idx, t_idx, [subgroup_id], STUDENTS_PER_SUBGROUP, True))
+                        occupancy.reserve(d_idx, mask, teacher=t_idx, room=r_idx, subgroups=sg_indices[i:i + 1])
+                        order.placed(a_idx, d_idx, mask, t_idx, sg_indices[i:i + 1])
+        
+        return sessions_from_records(self.problem, records)
 
-    # Existing conflict checks
-    scheduled_map = defaultdict(list)  # (day_id, period_id) -> list of scheduled items
-    teacher_working_days = defaultdict(set)
-    scheduled_activities_count = defaultdict(int)
-    activity_scheduled_subgroups = defaultdict(set)
-    
-    for item in solution:
-        day_id = item["day"]["_id"]
-        teacher_id = item["teacher"]
-        activity_id = item["activity_id"]
-        subgroups = item["subgroup"]
-        activity_type = item.get("activity_type", "Lecture+Tutorial")
+    def evaluate_solution(self, solution):
+        """
+        Evaluate the solution's quality in terms of constraints.
+        Hard constraints => high penalty; soft constraints => lower penalty.
         
-        for sg in subgroups:
-            activity_scheduled_subgroups[activity_id].add(sg)
-        scheduled_activities_count[activity_id] += 1
+        Existing checks (room/teacher conflicts, capacity, duplicate scheduling, etc.)
+        are extended below with additional constraints from the DB:
+          - TC-003: Teacher preferred time (soft)
+          - TC-004: Teacher maximum consecutive periods (hard)
+          - TC-005: Student set preferred time (soft)
+          - TC-008: Minimum gap between classes for teacher (soft)
+          - TC-009: Maximum teaching hours per day for teacher (hard)
+          - TC-010: Student set maximum classes per day (soft)
+          - TC-011: Room availability (hard)
+          - TC-012: Teacher subject preference (soft)
+          - TC-014: Activity duration check (hard)
+        """
+        return self.cache.lookup(solution, self.score_solution)
+
+    def score_solution(self, solution):
+        """
+        Uncached evaluation of an encoded solution, cached by evaluate_solution.
+        """
+        return evaluate_compact(self.problem, solution)
+
+    def update_pheromone(self, all_solutions, best_solution):
+        """
+        Evaporate pheromones and deposit new pheromone on the (day, start) and
+        room of every session of the best solution. Trails never drop below
+        TAU_MIN, so no choice becomes impossible.
+        """
+        self.slot_pheromone *= (1 - EVAPORATION_RATE)
+        self.room_pheromone *= (1 - EVAPORATION_RATE)
         
-        student_count = item.get("student_count", 0)
-        capacity = item["room"]["capacity"]
-        if student_count > capacity:
-            capacity_conflicts += 1
+        best_conflicts = sum(self.evaluate_solution(best_solution)[:2])  # Hard + soft
+        deposit_amount = Q if best_conflicts == 0 else Q / best_conflicts
         
-        if not is_space_suitable(item["room"], activity_type, []):
-            room_type_mismatches += 1
+        activities = best_solution["activity"]
+        np.add.at(self.slot_pheromone, (activities, best_solution["day"], best_solution["start"]), deposit_amount)
+        np.add.at(self.room_pheromone, (activities, best_solution["room"]), deposit_amount)
+        np.maximum(self.slot_pheromone, TAU_MIN, out=self.slot_pheromone)
+        np.maximum(self.room_pheromone, TAU_MIN, out=self.room_pheromone)
+
+    def print_solution_stats(self, solution):
+        """
+        Print summary stats about a solution.
+        """
+        (
+            hard_conflicts,
+            soft_violations,
+            room_conflicts,
+            teacher_conflicts,
+            interval_conflicts,
+            teacher_availability_conflicts,
+            capacity_conflicts,
+            unscheduled_activities,
+            duplicate_activities,
+            room_type_mismatches,
+            min_days_violations,
+            max_days_violations,
+            split_activities_penalty,
+            new_hard,
+            new_soft
+        ) = self.evaluate_solution(solution)
         
-        teacher_working_days[teacher_id].add(day_id)
+        print("\nSolution Statistics:")
+        print(f"  Total scheduled entries: {len(solution)}")
+        unique_activities = set(solution["activity"].tolist())
+        print(f"  Unique activities scheduled: {len(unique_activities)}")
+        print(f"  Activities not scheduled: {unscheduled_activities}")
+        print(f"  Activities scheduled multiple times: {duplicate_activities}")
+        print(f"  Hard constraint violations: {hard_conflicts}")
+        print(f"    - Room conflicts: {room_conflicts}")
+        print(f"    - Teacher conflicts: {teacher_conflicts}")
+        print(f"    - Interval conflicts: {interval_conflicts}")
+        print(f"    - Teacher availability conflicts: {teacher_availability_conflicts}")
+        print(f"    - Room capacity conflicts: {capacity_conflicts}")
+        print(f"    - Room type mismatches: {room_type_mismatches}")
+        print(f"    - New hard penalties (TC-004, TC-009, TC-011, TC-014): {new_hard}")
+        print(f"  Soft constraint violations: {soft_violations}")
+        print(f"    - Max/min days violations: {max_days_violations + min_days_violations}")
+        print(f"    - Split activities penalty: {split_activities_penalty}")
+        print(f"    - New soft penalties (TC-003, TC-005, TC-008, TC-010, TC-012): {new_soft}")
+        
+        split_labs = np.flatnonzero(solution["split"])
+        print(f"  Lab activities split into multiple sessions: {len(split_labs)}")
+        
+        activities_per_day = defaultdict(int)
+        for d_idx in solution["day"].tolist():
+            activities_per_day[d_idx] += 1
+        
+        print("\nActivities per day:")
+        for d_idx, count in activities_per_day.items():
+            day_name = self.problem.days[d_idx].get("name", str(d_idx))
+            print(f"  {day_name}: {count}")
+        
+        teacher_counts = defaultdict(int)
+        for t_idx in solution["teacher"].tolist():
+            teacher_counts[self.problem.teacher_ids[t_idx]] += 1
+        top_teachers = sorted(teacher_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        
+        print("\nActivities per teacher (top 5):")
+        for t_id, count in top_teachers:
+            t_name = next((t["name"] for t in self.teachers if t["_id"] == t_id), str(t_id))
+            print(f"  {t_name}: {count}")
         
-        for p in item["period"]:
-            period_id = p["_id"]
-            period_index = p["index"]
-            if not get_teacher_availability(teacher_id, day_id, period_index):
-                teacher_availability_conflicts += 1
-            if p.get("is_interval", False):
-                interval_conflicts += 1
-            scheduled_map[(day_id, period_id)].append(item)
-    
-    for act_id, count in scheduled_activities_count.items():
-        activity = next((a for a in activities if a["code"] == act_id), None)
-        if activity:
-            expected_count = 1
-            activity_type = activity.get("type", "Lecture+Tutorial")
-            if activity_type == "Lab":
-                subgroup_count = len(activity.get("subgroup_ids", []))
-                expected_count = subgroup_count
-                scheduled_subgroups = len(activity_scheduled_subgroups[act_id])
-                if scheduled_subgroups < subgroup_count:
-                    split_activities_penalty += (subgroup_count - scheduled_subgroups) * 10
-            elif count > expected_count:
-                duplicate_activities += (count - expected_count)
-    
-    all_codes = set(a["code"] for a in activities)
-    scheduled_codes = set(x["activity_id"] for x in solution)
-    unscheduled_activities = len(all_codes - scheduled_codes)
-    
-    for _, items_in_slot in scheduled_map.items():
         room_usage = defaultdict(int)
-        teacher_usage = defaultdict(int)
-        for it in items_in_slot:
-            room_usage[it["room"]["code"]] += 1
-            teacher_usage[it["teacher"]] += 1
-        for count in room_usage.values():
-            if count > 1:
-                room_conflicts += (count - 1)
-        for count in teacher_usage.values():
-            if count > 1:
-                teacher_conflicts += (count - 1)
-    
-    # Soft constraints: teacher max/min days
-    max_days_constraint = next((c for c in constraints if c["code"] == "TC-002"), None)
-    min_days_constraint = next((c for c in constraints if c["code"] == "TC-003"), None)
-    
-    max_days_weight = max_days_constraint["weight"] if max_days_constraint else 5
-    min_days_weight = min_days_constraint["weight"] if min_days_constraint else 5
-    default_max_days = 5
-    default_min_days = 1
-    
-    for t_id, days_worked_set in teacher_working_days.items():
-        days_worked = len(days_worked_set)
-        teacher_max_days = max_days_constraint.get("details", {}).get(t_id, default_max_days) if max_days_constraint else default_max_days
-        teacher_min_days = min_days_constraint.get("details", {}).get(t_id, default_min_days) if min_days_constraint else default_min_days
+        for r_idx in solution["room"].tolist():
+            room_usage[self.problem.room_codes[r_idx]] += 1
+        top_rooms = sorted(room_usage.items(), key=lambda x: x[1], reverse=True)[:5]
         
-        if days_worked > teacher_max_days:
-            max_days_violations += (days_worked - teacher_max_days) * max_days_weight
-        if days_worked < teacher_min_days:
-            min_days_violations += (teacher_min_days - days_worked) * min_days_weight
-
-    # -----------------------
-    # NEW: Additional constraint checks
-    # -----------------------
-    new_hard_penalties = 0
-    new_soft_penalties = 0
-
-    # Helper dictionaries for teacher and subgroup constraints from DB
-    teacher_pref = {}
-    tc003 = next((c for c in constraints if c["code"] == "TC-003"), None)
-    if tc003:
-        for tp in tc003["details"].get("teacher_preferred_times", []):
-            teacher_pref[tp["teacher_id"]] = tp["preferred_times"]
-    
-    teacher_max_consec = {}
-    tc004 = next((c for c in constraints if c["code"] == "TC-004"), None)
-    if tc004:
-        for m in tc004["details"].get("max_consecutive_periods", []):
-            teacher_max_consec[m["teacher_id"]] = m["max_periods"]
-    
-    student_pref = {}
-    tc005 = next((c for c in constraints if c["code"] == "TC-005"), None)
-    if tc005:
-        for sp in tc005["details"].get("student_preferred_times", []):
-            student_pref[sp["subgroup_id"]] = sp["preferred_times"]
-    
-    teacher_min_gap = {}
-    tc008 = next((c for c in constraints if c["code"] == "TC-008"), None)
-    if tc008:
-        for mg in tc008["details"].get("min_gap_between_classes", []):
-            teacher_min_gap[mg["teacher_id"]] = mg["min_gap"]
-    
-    teacher_max_hours = {}
-    tc009 = next((c for c in constraints if c["code"] == "TC-009"), None)
-    if tc009:
-        for mh in tc009["details"].get("max_teaching_hours_per_day", []):
-            teacher_max_hours[mh["teacher_id"]] = mh["max_hours"]
-    
-    student_max_classes = {}
-    tc010 = next((c for c in constraints if c["code"] == "TC-010"), None)
-    if tc010:
-        for sc in tc010["details"].get("max_classes_per_day", []):
-            student_max_classes[sc["subgroup_id"]] = sc["max_classes"]
-    
-    room_unavail = {}
-    tc011 = next((c for c in constraints if c["code"] == "TC-011"), None)
-    if tc011:
-        for ru in tc011["details"].get("room_unavailability", []):
-            room_unavail[ru["room_id"]] = ru["unavailable_times"]
-    
-    teacher_subject_pref = {}
-    tc012 = next((c for c in constraints if c["code"] == "TC-012"), None)
-    if tc012:
-        for tsp in tc012["details"].get("teacher_subject_preference", []):
-            teacher_subject_pref[tsp["teacher_id"]] = tsp["preferred_subjects"]
-
-    # Build teacher blocks (per scheduled item, record start and end period indices)
-    teacher_blocks = defaultdict(lambda: defaultdict(list))  # teacher_blocks[teacher_id][day_id] = list of (start, end)
-    teacher_day_durations = defaultdict(lambda: defaultdict(int))  # Sum of durations per teacher/day
-    subgroup_day_counts = defaultdict(lambda: defaultdict(int))  # subgroup_day_counts[subgroup_id][day_id] = count
-    for item in solution:
-        day_id = item["day"]["_id"]
-        teacher_id = item["teacher"]
-        period_indices = [p["index"] for p in item["period"]]
-        start = min(period_indices)
-        end = max(period_indices)
-        teacher_blocks[teacher_id][day_id].append((start, end))
-        teacher_day_durations[teacher_id][day_id] += item["duration"]
-        # For each subgroup in this item, count class for that day
-        for sg in item["subgroup"]:
-            subgroup_day_counts[sg][day_id] += 1
-
-        # TC-003: Teacher preferred time (soft)
-        if teacher_id in teacher_pref:
-            pref_found = False
-            for pref in teacher_pref[teacher_id]:
-                if pref["day_id"] == day_id:
-                    # Check if at least one scheduled period is preferred
-                    preferred_periods = pref.get("periods", [])
-                    if any(p["_id"] in preferred_periods for p in item["period"]):
-                        pref_found = True
+        print("\nRoom utilization (top 5):")
+        for r_code, count in top_rooms:
+            r = self.problem.room_by_code(r_code) or {}
+            r_name = r.get("name", r_code)
+            r_capacity = r.get("capacity", "Unknown")
+            print(f"  {r_name} (Capacity: {r_capacity}): {count} activities")
+        
+        room_type_counts = defaultdict(int)
+        for a_idx in solution["activity"].tolist():
+            activity_type = self.problem.activities[a_idx].get("type", "Lecture+Tutorial")
+            room_type_counts[activity_type] += 1
+        
+        print("\nActivity types distribution:")
+        for act_type, count in room_type_counts.items():
+            print(f"  {act_type}: {count}")
+
+    def construct_and_score(self):
+        """
+        Build and evaluate one ant's solution in this process.
+        Returns (solution, total_fitness).
+        """
+        solution = self.construct_solution()
+        hard_c, soft_c, *_ = self.evaluate_solution(solution)
+        return solution, hard_c + soft_c
+
+    def score_ants(self, executor, solutions, chunksize):
+        """
+        (solution, total_fitness) of ants built in the pool. The cache is
+        looked up here, so only solutions not scored before in the run are
+        sent back to the workers, and the run stats count every ant.
+        """
+        def score(pending):
+            return executor.map(score_solution, pending, chunksize=chunksize)
+        results = self.cache.lookup_many([solution_key(solution) for solution in solutions], solutions, score)
+        return [(solution, hard_c + soft_c) for solution, (hard_c, soft_c, *_) in zip(solutions, results)]
+
+    def run(self, workers=NUM_WORKERS, time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
+        """
+        Main entry to run the ACO-based timetable scheduling.
+        With workers > 1 the ants of each iteration are built in a process pool
+        and those missing from the fitness cache are scored there too (see
+        score_ants); the pheromone update still happens here, between iterations.
+        time_limit (seconds) and max_evaluations (ants) bound the run; when
+        either runs out the best solution found so far is returned.
+        stopping (an EarlyStopping) ends the run once the colony has converged.
+        warm_start (scheduled items of a stored timetable) is mapped onto the
+        current activities, repaired, and becomes the first best solution and
+        the first pheromone deposit.
+        """
+        if self.problem is None:
+            self.get_data()
+        self.initialize_heuristic()
+        self.initialize_pheromone()
+        self.cache = FitnessCache()
+        budget = Budget(time_limit, max_evaluations)
+        stopping = stopping or EarlyStopping()
+        self.stats = {"iterations": 0, "stop_reason": "completed"}
+        
+        best_solution = None
+        best_score = float('inf')
+        
+        if warm_start:
+            seed = warm_start_sessions(self.problem, warm_start)
+            best_solution = self.construct_solution(seed)
+            best_score = sum(self.evaluate_solution(best_solution)[:2])
+            budget.spend()
+            self.update_pheromone([], best_solution)
+            self.stats["warm_start_sessions"] = len(seed)
+            print(f"Warm start: {len(seed)} stored sessions kept. Score = {best_score}")
+        
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.data(),))
+        
+        try:
+            for iteration in range(NUM_ITERATIONS):
+                if executor:
+                    seeds = [random.getrandbits(32) for _ in range(NUM_ANTS)]
+                    snapshot = (self.slot_pheromone, self.room_pheromone)
+                    chunksize = max(1, NUM_ANTS // (workers * 4))
+                    solutions = list(executor.map(construct_ant, seeds, [snapshot] * NUM_ANTS, chunksize=chunksize))
+                    ants = self.score_ants(executor, solutions, chunksize)
+                else:
+                    ants = (
+                        self.construct_and_score() for _ in range(NUM_ANTS)
+                    )
+                
+                all_solutions = []
+                for solution, total_fitness in ants:
+                    budget.spend()
+                    all_solutions.append((solution, total_fitness))
+                    
+                    if total_fitness < best_score or best_solution is None:
+                        best_solution = solution
+                        best_score = total_fitness
+                        print(f"New best solution! Score = {best_score}")
+                    
+                    if budget.exhausted():
                         break
-            if not pref_found:
-                new_soft_penalties += tc003["weight"]
-
-        # TC-012: Teacher subject preference (soft)
-        if teacher_id in teacher_subject_pref:
-            if item["subject"] not in teacher_subject_pref[teacher_id]:
-                new_soft_penalties += tc012["weight"]
-
-        # TC-014: Activity duration check (hard)
-        expected_duration = item["duration"]
-        actual_duration = len(item["period"])
-        if actual_duration != expected_duration:
-            new_hard_penalties += abs(actual_duration - expected_duration) * 10
-
-        # TC-011: Room availability (hard)
-        room_code = item["room"]["code"]
-        if room_code in room_unavail:
-            for unavail in room_unavail[room_code]:
-                if unavail["day_id"] == day_id:
-                    unavailable_periods = unavail.get("periods", [])
-                    if any(p["_id"] in unavailable_periods for p in item["period"]):
-                        new_hard_penalties += tc011["weight"]
-
-        # TC-005: Student set preferred time (soft)
-        for sg in item["subgroup"]:
-            if sg in student_pref:
-                pref_found = False
-                for pref in student_pref[sg]:
-                    if pref["day_id"] == day_id:
-                        preferred_periods = pref.get("periods", [])
-                        if any(p["_id"] in preferred_periods for p in item["period"]):
-                            pref_found = True
-                            break
-                if not pref_found:
-                    new_soft_penalties += tc005["weight"]
-
-    # TC-004: Teacher max consecutive periods (hard)
-    for teacher_id, days_blocks in teacher_blocks.items():
-        if teacher_id in teacher_max_consec:
-            allowed = teacher_max_consec[teacher_id]
-            for day_id, blocks in days_blocks.items():
-                for (start, end) in blocks:
-                    block_length = end - start + 1
-                    if block_length > allowed:
-                        new_hard_penalties += (block_length - allowed) * tc004["weight"]
-
-    # TC-008: Min gap between classes for teacher (soft)
-    for teacher_id, day_blocks in teacher_blocks.items():
-        if teacher_id in teacher_min_gap:
-            min_gap = teacher_min_gap[teacher_id]
-            for day_id, blocks in day_blocks.items():
-                # Sort blocks by start time
-                blocks_sorted = sorted(blocks, key=lambda b: b[0])
-                for i in range(len(blocks_sorted)-1):
-                    gap = blocks_sorted[i+1][0] - blocks_sorted[i][1] - 1
-                    if gap < min_gap:
-                        new_soft_penalties += (min_gap - gap) * tc008["weight"]
-
-    # TC-009: Max teaching hours per day (hard)
-    for teacher_id, day_durations in teacher_day_durations.items():
-        if teacher_id in teacher_max_hours:
-            max_hours = teacher_max_hours[teacher_id]
-            for day_id, total in day_durations.items():
-                if total > max_hours:
-                    new_hard_penalties += (total - max_hours) * tc009["weight"]
-
-    # TC-010: Student set max classes per day (soft)
-    for sg, day_counts in subgroup_day_counts.items():
-        if sg in student_max_classes:
-            max_classes = student_max_classes[sg]
-            for day_id, count in day_counts.items():
-                if count > max_classes:
-                    new_soft_penalties += (count - max_classes) * tc010["weight"]
+                
+                stop_reason = budget.exhausted()
+                if stop_reason and len(all_solutions) < NUM_ANTS:
+                    # Out of budget in the middle of the iteration
+                    self.stats["stop_reason"] = stop_reason
+                    break
+                self.update_pheromone([sol[0] for sol in all_solutions], best_solution)
+                print(f"Iteration {iteration+1} done. Best Score = {best_score}")
+                self.stats["iterations"] = iteration + 1
+                if self.on_iteration:
+                    self.on_iteration(iteration+1, best_score)
+                if not stop_reason:
+                    stop_reason = stopping.check(best_score, lambda: self.evaluate_solution(best_solution)[:2])
+                if stop_reason and iteration + 1 < NUM_ITERATIONS:
+                    self.stats["stop_reason"] = stop_reason
+                    break
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+        
+        print("\nFinal solution discovered:")
+        self.print_solution_stats(best_solution)
+        self.stats.update(self.cache.stats(), **budget.stats())
+        print(f"  Fitness cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        print(f"  Iterations completed: {self.stats['iterations']} ({self.stats['stop_reason']})")
+        
+        # Store the latest score in the database
+        from routers.timetable_routes import store_latest_score
+        store_latest_score(best_score, "CO")
+        
+        return EncodedSolution(self.problem, best_solution)
 
-    hard_constraint_weight = 10
-    base_hard = room_conflicts + teacher_conflicts + interval_conflicts + teacher_availability_conflicts + capacity_conflicts + unscheduled_activities + duplicate_activities + room_type_mismatches
-    hard_conflicts = hard_constraint_weight * base_hard + new_hard_penalties
-    soft_violations = max_days_violations + min_days_violations + split_activities_penalty + new_soft_penalties
+worker_solver = None  # AntColonySolver of a pool worker process
 
-    # --- UPDATED: Return 15 values instead of 13 ---
-    return (
-        hard_conflicts,
-        soft_violations,
-        room_conflicts,
-        teacher_conflicts,
-        interval_conflicts,
-        teacher_availability_conflicts,
-        capacity_conflicts,
-        unscheduled_activities,
-        duplicate_activities,
-        room_type_mismatches,
-        min_days_violations,
-        max_days_violations,
-        split_activities_penalty,
-        new_hard_penalties,
-        new_soft_penalties
-    )
+def init_worker(data):
+    """
+    Process pool initializer: install the read-only instance loaded by the parent
+    so workers never touch the database.
+    """
+    global worker_solver
+    worker_solver = AntColonySolver()
+    worker_solver.set_data(data)
+    worker_solver.initialize_heuristic()
 
-def update_pheromone(all_solutions, best_solution):
+def construct_ant(seed, pheromone_snapshot):
     """
-    Evaporate pheromones and deposit new pheromone for the best solution.
+    Build one ant's solution in a worker process; the parent scores it with
+    score_solution unless its cache already holds the result.
     """
-    global pheromone
-    for activity_code in pheromone:
-        pheromone[activity_code] *= (1 - EVAPORATION_RATE)
-    
-    best_conflicts = sum(evaluate_solution(best_solution)[:2])  # Hard + soft
-    deposit_amount = Q if best_conflicts == 0 else Q / best_conflicts
-    
-    for scheduled_item in best_solution:
-        pheromone[scheduled_item["activity_id"]] += deposit_amount
+    if seed is not None:
+        random.seed(seed)
+    worker_solver.slot_pheromone, worker_solver.room_pheromone = pheromone_snapshot
+    return worker_solver.construct_solution()
 
-def print_solution_stats(solution):
+def score_solution(solution):
     """
-    Print summary stats about a solution.
+    Uncached evaluation of an encoded solution in a worker process.
     """
-    (
-        hard_conflicts,
-        soft_violations,
-        room_conflicts,
-        teacher_conflicts,
-        interval_conflicts,
-        teacher_availability_conflicts,
-        capacity_conflicts,
-        unscheduled_activities,
-        duplicate_activities,
-        room_type_mismatches,
-        min_days_violations,
-        max_days_violations,
-        split_activities_penalty,
-        new_hard,
-        new_soft
-    ) = evaluate_solution(solution)
-    
-    print("\nSolution Statistics:")
-    print(f"  Total scheduled entries: {len(solution)}")
-    unique_activities = {s['activity_id'] for s in solution}
-    print(f"  Unique activities scheduled: {len(unique_activities)}")
-    print(f"  Activities not scheduled: {unscheduled_activities}")
-    print(f"  Activities scheduled multiple times: {duplicate_activities}")
-    print(f"  Hard constraint violations: {hard_conflicts}")
-    print(f"    - Room conflicts: {room_conflicts}")
-    print(f"    - Teacher conflicts: {teacher_conflicts}")
-    print(f"    - Interval conflicts: {interval_conflicts}")
-    print(f"    - Teacher availability conflicts: {teacher_availability_conflicts}")
-    print(f"    - Room capacity conflicts: {capacity_conflicts}")
-    print(f"    - Room type mismatches: {room_type_mismatches}")
-    print(f"    - New hard penalties (TC-004, TC-009, TC-011, TC-014): {new_hard}")
-    print(f"  Soft constraint violations: {soft_violations}")
-    print(f"    - Max/min days violations: {max_days_violations + min_days_violations}")
-    print(f"    - Split activities penalty: {split_activities_penalty}")
-    print(f"    - New soft penalties (TC-003, TC-005, TC-008, TC-010, TC-012): {new_soft}")
-    
-    split_labs = [s for s in solution if s.get("is_split", False)]
-    print(f"  Lab activities split into multiple sessions: {len(split_labs)}")
-    
-    activities_per_day = defaultdict(int)
-    for s in solution:
-        activities_per_day[s["day"]["_id"]] += 1
-    
-    print("\nActivities per day:")
-    for d_id, count in activities_per_day.items():
-        day_name = next((d["name"] for d in days if d["_id"] == d_id), str(d_id))
-        print(f"  {day_name}: {count}")
-    
-    teacher_counts = defaultdict(int)
-    for s in solution:
-        teacher_counts[s["teacher"]] += 1
-    top_teachers = sorted(teacher_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    print("\nActivities per teacher (top 5):")
-    for t_id, count in top_teachers:
-        t_name = next((t["name"] for t in teachers if t["_id"] == t_id), str(t_id))
-        print(f"  {t_name}: {count}")
-    
-    room_usage = defaultdict(int)
-    for s in solution:
-        room_usage[s["room"]["code"]] += 1
-    top_rooms = sorted(room_usage.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    print("\nRoom utilization (top 5):")
-    for r_code, count in top_rooms:
-        r = next((r for r in facilities if r["code"] == r_code), {})
-        r_name = r.get("name", r_code)
-        r_capacity = r.get("capacity", "Unknown")
-        print(f"  {r_name} (Capacity: {r_capacity}): {count} activities")
-    
-    room_type_counts = defaultdict(int)
-    for s in solution:
-        activity_type = s.get("activity_type", "Lecture+Tutorial")
-        room_type_counts[activity_type] += 1
-    
-    print("\nActivity types distribution:")
-    for act_type, count in room_type_counts.items():
-        print(f"  {act_type}: {count}")
+    return worker_solver.score_solution(solution)
 
-def generate_co():
+def generate_co(workers=NUM_WORKERS, time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
     """
-    Main entry to run the ACO-based timetable scheduling.
+    Run ACO with a fresh solver and return the best timetable.
     """
-    get_data()
-    update_activity_durations()  # NEW: update activities from TC-014
-    initialize_heuristic()
-    
-    best_solution = None
-    best_score = float('inf')
-    
-    for iteration in range(NUM_ITERATIONS):
-        all_solutions = []
-        
-        for ant in range(NUM_ANTS):
-            solution = construct_solution()
-            hard_c, soft_c, *_ = evaluate_solution(solution)
-            total_fitness = hard_c + soft_c
-            all_solutions.append((solution, total_fitness))
-            
-            if total_fitness < best_score or best_solution is None:
-                best_solution = solution
-                best_score = total_fitness
-                print(f"New best solution! Score = {best_score}")
-            
-        update_pheromone([sol[0] for sol in all_solutions], best_solution)
-        print(f"Iteration {iteration+1} done. Best Score = {best_score}")
-    
-    print("\nFinal solution discovered:")
-    print_solution_stats(best_solution)
-    
-    # Store the latest score in the database
-    from routers.timetable_routes import store_latest_score
-    store_latest_score(best_score, "CO")
-    
-    return best_solution
+    return AntColonySolver().run(workers, time_limit, max_evaluations, stopping, warm_start)
@@ -1,4 +1,7 @@
 from generator.data_collector import *
+from generator.problem import ProblemInstance
+from generator.solution import encode_solution, item_resolves
+from generator.evaluation.engine import evaluate_breakdown
 import random
 import numpy as np
 from skfuzzy import control as ctrl
@@ -6,34 +9,21 @@ import skfuzzy as fuzz
 from collections import defaultdict
 
 
-def calculate_conflicts(timetable):
-    teacher_schedule = {}
-    room_schedule = {}
-    conflicts = 0
+def timetable_breakdown(problem, timetable):
+    """
+    Per-constraint breakdown of a stored timetable from the shared evaluation engine.
+    Sessions that item_resolves rejects (an activity, day, period, room, teacher
+    or subgroup deleted since the timetable was saved, or an RL block wrapping
+    around the end of the day) are left out and counted as "stale_sessions".
+    """
+    items = timetable["timetable"]
+    current = [item for item in items if item_resolves(problem, item)]
+    breakdown = evaluate_breakdown(problem, encode_solution(problem, current))
+    breakdown["stale_sessions"] = len(items) - len(current)
+    return breakdown
 
-    for entry in timetable["timetable"]:
-        day = entry["day"]["name"]
-        teacher = entry["teacher"]
-        room = entry["room"]["_id"]
-        periods = [period["name"] for period in entry["period"]]
-
-        if teacher not in teacher_schedule:
-            teacher_schedule[teacher] = {}
-        if day not in teacher_schedule[teacher]:
-            teacher_schedule[teacher][day] = []
-        if any(period in teacher_schedule[teacher][day] for period in periods):
-            conflicts += 1
-        teacher_schedule[teacher][day].extend(periods)
-
-        if room not in room_schedule:
-            room_schedule[room] = {}
-        if day not in room_schedule[room]:
-            room_schedule[room][day] = []
-        if any(period in room_schedule[room][day] for period in periods):
-            conflicts += 1
-        room_schedule[room][day].extend(periods)
-
-    return conflicts
+def calculate_conflicts(breakdown):
+    return breakdown["teacher_conflicts"] + breakdown["room_conflicts"]
 
 def calculate_room_utilization(timetable):
     total_utilization = 0
@@ -47,24 +37,8 @@ def calculate_room_utilization(timetable):
 
     return total_utilization / total_entries if total_entries > 0 else 0
 
-def calculate_period_overlap(timetable):
-    subgroup_schedule = {}
-    overlaps = 0
-
-    for entry in timetable["timetable"]:
-        day = entry["day"]["name"]
-        subgroup = entry["subgroup"]
-        periods = [period["name"] for period in entry["period"]]
-
-        if subgroup not in subgroup_schedule:
-            subgroup_schedule[subgroup] = {}
-        if day not in subgroup_schedule[subgroup]:
-            subgroup_schedule[subgroup][day] = []
-        if any(period in subgroup_schedule[subgroup][day] for period in periods):
-            overlaps += 1
-        subgroup_schedule[subgroup][day].extend(periods)
-
-    return overlaps
+def calculate_period_overlap(breakdown):
+    return breakdown["subgroup_conflicts"]
 
 
 conflicts = ctrl.Antecedent(np.arange(0, 11, 1), 'conflicts')
@@ -110,6 +84,7 @@ def evaluate_timetable(conflict_count, utilization, overlap_count):
 
 def evaluate():
     timetables = get_timetables()
+    problem = ProblemInstance.from_data_collector()
     results_by_algorithm = defaultdict(list)
 
     algorithm_scores = defaultdict(list) 
@@ -125,15 +100,18 @@ def evaluate():
 
         print(f"Results for Semester: {semester}")
         for timetable in schedules:
-            conflict_count = calculate_conflicts(timetable)
+            breakdown = timetable_breakdown(problem, timetable)
+            conflict_count = calculate_conflicts(breakdown)
             utilization = calculate_room_utilization(timetable)
-            overlap_count = calculate_period_overlap(timetable)
+            overlap_count = calculate_period_overlap(breakdown)
             score = evaluate_timetable(conflict_count, utilization, overlap_count)
 
             algorithm = timetable["algorithm"]
             algorithm_scores[algorithm].append(score)
 
             print(f"  Algorithm: {algorithm}, Code: {timetable['code']}, Score: {score:.2f}")
+            if breakdown["stale_sessions"]:
+                print(f"    {breakdown['stale_sessions']} sessions refer to deleted data and were not scored")
 
             if score > best_score:
                 best_score = score
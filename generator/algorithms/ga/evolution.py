@@ -0,0 +1,60 @@
+from deap import tools, algorithms
+
+def ea_mu_plus_lambda(population, toolbox, mu, lambda_, cxpb, mutpb, ngen, budget,
+                      stats=None, halloffame=None, verbose=True, stopping=None):
+    """
+    deap.algorithms.eaMuPlusLambda that stops between generations once the
+    Budget is exhausted or the EarlyStopping rules say the population has
+    converged. Evaluated individuals are charged to the budget. The score
+    checked by the stopping rules is the sum of the best individual's
+    objectives, all of which count as hard violations.
+
+    Returns (population, logbook, stop_reason); stop_reason is "completed"
+    when all ngen generations ran. The number of completed generations is
+    len(logbook) - 1.
+    """
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+
+    # Evaluate the individuals with an invalid fitness
+    invalid_ind = [ind for ind in population if not ind.fitness.valid]
+    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    for ind, fit in zip(invalid_ind, fitnesses):
+        ind.fitness.values = fit
+    budget.spend(len(invalid_ind))
+
+    if halloffame is not None:
+        halloffame.update(population)
+
+    record = stats.compile(population) if stats is not None else {}
+    logbook.record(gen=0, nevals=len(invalid_ind), **record)
+    if verbose:
+        print(logbook.stream)
+
+    stop_reason = "completed"
+    for gen in range(1, ngen + 1):
+        best = min(sum(ind.fitness.values) for ind in population)
+        exhausted = budget.exhausted() or (stopping and stopping.check(best, lambda: (best, 0)))
+        if exhausted:
+            stop_reason = exhausted
+            break
+
+        offspring = algorithms.varOr(population, toolbox, lambda_, cxpb, mutpb)
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        budget.spend(len(invalid_ind))
+
+        if halloffame is not None:
+            halloffame.update(offspring)
+
+        population[:] = toolbox.select(population + offspring, mu)
+
+        record = stats.compile(population) if stats is not None else {}
+        logbook.record(gen=gen, nevals=len(invalid_ind), **record)
+        if verbose:
+            print(logbook.stream)
+
+    return population, logbook, stop_reason
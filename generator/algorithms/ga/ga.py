@@ -1,33 +1,52 @@
 from generator.data_collector import *
+from generator.problem import ProblemInstance
+from generator.solution import encode_solution, decode_solution
+from generator.warm_start import warm_start_sessions, WARM_SHARE
+from generator.conflict_graph import conflict_graph, dsatur_construction, DSATUR_SHARE
+from generator.evaluation.engine import evaluate_breakdown
+from generator.evaluation.batch import BatchEvaluator
+from generator.evaluation.cache import FitnessCache, solution_key
+from generator.algorithms.ga.evolution import ea_mu_plus_lambda
+from generator.budget import Budget
+from generator.stopping import EarlyStopping
 from deap import base, creator, tools, algorithms
 import random
 
+NUM_WORKERS = 1  # processes evaluating individuals; 1 keeps everything in this process
+
 days = []
 facilities = []
 modules = []
 periods = []
-students = []
+student_counts = {}
 teachers = []
 years = []
 activities = []
-
-def get_data():
-    global days, facilities, modules, periods, students, teachers, years, activities
-    days =  get_days()
-    facilities =  get_spaces()
-    modules =  get_modules()
-    periods =  get_periods()
-    students =  get_students()
-    teachers =  get_teachers()
-    years =  get_years()
-    activities =  get_activities()
+problem = None  # ProblemInstance compiled from the lists above
+cache = FitnessCache()  # objectives of the individuals evaluated in this process
+run_stats = {}  # statistics of the last generate_ga run
+
+def get_data(snapshot=None):
+    global days, facilities, modules, periods, student_counts, teachers, years, activities, problem
+    if snapshot is None:
+        snapshot = load_snapshot()
+    days =  snapshot["days"]
+    facilities =  snapshot["spaces"]
+    modules =  snapshot["modules"]
+    periods =  snapshot["periods"]
+    student_counts =  snapshot["student_counts"]
+    teachers =  snapshot["teachers"]
+    years =  snapshot["years"]
+    activities =  snapshot["activities"]
+    problem = ProblemInstance(days, periods, facilities, activities, teachers=teachers, student_counts=student_counts,
+                              modules=modules, years=years)
 
 def print_first():
     print(days[0])
     print(facilities[0])
     print(modules[0])
     print(periods[0])
-    print(students[0])
+    print(student_counts)
     print(teachers[0])
     print(years[0])
     print(activities[0])
@@ -38,98 +57,113 @@ creator.create("Individual", list, fitness=creator.FitnessMulti)
 toolbox = base.Toolbox()
 
 def get_num_students_per_activity(activity_code):
-    module_code = next((activity["subject"] for activity in activities if activity["code"] == activity_code), None)
-    if not module_code:
+    activity = problem.activity_by_code(activity_code)
+    if not activity:
         return 0
 
-    return len([student for student in students if module_code in student["subjects"]])
+    return problem.subject_demand(activity["subject"])
     
 
 def generate_individual():
+    return [generate_gene(activity) for activity in activities]
+
+def generate_gene(activity):
+    num_of_students = get_num_students_per_activity(activity["code"])
+    
+    room = random.choice([x for x in facilities if x["capacity"] >= num_of_students])
+    
+    day = random.choice(days)
+
+    teacher = random.choice(activity["teacher_ids"])
+            
+    period_start = random.choice(periods[:len(periods) - activity["duration"] - 1])
+    
+    period = [period_start]
+    for i in range(1, activity["duration"]):
+        next_period = periods[periods.index(period_start) + i]
+        period.append(next_period)
+    
+    gene = {
+        "subgroup": activity["subgroup_ids"][0],
+        "activity_id": activity["code"],
+        "day": day,
+        "period": period,
+        "room": room,
+        "teacher": teacher,
+        "duration": activity["duration"],
+        "subject": activity["subject"]
+    }
+    
+    activity["periods_assigned"] = activity.get("periods_assigned", []) + period
+
+    return gene
+
+def warm_individual(seed):
+    """
+    Individual taking each activity's placement from encoded sessions (a warm
+    start or a DSATUR construction), with a random gene for the activities
+    they leave out.
+    """
+    placed = {item["activity_id"]: item for item in decode_solution(problem, seed)}
     individual = []
     for activity in activities:
-        num_of_students = get_num_students_per_activity(activity["code"])
-        
-        room = random.choice([x for x in facilities if x["capacity"] >= num_of_students])
-        
-        day = random.choice(days)
-
-        teacher = random.choice(activity["teacher_ids"])
-                
-        period_start = random.choice(periods[:len(periods) - activity["duration"] - 1])
-        
-        period = [period_start]
-        for i in range(1, activity["duration"]):
-            next_period = periods[periods.index(period_start) + i]
-            period.append(next_period)
-        
+        item = placed.get(activity["code"])
+        if item is None:
+            individual.append(generate_gene(activity))
+            continue
         individual.append({
             "subgroup": activity["subgroup_ids"][0],
             "activity_id": activity["code"],
-            "day": day,
-            "period": period,
-            "room": room,
-            "teacher": teacher,
+            "day": item["day"],
+            "period": item["period"],
+            "room": item["room"],
+            "teacher": item["teacher"],
             "duration": activity["duration"],
             "subject": activity["subject"]
         })
-        
-        activity["periods_assigned"] = activity.get("periods_assigned", []) + period
-    
     return individual
 
 toolbox.register("individual", tools.initIterate, creator.Individual, generate_individual)
 toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
 
-def evaluate(individual):
-    room_conflicts = 0
-    teacher_conflicts = 0
-    interval_conflicts = 0
-    period_conflicts = 0
-
-    scheduled_activities = {}
-    interval_usage = {}
-
-    for schedule in individual:
-        key = (schedule["day"]["_id"], schedule["period"][0]["_id"])
-        if key not in scheduled_activities:
-            scheduled_activities[key] = []
-        scheduled_activities[key].append(schedule)
-        for per in schedule["period"]:
-            if per["is_interval"]:
-                interval_usage[per["_id"]] = interval_usage.get(per["_id"], 0) + 1
-
-    for key, scheduled in scheduled_activities.items():
-        rooms_used = {}
-        teachers_involved = []
-        periods_used = {}
-
-        
-        for activity in scheduled:
-            room = activity["room"]
-            if room["code"] in rooms_used:
-                rooms_used[room["code"]] += 1
-            else:
-                rooms_used[room["code"]] = 1
-
-            teachers_involved.append(activity["teacher"])
-
-            for per in activity["period"]:
-                periods_used[per["_id"]] = periods_used.get(per["_id"], 0) + 1
-
-        for room, count in rooms_used.items():
-            if count > 1: 
-                room_conflicts += count - 1
-
-        teacher_conflicts += len(teachers_involved) - len(set(teachers_involved))
-
-    interval_conflicts = sum(interval_usage.values())
-    period_conflicts = sum(periods_used.values())
-
-    return teacher_conflicts, room_conflicts, interval_conflicts, period_conflicts
+def set_problem(instance):
+    """
+    Install a compiled ProblemInstance, e.g. in the workers evaluating individuals.
+    """
+    global problem, cache
+    problem = instance
+    cache = FitnessCache()
 
+def objectives(sessions):
+    """
+    Objectives of an encoded individual from the shared evaluation engine:
+    teacher, room, interval and subgroup conflicts.
+    """
+    breakdown = evaluate_breakdown(problem, sessions)
+    return (breakdown["teacher_conflicts"], breakdown["room_conflicts"],
+            breakdown["interval_conflicts"], breakdown["subgroup_conflicts"])
 
+def evaluate(individual):
+    """
+    Objectives of one individual, cached in this process.
+    """
+    return cache.lookup(encode_solution(problem, individual), objectives)
+
+def cached_map(evaluator):
+    """
+    toolbox.map for a run. Evaluations are looked up in this process's cache
+    first, and only individuals not scored yet in the run are encoded and
+    sent to the evaluator's workers, so the cache (and its counters) covers
+    the whole run however many workers there are.
+    """
+    def map_cached(func, individuals):
+        if func is not toolbox.evaluate:
+            return evaluator.map(func, individuals)
+        encoded = [encode_solution(problem, individual) for individual in individuals]
+        keys = [solution_key(sessions) for sessions in encoded]
+        return evaluator.cached(keys, encoded, lambda pending: evaluator.map(objectives, pending))
+    return map_cached
 
 
 toolbox.register("evaluate", evaluate)
@@ -137,35 +171,57 @@ toolbox.register("mate", tools.cxTwoPoint)
 toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.2)
 toolbox.register("select", tools.selNSGA2)
 
-def generate_ga():
-    get_data()
+def generate_ga(snapshot=None, workers=NUM_WORKERS, time_limit=None, max_evaluations=None, stopping=None,
+                warm_start=None):
+    get_data(snapshot)
     print_first()
+    set_problem(problem)  # fresh cache for this run
+    budget = Budget(time_limit, max_evaluations)
     
     pop_size = 100
     generations = 30
 
-    pop = toolbox.population(n=pop_size)
+    # With a warm start the first WARM_SHARE of the population comes from the stored timetable
+    seed = warm_start_sessions(problem, warm_start) if warm_start else None
+    n_warm = int(pop_size * WARM_SHARE) if seed is not None else 0
+    pop = [creator.Individual(warm_individual(seed)) for _ in range(n_warm)]
+    # DSATUR_SHARE more start from greedy DSATUR timetables instead of random genes
+    n_dsatur = int(pop_size * DSATUR_SHARE)
+    graph = conflict_graph(problem)
+    pop += [creator.Individual(warm_individual(dsatur_construction(problem, graph))) for _ in range(n_dsatur)]
+    pop += toolbox.population(n=pop_size - n_warm - n_dsatur)
     hof = tools.HallOfFame(1)  
 
     stats = tools.Statistics(lambda ind: ind.fitness.values)
     stats.register("teacher_conflicts", lambda fits: min(fit[0] for fit in fits))
     stats.register("room_conflicts", lambda fits: min(fit[1] for fit in fits))
     stats.register("interval_conflicts", lambda fits: min(fit[2] for fit in fits))
-    stats.register("period_conflicts", lambda fits: min(fit[3] for fit in fits))
-
-    pop, log = algorithms.eaMuPlusLambda(
-        pop,
-        toolbox,
-        mu=pop_size,
-        lambda_=pop_size,
-        cxpb=0.7,
-        mutpb=0.2,
-        ngen=generations,
-        stats=stats,
-        halloffame=hof,
-        verbose=True,
-    )
-
+    stats.register("subgroup_conflicts", lambda fits: min(fit[3] for fit in fits))
+
+    with BatchEvaluator(problem, workers, initializer=set_problem, cache=cache) as evaluator:
+        toolbox.register("map", cached_map(evaluator))
+        pop, log, stop_reason = ea_mu_plus_lambda(
+            pop,
+            toolbox,
+            mu=pop_size,
+            lambda_=pop_size,
+            cxpb=0.7,
+            mutpb=0.2,
+            ngen=generations,
+            budget=budget,
+            stopping=stopping or EarlyStopping(),
+            stats=stats,
+            halloffame=hof,
+            verbose=True,
+        )
+
+
+    run_stats.clear()
+    run_stats.update(cache.stats(), iterations=len(log) - 1, stop_reason=stop_reason, **budget.stats())
+    if seed is not None:
+        run_stats["warm_start_sessions"] = len(seed)
+    print(f"Fitness cache: {cache.hits} hits, {cache.misses} misses")
+    print(f"Generations completed: {run_stats['iterations']} ({stop_reason})")
 
     li = [x for x in hof[0]]
 
@@ -0,0 +1,141 @@
+import random
+from generator.solution import EncodedSolution, encode_solution, item_resolves
+from generator.evaluation.delta import DeltaEvaluator, F_ACTIVITY, F_DAY, F_TEACHER, F_SUBGROUPS
+from generator.repair import session_templates, placements, best_placement
+from generator.budget import Budget
+
+LNS_TIME_LIMIT = 10   # seconds of post-optimization per timetable
+DESTROY_SIZE = 6      # activities removed and rebuilt per round
+LNS_CANDIDATES = 50   # placements scored per rebuilt session
+MISSING_FOCUS = 0.5   # share of rounds that clear room around an unscheduled activity
+RELATIONS = ["subgroup", "teacher", "day"]
+
+class LargeNeighbourhoodSearch:
+    """
+    Large neighbourhood search on a finished timetable.
+
+    Each round removes a cluster of related activities (sharing a subgroup,
+    a teacher or a day with a random session, or a subgroup or teacher with
+    an activity that has no sessions), then rebuilds the unscheduled
+    activities and the removed ones at their best scoring clash-free
+    placements (see generator.repair). The round is kept if the fitness did
+    not get worse and undone otherwise; both are incremental on a
+    DeltaEvaluator, so a round costs only the sessions it touches.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.stats = {}  # statistics of the last run
+
+    def related_activities(self, state, relation, subgroups=(), teachers=(), day=None):
+        """
+        Up to DESTROY_SIZE random activities with a session that uses one of
+        the subgroups or teachers, or falls on the day, for the given relation.
+        """
+        subgroups, teachers = set(subgroups), set(teachers)
+        related = set()
+        for record in state.slots:
+            if record is None:
+                continue
+            if relation == "subgroup":
+                match = not subgroups.isdisjoint(record[F_SUBGROUPS])
+            elif relation == "teacher":
+                match = record[F_TEACHER] in teachers
+            else:
+                match = record[F_DAY] == day
+            if match:
+                related.add(record[F_ACTIVITY])
+        return random.sample(sorted(related), min(len(related), DESTROY_SIZE))
+
+    def destroy_cluster(self, state, missing):
+        """
+        Activities to remove this round: related to an unscheduled activity
+        (MISSING_FOCUS of the rounds, when there are any) or to a random session.
+        """
+        relation = random.choice(RELATIONS)
+        if missing and random.random() < MISSING_FOCUS:
+            a_idx = random.choice(missing)
+            return self.related_activities(state, relation if relation != "day" else "teacher",
+                                           self.problem.activity_subgroup_list[a_idx].tolist(),
+                                           self.problem.activity_teacher_list[a_idx].tolist())
+        record = state.slots[random.choice(state.live_slots())]
+        return [record[F_ACTIVITY]] + self.related_activities(state, relation, record[F_SUBGROUPS],
+                                                              [record[F_TEACHER]], record[F_DAY])[:DESTROY_SIZE - 1]
+
+    def rebuild(self, state, activities, budget):
+        """
+        Place the sessions of each activity, in order, at its best scoring
+        placement. Returns the undo tokens of the placements.
+        """
+        problem = self.problem
+        tokens = []
+        for a_idx in activities:
+            for template in session_templates(problem, a_idx):
+                best = best_placement(state, None, placements(state, a_idx, template), budget, LNS_CANDIDATES)
+                if best is None:
+                    break
+                tokens.append(state.apply([(None, best[1])]))
+        return tokens
+
+    def missing_activities(self, state):
+        scheduled = {record[F_ACTIVITY] for record in state.slots if record is not None}
+        return [a_idx for a_idx in range(self.problem.n_activities) if a_idx not in scheduled]
+
+    def run(self, sessions, time_limit=LNS_TIME_LIMIT, max_evaluations=None):
+        """
+        Improve an encoded solution until the budget runs out and return the
+        improved encoded solution.
+        """
+        problem = self.problem
+        budget = Budget(time_limit, max_evaluations)
+        state = DeltaEvaluator(problem, sessions)
+        before = state.fitness()
+        rounds = accepted = improved = 0
+        while state.live_slots() and not budget.exhausted():
+            rounds += 1
+            current = state.fitness()
+            missing = self.missing_activities(state)
+            cluster = set(self.destroy_cluster(state, missing)) - {-1}
+            destroyed = [slot for slot, record in enumerate(state.slots)
+                         if record is not None and record[F_ACTIVITY] in cluster]
+            tokens = [state.apply([(slot, None) for slot in destroyed])]
+            # Unscheduled activities go first, then the largest of the removed ones
+            order = sorted(cluster, key=lambda a: (-problem.activity_subgroup_count[a], random.random()))
+            tokens += self.rebuild(state, missing + order, budget)
+            if state.fitness() <= current:
+                accepted += 1
+                improved += state.fitness() < current
+            else:
+                for token in reversed(tokens):
+                    state.undo(token)
+        self.stats = {
+            "rounds": rounds,
+            "accepted": accepted,
+            "improved": improved,
+            "score_before": before,
+            "score_after": state.fitness(),
+            "stop_reason": budget.exhausted() or "completed",
+        }
+        self.stats.update(budget.stats())
+        return state.sessions()
+
+def optimize_lns(solution, problem=None, time_limit=LNS_TIME_LIMIT, max_evaluations=None):
+    """
+    Post-optimize the timetable returned by any generate_* function: an
+    EncodedSolution, or a list of scheduled item dicts (GA, RL) together with
+    the ProblemInstance it was built on. Items encode_solution cannot take
+    (see item_resolves, e.g. RL blocks wrapping around the end of the day)
+    are dropped, counted as "dropped_sessions", and rebuilt like any other
+    unscheduled activity. Returns (EncodedSolution, run stats).
+    """
+    dropped = 0
+    if isinstance(solution, EncodedSolution):
+        problem, sessions = solution.problem, solution.sessions
+    else:
+        items = [item for item in solution if item_resolves(problem, item)]
+        dropped = len(solution) - len(items)
+        sessions = encode_solution(problem, items)
+    lns = LargeNeighbourhoodSearch(problem)
+    improved = lns.run(sessions, time_limit, max_evaluations)
+    lns.stats["dropped_sessions"] = dropped
+    return EncodedSolution(problem, improved), lns.stats
@@ -2,16 +2,19 @@ import pickle
 import numpy as np
 from typing import List, Dict
 from generator.data_collector import *
+from generator.budget import Budget
 import random
 
 class SchedulingEnvironment:
-    def __init__(self):
-        self.days = get_days()
-        self.facilities = get_spaces()
-        self.periods = get_periods()
-        self.activities = get_activities()
-        self.students = get_students()
-        self.teachers = get_teachers()
+    def __init__(self, snapshot=None):
+        if snapshot is None:
+            snapshot = load_snapshot()
+        self.days = snapshot["days"]
+        self.facilities = snapshot["spaces"]
+        self.periods = snapshot["periods"]
+        self.activities = snapshot["activities"]
+        self.student_counts = snapshot["student_counts"]
+        self.teachers = snapshot["teachers"]
         self.state = None 
 
     def reset(self):
@@ -23,7 +26,7 @@ class SchedulingEnvironment:
 
     def step(self, action):
         activity, day, periods, room, teacher, subgroup, subject, duration = action
-        num_of_students = len([s for s in self.students if activity["subject"] in s["subjects"]])
+        num_of_students = self.student_counts["subjects"].get(activity["subject"], 0)
 
         if room["capacity"] < num_of_students:
             return -10 
@@ -68,11 +71,16 @@ class QLearningScheduler:
         with open(filepath, "rb") as f:
             self.q_table = pickle.load(f)
 
-    def create_schedule(self):
+    def create_schedule(self, budget=None):
         state = self.env.reset()
         schedule = []
 
         for activity in self.env.activities:
+            # Activities left when the budget runs out stay unscheduled
+            if budget is not None:
+                if budget.exhausted():
+                    break
+                budget.spend()
             current_state = tuple(state["conflicts"].values())
 
             best_action_index = np.argmax(self.q_table[current_state])
@@ -112,12 +120,12 @@ class QLearningScheduler:
         return activity, day, periods, room, teacher, subgroup, subject, duration
 
 
-def generate_rl():
-    env = SchedulingEnvironment()
+def generate_rl(snapshot=None, time_limit=None, max_evaluations=None):
+    env = SchedulingEnvironment(snapshot)
     scheduler = QLearningScheduler(env, "scheduler_model.pkl")
 
     print("Generating schedule using the trained model...")
-    schedule = scheduler.create_schedule()
+    schedule = scheduler.create_schedule(Budget(time_limit, max_evaluations))
     print("Schedule generated successfully!")
     for entry in schedule:
         print(entry)
@@ -0,0 +1,113 @@
+import math
+import random
+from generator.algorithms.bc.bc_v1 import BeeColonySolver
+from generator.solution import sessions_from_records, EncodedSolution
+from generator.warm_start import warm_start_sessions
+from generator.evaluation.cache import FitnessCache
+from generator.budget import Budget
+from generator.stopping import EarlyStopping
+
+# SA Parameters
+NUM_ITERATIONS = 10           # temperature levels
+MOVES_PER_ITERATION = 1000    # neighbors tried at each temperature
+INITIAL_TEMPERATURE = 10.0    # accepts one extra hard violation (10) with probability ~0.37
+COOLING_RATE = 0.7            # temperature factor between levels
+INSERT_RATE = 0.3             # share of moves that try to schedule a missing activity
+
+class SimulatedAnnealingSolver(BeeColonySolver):
+    """
+    Simulated annealing for timetable scheduling.
+    Follows a single timetable with BeeColonySolver's move set
+    (neighborhood_search, plus insert_unscheduled for INSERT_RATE of the
+    moves) and DeltaEvaluator scoring: improving moves are
+    always taken, worsening ones with probability exp(-delta / temperature),
+    and the temperature drops by COOLING_RATE after every iteration.
+    """
+
+    def propose_move(self, state):
+        if random.random() < INSERT_RATE:
+            return self.insert_unscheduled(state)
+        return self.neighborhood_search(state)
+
+    def run(self, time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
+        """
+        Main function to run simulated annealing for timetable scheduling.
+        time_limit (seconds) and max_evaluations (scored moves) bound the run.
+        stopping (an EarlyStopping) ends the run once the search has converged.
+        warm_start (scheduled items of a stored timetable) seeds the start timetable.
+        """
+        if self.problem is None:
+            self.get_data()
+        self.cache = FitnessCache()
+        self.budget = Budget(time_limit, max_evaluations)
+        stopping = stopping or EarlyStopping()
+        self.stats = {"iterations": 0, "stop_reason": "completed"}
+        self.skipped_moves = 0
+        self.warm_start = warm_start_sessions(self.problem, warm_start) if warm_start else None
+        if self.warm_start is not None:
+            self.stats["warm_start_sessions"] = len(self.warm_start)
+
+        state = self.new_food_source(self.warm_start)
+        current = state.fitness()
+        self.best_fitness = current
+        best_records = [record for record in state.slots if record is not None]
+        accepted = 0
+        print(f"Initial solution: Fitness = {current}")
+
+        def best_solution():
+            return sessions_from_records(self.problem, best_records, state.subgroup_width)
+
+        temperature = INITIAL_TEMPERATURE
+        for iteration in range(NUM_ITERATIONS):
+            stop_reason = stopping.check(self.best_fitness, lambda: self.evaluate_solution(best_solution())[:2])
+            if stop_reason:
+                self.stats["stop_reason"] = stop_reason
+                break
+            for _ in range(MOVES_PER_ITERATION):
+                if self.budget.exhausted() or not state.live_slots():
+                    break
+                changes = self.propose_move(state)
+                if not changes:
+                    continue
+                if self.is_noop(state, changes):
+                    self.skipped_moves += 1
+                    continue
+                self.budget.spend()
+                delta = state.score_change(changes)
+                if delta <= 0 or random.random() < math.exp(-delta / temperature):
+                    state.apply(changes)
+                    current += delta
+                    accepted += 1
+                    if current < self.best_fitness:
+                        self.best_fitness = current
+                        best_records = [record for record in state.slots if record is not None]
+            stop_reason = self.budget.exhausted()
+            if stop_reason:
+                # The iteration may have been cut short; it is not counted
+                self.stats["stop_reason"] = stop_reason
+                break
+            temperature *= COOLING_RATE
+            self.stats["iterations"] = iteration + 1
+            print(f"Iteration {iteration + 1} done. T = {temperature:.3f}, Current = {current}, Best = {self.best_fitness}")
+            if self.on_iteration:
+                self.on_iteration(iteration + 1, self.best_fitness)
+
+        self.best_solution = best_solution()
+        print("\n=== Final Best Solution ===")
+        self.print_solution_stats(self.best_solution)
+        self.stats.update(self.cache.stats(), skipped_moves=self.skipped_moves, accepted_moves=accepted,
+                          **self.budget.stats())
+        print(f"  Moves accepted: {accepted}; {self.skipped_moves} no-op moves skipped")
+        print(f"  Iterations completed: {self.stats['iterations']} ({self.stats['stop_reason']})")
+
+        # Store the latest score in the database
+        from routers.timetable_routes import store_latest_score
+        store_latest_score(self.best_fitness, "SA")
+
+        return EncodedSolution(self.problem, self.best_solution)
+
+def generate_sa(time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
+    """
+    Run simulated annealing with a fresh solver and return the best timetable.
+    """
+    return SimulatedAnnealingSolver().run(time_limit, max_evaluations, stopping, warm_start)
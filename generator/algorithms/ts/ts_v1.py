@@ -0,0 +1,131 @@
+import random
+from generator.algorithms.bc.bc_v1 import BeeColonySolver
+from generator.solution import sessions_from_records, EncodedSolution
+from generator.warm_start import warm_start_sessions
+from generator.evaluation.delta import F_ACTIVITY, F_DAY, F_START
+from generator.evaluation.cache import FitnessCache
+from generator.budget import Budget
+from generator.stopping import EarlyStopping
+
+# TS Parameters
+NUM_ITERATIONS = 10         # rounds between stopping checks and progress reports
+STEPS_PER_ITERATION = 100   # moves made per iteration
+NEIGHBOURS = 10             # candidate moves scored per step
+TABU_TENURE = 15            # steps a removed placement may not be restored
+INSERT_RATE = 0.3           # share of candidates that try to schedule a missing activity
+
+class TabuSearchSolver(BeeColonySolver):
+    """
+    Tabu search for timetable scheduling.
+    Every step scores NEIGHBOURS candidate moves from BeeColonySolver's move
+    set (neighborhood_search and insert_unscheduled) with DeltaEvaluator and
+    makes the best admissible one, even if it is worse than staying put.
+    Placing a session back at the (activity, day, start) it was moved away
+    from is tabu for TABU_TENURE steps, unless the move gives a new best
+    fitness (aspiration).
+    """
+
+    def propose_move(self, state):
+        if random.random() < INSERT_RATE:
+            return self.insert_unscheduled(state)
+        return self.neighborhood_search(state)
+
+    def is_tabu(self, changes, tabu, step):
+        return any(record is not None and tabu.get((record[F_ACTIVITY], record[F_DAY], record[F_START]), 0) > step
+                   for _, record in changes)
+
+    def run(self, time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
+        """
+        Main function to run tabu search for timetable scheduling.
+        time_limit (seconds) and max_evaluations (scored moves) bound the run.
+        stopping (an EarlyStopping) ends the run once the search has converged.
+        warm_start (scheduled items of a stored timetable) seeds the start timetable.
+        """
+        if self.problem is None:
+            self.get_data()
+        self.cache = FitnessCache()
+        self.budget = Budget(time_limit, max_evaluations)
+        stopping = stopping or EarlyStopping()
+        self.stats = {"iterations": 0, "stop_reason": "completed"}
+        self.skipped_moves = 0
+        self.warm_start = warm_start_sessions(self.problem, warm_start) if warm_start else None
+        if self.warm_start is not None:
+            self.stats["warm_start_sessions"] = len(self.warm_start)
+
+        state = self.new_food_source(self.warm_start)
+        current = state.fitness()
+        self.best_fitness = current
+        best_records = [record for record in state.slots if record is not None]
+        tabu = {}  # (activity, day, start) -> step until which restoring it is tabu
+        step = aspirations = 0
+        print(f"Initial solution: Fitness = {current}")
+
+        def best_solution():
+            return sessions_from_records(self.problem, best_records, state.subgroup_width)
+
+        for iteration in range(NUM_ITERATIONS):
+            stop_reason = stopping.check(self.best_fitness, lambda: self.evaluate_solution(best_solution())[:2])
+            if stop_reason:
+                self.stats["stop_reason"] = stop_reason
+                break
+            for _ in range(STEPS_PER_ITERATION):
+                if self.budget.exhausted() or not state.live_slots():
+                    break
+                step += 1
+                chosen = None
+                for _ in range(NEIGHBOURS):
+                    changes = self.propose_move(state)
+                    if not changes:
+                        continue
+                    if self.is_noop(state, changes):
+                        self.skipped_moves += 1
+                        continue
+                    self.budget.spend()
+                    delta = state.score_change(changes)
+                    tabu_move = self.is_tabu(changes, tabu, step)
+                    if tabu_move and current + delta >= self.best_fitness:
+                        continue
+                    if chosen is None or delta < chosen[0]:
+                        chosen = (delta, changes, tabu_move)
+                if chosen is None:
+                    continue
+                delta, changes, tabu_move = chosen
+                aspirations += tabu_move
+                for slot, _ in changes:
+                    if slot is not None:
+                        record = state.slots[slot]
+                        tabu[(record[F_ACTIVITY], record[F_DAY], record[F_START])] = step + TABU_TENURE
+                state.apply(changes)
+                current += delta
+                if current < self.best_fitness:
+                    self.best_fitness = current
+                    best_records = [record for record in state.slots if record is not None]
+            stop_reason = self.budget.exhausted()
+            if stop_reason:
+                # The iteration may have been cut short; it is not counted
+                self.stats["stop_reason"] = stop_reason
+                break
+            self.stats["iterations"] = iteration + 1
+            print(f"Iteration {iteration + 1} done. Current = {current}, Best = {self.best_fitness}")
+            if self.on_iteration:
+                self.on_iteration(iteration + 1, self.best_fitness)
+
+        self.best_solution = best_solution()
+        print("\n=== Final Best Solution ===")
+        self.print_solution_stats(self.best_solution)
+        self.stats.update(self.cache.stats(), skipped_moves=self.skipped_moves, steps=step,
+                          aspirations=aspirations, **self.budget.stats())
+        print(f"  Steps: {step}; {aspirations} tabu moves taken by aspiration; {self.skipped_moves} no-op moves skipped")
+        print(f"  Iterations completed: {self.stats['iterations']} ({self.stats['stop_reason']})")
+
+        # Store the latest score in the database
+        from routers.timetable_routes import store_latest_score
+        store_latest_score(self.best_fitness, "TS")
+
+        return EncodedSolution(self.problem, self.best_solution)
+
+def generate_ts(time_limit=None, max_evaluations=None, stopping=None, warm_start=None):
+    """
+    Run tabu search with a fresh solver and return the best timetable.
+    """
+    return TabuSearchSolver().run(time_limit, max_evaluations, stopping, warm_start)
@@ -0,0 +1,37 @@
+import time
+
+class Budget:
+    """
+    Effort allowed for one solver run: a wall-clock time limit in seconds
+    and/or a number of candidate evaluations. Both are optional; a Budget
+    without limits never runs out.
+
+    Solvers call spend() for every candidate they score and stop at the next
+    safe point once exhausted() names a limit, returning the best solution
+    found so far.
+    """
+
+    def __init__(self, time_limit=None, max_evaluations=None):
+        self.time_limit = time_limit
+        self.max_evaluations = max_evaluations
+        self.started = time.monotonic()
+        self.evaluations = 0
+
+    def spend(self, evaluations=1):
+        self.evaluations += evaluations
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def exhausted(self):
+        """
+        "time_limit" or "evaluation_limit" once that limit is reached, else None.
+        """
+        if self.time_limit is not None and self.elapsed() >= self.time_limit:
+            return "time_limit"
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return "evaluation_limit"
+        return None
+
+    def stats(self):
+        return {"evaluations": self.evaluations, "elapsed": round(self.elapsed(), 3)}
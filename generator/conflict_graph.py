@@ -0,0 +1,140 @@
+import heapq
+import random
+import networkx as nx
+import numpy as np
+from generator.occupancy import Occupancy
+from generator.constraints import constraint_tables
+from generator.solution import make_session, sessions_from_records
+from generator.evaluation.delta import F_ACTIVITY, F_DAY, F_START, F_LENGTH, F_TEACHER, F_SUBGROUPS
+
+DSATUR_SHARE = 0.2  # share of GA individuals built by dsatur_construction
+
+def conflict_graph(problem):
+    """
+    Conflict graph of a ProblemInstance: one node per activity index, and an
+    edge between two activities that share a subgroup or a possible teacher
+    (they may not overlap if that teacher takes both). Edges carry the number
+    of shared subgroups and teachers as "subgroups" and "teachers".
+    """
+    subgroups = problem.activity_subgroups.astype(np.int64)
+    teachers = problem.activity_teachers.astype(np.int64)
+    shared_subgroups = subgroups @ subgroups.T
+    shared_teachers = teachers @ teachers.T
+    graph = nx.Graph()
+    graph.add_nodes_from(range(problem.n_activities))
+    rows, cols = np.nonzero(np.triu(shared_subgroups + shared_teachers, 1))
+    graph.add_edges_from(
+        (a, b, {"subgroups": int(shared_subgroups[a, b]), "teachers": int(shared_teachers[a, b])})
+        for a, b in zip(rows.tolist(), cols.tolist())
+    )
+    return graph
+
+class DsaturOrder:
+    """
+    DSATUR order of the activities of a conflict graph: iterating yields the
+    activity with the highest saturation next, ties going to the one with
+    more subgroups, then to the first in the data.
+
+    The saturation of an activity is the number of (day, period) cells its
+    placed neighbours hold with a shared subgroup, or with its teacher when
+    only one can take it, i.e. how much of the week is already closed to it.
+    Constructors report every session they place with placed(); activities
+    that get none are simply passed over. records are sessions placed
+    beforehand (warm start); their activities are not yielded.
+
+    Unlike textbook DSATUR, ties are not broken by degree: most edges come
+    from teachers an activity only might get, and ordering by them schedules
+    far fewer activities than ordering by size.
+    """
+
+    def __init__(self, problem, graph, records=()):
+        self.problem = problem
+        self.graph = graph
+        self.saturation = dict.fromkeys(graph, 0)
+        self.subgroups = {a_idx: set(problem.activity_subgroup_list[a_idx].tolist()) for a_idx in graph}
+        self.sole_teacher = {}  # activity -> its teacher, for activities only one teacher can take
+        for a_idx in graph:
+            teachers = problem.activity_teacher_list[a_idx].tolist()
+            if len(teachers) == 1:
+                self.sole_teacher[a_idx] = teachers[0]
+        self.blocked = {}  # (activity, day) -> mask of the periods closed to it
+        self.done = {record[F_ACTIVITY] for record in records}
+        self.heap = []  # rebuilt below; placed() pushes onto it
+        for record in records:
+            start = record[F_START]
+            self.placed(record[F_ACTIVITY], record[F_DAY], problem.period_mask(range(start, start + record[F_LENGTH])),
+                        record[F_TEACHER], record[F_SUBGROUPS])
+        self.heap = [self.key(a_idx) for a_idx in graph if a_idx not in self.done]
+        heapq.heapify(self.heap)
+
+    def key(self, a_idx):
+        return -self.saturation[a_idx], -self.problem.activity_subgroup_count[a_idx], a_idx
+
+    def __iter__(self):
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            a_idx = entry[-1]
+            # Entries go stale when the saturation grows; a fresher one is queued
+            if a_idx in self.done or entry != self.key(a_idx):
+                continue
+            self.done.add(a_idx)
+            yield a_idx
+
+    def placed(self, a_idx, d_idx, mask, t_idx, sg_indices):
+        """
+        Record a session of a_idx on day d_idx over the periods in mask.
+        """
+        for other in self.graph[a_idx]:
+            if other in self.done:
+                continue
+            if self.sole_teacher.get(other) != t_idx and self.subgroups[other].isdisjoint(sg_indices):
+                continue
+            old = self.blocked.get((other, d_idx), 0)
+            new = old | mask
+            if new != old:
+                self.blocked[(other, d_idx)] = new
+                self.saturation[other] += bin(new).count("1") - bin(old).count("1")
+                heapq.heappush(self.heap, self.key(other))
+
+def first_free_placement(problem, occupancy, unavailable, activity, teachers, rooms, sg_indices):
+    """
+    (day, start, mask, teacher, room) of the earliest clash-free block for a
+    random available teacher, day and room, or None if there is none.
+    """
+    for t_idx in random.sample(teachers, len(teachers)):
+        for d_idx in random.sample(range(problem.n_days), problem.n_days):
+            for r_idx in random.sample(rooms, len(rooms)):
+                busy = occupancy.busy(d_idx, teacher=t_idx, room=r_idx) | unavailable[t_idx][d_idx]
+                for positions in problem.free_blocks(activity["duration"], busy):
+                    mask = problem.period_mask(positions)
+                    if occupancy.is_free(d_idx, mask, subgroups=sg_indices):
+                        return d_idx, positions[0], mask, t_idx, r_idx
+    return None
+
+def dsatur_construction(problem, graph=None):
+    """
+    Greedy timetable built in DSATUR order: each session (see
+    generator.repair.session_templates) takes the first clash-free
+    placement found by first_free_placement. Returns the encoded sessions;
+    activities that find no free block stay unscheduled.
+    """
+    from generator.repair import session_templates
+    if graph is None:
+        graph = conflict_graph(problem)
+    occupancy = Occupancy(problem)
+    unavailable = constraint_tables(problem).teacher_unavailable_mask
+    order = DsaturOrder(problem, graph)
+    records = []
+    for a_idx in order:
+        activity = problem.activities[a_idx]
+        teachers = problem.activity_teacher_list[a_idx].tolist()
+        for subgroups, students, split, rooms in session_templates(problem, a_idx):
+            sg_indices = [problem.subgroup_index[sg] for sg in subgroups]
+            placement = first_free_placement(problem, occupancy, unavailable, activity, teachers, rooms, sg_indices)
+            if placement is None:
+                break
+            d_idx, start, mask, t_idx, r_idx = placement
+            records.append(make_session(problem, activity, d_idx, start, r_idx, t_idx, subgroups, students, split))
+            occupancy.reserve(d_idx, mask, teacher=t_idx, room=r_idx, subgroups=sg_indices)
+            order.placed(a_idx, d_idx, mask, t_idx, sg_indices)
+    return sessions_from_records(problem, records)
@@ -0,0 +1,197 @@
+import numpy as np
+
+DEFAULT_MAX_DAYS = 5
+DEFAULT_MIN_DAYS = 1
+DEFAULT_DAYS_WEIGHT = 5
+
+def _find_constraint(constraints, code):
+    return next((c for c in constraints if c["code"] == code), None)
+
+def _details_list(constraint, key):
+    if not constraint:
+        return []
+    return constraint.get("details", {}).get(key, [])
+
+def activity_durations(constraints):
+    """
+    TC-014 activity durations as {activity code: duration}; later entries win.
+    """
+    tc014 = _find_constraint(constraints, "TC-014")
+    return {ad["activity_code"]: ad["duration"] for ad in _details_list(tc014, "activity_durations")}
+
+class ConstraintTables:
+    """
+    Constraint documents (TC-001...TC-014) compiled into arrays indexed by the
+    ProblemInstance ids. Built once per instance and reused by every evaluation.
+
+    Matching follows the solvers: constraint day ids are compared with day
+    ``_id`` values and constraint periods with period ``_id`` values, and later
+    entries for the same teacher/subgroup/room replace earlier ones.
+    """
+
+    def __init__(self, problem):
+        constraints = problem.constraints
+        n_t, n_d, n_p = problem.n_teachers, problem.n_days, problem.n_periods
+        n_s, n_r = problem.n_subgroups, problem.n_rooms
+        order_to_pos = {int(v): i for i, v in enumerate(problem.period_order)}
+
+        def period_mask(period_ids):
+            mask = np.zeros(n_p, dtype=bool)
+            for p_id in period_ids:
+                p_idx = problem.period_index.get(p_id)
+                if p_idx is not None:
+                    mask[p_idx] = True
+            return mask
+
+        def preference_table(preferred_times):
+            table = np.zeros((n_d, n_p), dtype=bool)
+            for pref in preferred_times:
+                d_idx = problem.day_index.get(pref.get("day_id"))
+                if d_idx is not None:
+                    table[d_idx] |= period_mask(pref.get("periods", []))
+            return table
+
+        # TC-001: teacher unavailability, details[teacher_id][day_id] = [period index values]
+        self.teacher_unavailable = np.zeros((n_t, n_d, n_p), dtype=bool)
+        tc001 = _find_constraint(constraints, "TC-001")
+        details = tc001.get("details", {}) if tc001 else {}
+        if isinstance(details, dict):
+            for t_id, per_day in details.items():
+                t_idx = problem.teacher_index.get(t_id)
+                if t_idx is None or not isinstance(per_day, dict):
+                    continue
+                for day_id, unavailable in per_day.items():
+                    d_idx = problem.day_index.get(day_id)
+                    if d_idx is None:
+                        continue
+                    for value in unavailable:
+                        p_idx = order_to_pos.get(value)
+                        if p_idx is not None:
+                            self.teacher_unavailable[t_idx, d_idx, p_idx] = True
+        # The same as period masks per teacher and day, for the constructors
+        self.teacher_unavailable_mask = [
+            [problem.period_mask(np.flatnonzero(row)) for row in per_day] for per_day in self.teacher_unavailable
+        ]
+
+        # TC-002 / TC-003: teacher max/min working days (looked up by teacher id in details)
+        tc002 = _find_constraint(constraints, "TC-002")
+        tc003 = _find_constraint(constraints, "TC-003")
+        self.max_days_weight = tc002["weight"] if tc002 else DEFAULT_DAYS_WEIGHT
+        self.min_days_weight = tc003["weight"] if tc003 else DEFAULT_DAYS_WEIGHT
+        max_details = tc002.get("details", {}) if tc002 else {}
+        min_details = tc003.get("details", {}) if tc003 else {}
+        self.teacher_max_days = np.array([max_details.get(t, DEFAULT_MAX_DAYS) for t in problem.teacher_ids], dtype=np.float64)
+        self.teacher_min_days = np.array([min_details.get(t, DEFAULT_MIN_DAYS) for t in problem.teacher_ids], dtype=np.float64)
+
+        # TC-003: teacher preferred times (soft)
+        self.w003 = tc003["weight"] if tc003 else 0
+        self.has_teacher_pref = np.zeros(n_t, dtype=bool)
+        self.teacher_pref = np.zeros((n_t, n_d, n_p), dtype=bool)
+        for tp in _details_list(tc003, "teacher_preferred_times"):
+            t_idx = problem.teacher_index.get(tp["teacher_id"])
+            if t_idx is not None:
+                self.has_teacher_pref[t_idx] = True
+                self.teacher_pref[t_idx] = preference_table(tp["preferred_times"])
+
+        # TC-004: teacher max consecutive periods (hard)
+        tc004 = _find_constraint(constraints, "TC-004")
+        self.w004 = tc004["weight"] if tc004 else 0
+        self.has_max_consec = np.zeros(n_t, dtype=bool)
+        self.max_consec = np.zeros(n_t, dtype=np.float64)
+        for m in _details_list(tc004, "max_consecutive_periods"):
+            t_idx = problem.teacher_index.get(m["teacher_id"])
+            if t_idx is not None:
+                self.has_max_consec[t_idx] = True
+                self.max_consec[t_idx] = m["max_periods"]
+
+        # TC-005: student set preferred times (soft)
+        tc005 = _find_constraint(constraints, "TC-005")
+        self.w005 = tc005["weight"] if tc005 else 0
+        self.has_subgroup_pref = np.zeros(n_s, dtype=bool)
+        self.subgroup_pref = np.zeros((n_s, n_d, n_p), dtype=bool)
+        for sp in _details_list(tc005, "student_preferred_times"):
+            s_idx = problem.subgroup_index.get(sp["subgroup_id"])
+            if s_idx is not None:
+                self.has_subgroup_pref[s_idx] = True
+                self.subgroup_pref[s_idx] = preference_table(sp["preferred_times"])
+
+        # TC-008: minimum gap between a teacher's classes (soft)
+        tc008 = _find_constraint(constraints, "TC-008")
+        self.w008 = tc008["weight"] if tc008 else 0
+        self.has_min_gap = np.zeros(n_t, dtype=bool)
+        self.min_gap = np.zeros(n_t, dtype=np.float64)
+        for mg in _details_list(tc008, "min_gap_between_classes"):
+            t_idx = problem.teacher_index.get(mg["teacher_id"])
+            if t_idx is not None:
+                self.has_min_gap[t_idx] = True
+                self.min_gap[t_idx] = mg["min_gap"]
+
+        # TC-009: maximum teaching hours per day (hard)
+        tc009 = _find_constraint(constraints, "TC-009")
+        self.w009 = tc009["weight"] if tc009 else 0
+        self.has_max_hours = np.zeros(n_t, dtype=bool)
+        self.max_hours = np.zeros(n_t, dtype=np.float64)
+        for mh in _details_list(tc009, "max_teaching_hours_per_day"):
+            t_idx = problem.teacher_index.get(mh["teacher_id"])
+            if t_idx is not None:
+                self.has_max_hours[t_idx] = True
+                self.max_hours[t_idx] = mh["max_hours"]
+
+        # TC-010: student set maximum classes per day (soft)
+        tc010 = _find_constraint(constraints, "TC-010")
+        self.w010 = tc010["weight"] if tc010 else 0
+        self.has_max_classes = np.zeros(n_s, dtype=bool)
+        self.max_classes = np.zeros(n_s, dtype=np.float64)
+        for sc in _details_list(tc010, "max_classes_per_day"):
+            s_idx = problem.subgroup_index.get(sc["subgroup_id"])
+            if s_idx is not None:
+                self.has_max_classes[s_idx] = True
+                self.max_classes[s_idx] = sc["max_classes"]
+
+        # TC-011: room unavailability (hard). Every matching entry is penalised,
+        # so entries for the same room/day are kept in separate layers.
+        tc011 = _find_constraint(constraints, "TC-011")
+        self.w011 = tc011["weight"] if tc011 else 0
+        room_entries = {}
+        for ru in _details_list(tc011, "room_unavailability"):
+            r_idx = problem.room_index.get(ru["room_id"])
+            if r_idx is not None:
+                room_entries[r_idx] = ru["unavailable_times"]
+        layers = []
+        for r_idx, entries in room_entries.items():
+            depth = {}
+            for unavail in entries:
+                d_idx = problem.day_index.get(unavail.get("day_id"))
+                if d_idx is None:
+                    continue
+                layer = depth.get(d_idx, 0)
+                depth[d_idx] = layer + 1
+                while len(layers) <= layer:
+                    layers.append(np.zeros((n_r, n_d, n_p), dtype=bool))
+                layers[layer][r_idx, d_idx] = period_mask(unavail.get("periods", []))
+        self.room_unavailable = np.array(layers, dtype=bool).reshape(len(layers), n_r, n_d, n_p)
+
+        # TC-012: teacher subject preference (soft)
+        tc012 = _find_constraint(constraints, "TC-012")
+        self.w012 = tc012["weight"] if tc012 else 0
+        self.has_subject_pref = np.zeros(n_t, dtype=bool)
+        self.subject_pref = np.zeros((n_t, max(problem.n_subjects, 1)), dtype=bool)
+        for tsp in _details_list(tc012, "teacher_subject_preference"):
+            t_idx = problem.teacher_index.get(tsp["teacher_id"])
+            if t_idx is not None:
+                self.has_subject_pref[t_idx] = True
+                self.subject_pref[t_idx] = False
+                for subject in tsp["preferred_subjects"]:
+                    s_idx = problem.subject_index.get(subject)
+                    if s_idx is not None:
+                        self.subject_pref[t_idx, s_idx] = True
+
+def constraint_tables(problem):
+    """
+    Return the compiled constraint tables of a problem instance, building them on first use.
+    """
+    tables = getattr(problem, "_constraint_tables", None)
+    if tables is None:
+        tables = ConstraintTables(problem)
+        problem._constraint_tables = tables
+    return tables
@@ -1,20 +1,37 @@
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from utils.database import db
 
+# Reference collections are loaded once and kept in memory until the data
+# version stored in settings changes (see invalidate_snapshot). Getters hand
+# out deep copies since the solvers modify the documents they receive.
+_snapshot_lock = threading.Lock()
+_snapshot = None
+_snapshot_version = None
+
+# Fields of the Users documents the solvers and endpoints read; profiles and
+# password hashes stay in the database.
+TEACHER_FIELDS = {"id": 1, "first_name": 1, "last_name": 1, "position": 1, "role": 1,
+                  "subjects": 1, "target_hours": 1, "attend_days": 1}
+STUDENT_FIELDS = {"id": 1, "first_name": 1, "last_name": 1, "role": 1, "subjects": 1,
+                  "year": 1, "subgroup": 1, "year_group": 1, "specialization": 1, "attend_days": 1}
+
 def get_faculties():
     faculties = list(db["faculties"].find())
     return faculties
 
-def get_days():
+def load_days():
     days = list(db["days_of_operation"].find())
     return days
 
-def get_years():
+def load_years():
     years = list(db["Years"].find())
     return years
 
-def get_periods():
+def load_periods():
     periods = list(db["periods_of_operation"].find())
-    
+
     # Sort periods by name (P1, P2, etc.)
     # Extract the numeric part from period names for proper sorting
     def get_period_number(period):
@@ -23,40 +40,152 @@ def get_periods():
         if name.startswith('P') and name[1:].isdigit():
             return int(name[1:])
         return float('inf')  # Put any non-standard named periods at the end
-    
+
     # Sort periods based on the extracted number
     sorted_periods = sorted(periods, key=get_period_number)
-    
+
     return sorted_periods
 
-def get_spaces():
+def load_spaces():
     spaces = list(db["Spaces"].find())
     return spaces
 
-def get_activities():
+def load_activities():
     activities = list(db["Activities"].find())
     return activities
 
-def get_modules():
+def load_modules():
     modules = list(db["modules"].find())
     return modules
 
-def get_teachers():
+def load_teachers():
     teachers = list(db["Users"].find({
         "role": "faculty"
-    }))
+    }, TEACHER_FIELDS))
     return teachers
 
-def get_students():
+def load_students():
     students = list(db["Users"].find({
         "role": "student"
-    }))
+    }, STUDENT_FIELDS))
     return students
 
+def load_student_counts():
+    """
+    Students per subject and per subgroup (year_group), counted by the database
+    so no student document has to be transferred.
+    """
+    result = list(db["Users"].aggregate([
+        {"$match": {"role": "student"}},
+        {"$facet": {
+            "subjects": [
+                {"$project": {"subjects": {"$setUnion": [{"$ifNull": ["$subjects", []]}, []]}}},
+                {"$unwind": "$subjects"},
+                {"$group": {"_id": "$subjects", "count": {"$sum": 1}}},
+            ],
+            "subgroups": [
+                {"$match": {"year_group": {"$ne": None}}},
+                {"$group": {"_id": "$year_group", "count": {"$sum": 1}}},
+            ],
+        }},
+    ]))
+    counts = result[0] if result else {}
+    return {
+        "subjects": {doc["_id"]: doc["count"] for doc in counts.get("subjects", [])},
+        "subgroups": {doc["_id"]: doc["count"] for doc in counts.get("subgroups", [])},
+    }
+
+def load_constraints():
+    constraints = list(db["constraints"].find())
+    return constraints
+
+SNAPSHOT_LOADERS = {
+    "days": load_days,
+    "spaces": load_spaces,
+    "modules": load_modules,
+    "periods": load_periods,
+    "student_counts": load_student_counts,
+    "teachers": load_teachers,
+    "years": load_years,
+    "activities": load_activities,
+    "constraints": load_constraints,
+}
+
+def get_data_version():
+    """
+    Version of the reference data, bumped by every admin write.
+    """
+    doc = db["settings"].find_one({"option": "data_version"})
+    return doc["value"] if doc else 0
+
+def invalidate_snapshot():
+    """
+    Call after writing to a reference collection. Bumps the stored data version
+    so every process (API workers and generation jobs) reloads its snapshot.
+    """
+    global _snapshot
+    db["settings"].update_one({"option": "data_version"}, {"$inc": {"value": 1}}, upsert=True)
+    with _snapshot_lock:
+        _snapshot = None
+
+def fetch_snapshot():
+    """
+    Query every reference collection at the same time.
+    """
+    with ThreadPoolExecutor(max_workers=len(SNAPSHOT_LOADERS)) as pool:
+        futures = {name: pool.submit(loader) for name, loader in SNAPSHOT_LOADERS.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def cached_snapshot():
+    """
+    The shared in-memory snapshot, reloaded when the data version changed.
+    Callers must not modify it; use load_snapshot() or the getters instead.
+    """
+    global _snapshot, _snapshot_version
+    version = get_data_version()
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot_version != version:
+            _snapshot = fetch_snapshot()
+            _snapshot_version = version
+        return _snapshot
+
+def load_snapshot():
+    """
+    All reference collections the solvers use, keyed by collection.
+    """
+    return copy.deepcopy(cached_snapshot())
+
+def get_days():
+    return copy.deepcopy(cached_snapshot()["days"])
+
+def get_years():
+    return copy.deepcopy(cached_snapshot()["years"])
+
+def get_periods():
+    return copy.deepcopy(cached_snapshot()["periods"])
+
+def get_spaces():
+    return copy.deepcopy(cached_snapshot()["spaces"])
+
+def get_activities():
+    return copy.deepcopy(cached_snapshot()["activities"])
+
+def get_modules():
+    return copy.deepcopy(cached_snapshot()["modules"])
+
+def get_teachers():
+    return copy.deepcopy(cached_snapshot()["teachers"])
+
+def get_students():
+    # Not cached: the solvers only need get_student_counts()
+    return load_students()
+
+def get_student_counts():
+    return copy.deepcopy(cached_snapshot()["student_counts"])
+
 def get_timetables():
     timetable = list(db["Timetable"].find())
     return timetable
 
 def get_constraints():
-    constraints = list(db["constraints"].find())
-    return constraints
\ No newline at end of file
+    return copy.deepcopy(cached_snapshot()["constraints"])
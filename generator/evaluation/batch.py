@@ -0,0 +1,98 @@
+from concurrent.futures import ProcessPoolExecutor
+from generator.evaluation.engine import evaluate_many
+from generator.evaluation.cache import solution_key
+
+worker_problem = None  # ProblemInstance of a pool worker process
+worker_subgroup_conflicts = False
+
+def init_worker(problem, subgroup_conflicts, initializer=None):
+    """
+    Process pool initializer: keep the instance loaded by the parent so each
+    task only carries the solutions it scores.
+    """
+    global worker_problem, worker_subgroup_conflicts
+    worker_problem = problem
+    worker_subgroup_conflicts = subgroup_conflicts
+    if initializer:
+        initializer(problem)
+
+def evaluate_chunk(solutions):
+    """
+    evaluate_many over one chunk of encoded solutions in a worker process.
+    """
+    return evaluate_many(worker_problem, solutions, worker_subgroup_conflicts)
+
+class BatchEvaluator:
+    """
+    Scores populations of encoded solutions over a persistent process pool.
+
+    The pool is started once per run and every worker holds the
+    ProblemInstance, so evaluate() only ships the session arrays. Each worker
+    scores its chunk with evaluate_many. With workers=1 everything stays in
+    this process. Given a FitnessCache, solutions already scored in the run
+    (or repeated within the batch) are not sent again.
+
+    map() runs any picklable function over a list, so the evaluator can be
+    registered as DEAP's toolbox.map; 'initializer' is called with the problem
+    in every worker to set up whatever module state that function reads.
+    """
+
+    def __init__(self, problem, workers=1, subgroup_conflicts=False, initializer=None, cache=None):
+        self.problem = problem
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.subgroup_conflicts = subgroup_conflicts
+        self.executor = None
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                initargs=(problem, subgroup_conflicts, initializer))
+
+    def chunks(self, items):
+        size = max(1, -(-len(items) // self.workers))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def evaluate(self, solutions):
+        """
+        evaluate_compact tuples of the encoded solutions, in order.
+        """
+        solutions = list(solutions)
+        if self.cache is None:
+            return self.score(solutions)
+        return self.cached([solution_key(sessions) for sessions in solutions], solutions, self.score)
+
+    def cached(self, keys, items, score):
+        """
+        FitnessCache.lookup_many on this evaluator's cache: only the items
+        whose key is missing are passed to score. Needs a cache.
+        """
+        return self.cache.lookup_many(keys, items, score)
+
+    def score(self, solutions):
+        """
+        Evaluate every solution, bypassing the cache.
+        """
+        if not solutions:
+            return []
+        if self.executor is None:
+            return evaluate_many(self.problem, solutions, self.subgroup_conflicts)
+        results = []
+        for chunk in self.executor.map(evaluate_chunk, self.chunks(solutions)):
+            results.extend(chunk)
+        return results
+
+    def map(self, func, iterable):
+        items = list(iterable)
+        if self.executor is None:
+            return [func(item) for item in items]
+        return list(self.executor.map(func, items, chunksize=max(1, len(items) // (self.workers * 4))))
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,88 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+CACHE_SIZE = 4096  # evaluation results kept per run
+
+def solution_key(sessions):
+    """
+    Canonical hash of an encoded solution. Sessions are sorted first, so the
+    same timetable gets the same key whatever order its sessions are in.
+    """
+    if not len(sessions):
+        return b""
+    subgroups = sessions["subgroups"].astype(np.int64)
+    if subgroups.ndim == 1:
+        subgroups = subgroups[:, np.newaxis]
+    columns = [sessions[name].astype(np.int64) for name in sessions.dtype.names if name != "subgroups"]
+    rows = np.column_stack(columns + [subgroups])
+    rows = rows[np.lexsort(rows.T[::-1])]
+    return hashlib.blake2b(rows.tobytes(), digest_size=16).digest()
+
+class FitnessCache:
+    """
+    Bounded LRU of evaluation results keyed by solution_key, shared by the
+    evaluations of one run. Counts hits and misses for the run stats.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Cached result for key, or None.
+        """
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def lookup(self, sessions, evaluate):
+        """
+        Result for an encoded solution, calling evaluate(sessions) on a miss.
+        """
+        key = solution_key(sessions)
+        result = self.get(key)
+        if result is None:
+            result = evaluate(sessions)
+            self.put(key, result)
+        return result
+
+    def lookup_many(self, keys, items, score):
+        """
+        Results for items under their keys: hits come from the cache, and
+        score(list of items) is called once for the first item of every
+        missing key, e.g. to score them all in a process pool.
+        """
+        results = [self.get(key) for key in keys]
+        pending = {}  # key -> first item with that key
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None and key not in pending:
+                pending[key] = i
+        scored = dict(zip(pending, score([items[i] for i in pending.values()])))
+        for key, result in scored.items():
+            self.put(key, result)
+        return [scored[key] if result is None else result for key, result in zip(keys, results)]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+        }
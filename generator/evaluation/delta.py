@@ -0,0 +1,371 @@
+import numpy as np
+from generator.solution import sessions_from_records
+from generator.constraints import constraint_tables
+from generator.evaluation.engine import (
+    _as_number, HARD_CONSTRAINT_WEIGHT, SPLIT_PENALTY, DURATION_PENALTY
+)
+
+# Indices into DeltaEvaluator.totals (same order as the evaluate_compact tuple, minus hard/soft)
+ROOM, TEACHER, INTERVAL, AVAILABILITY, CAPACITY, UNSCHEDULED, DUPLICATES, MISMATCH, \
+    MIN_DAYS, MAX_DAYS, SPLIT, NEW_HARD, NEW_SOFT, SUBGROUP = range(14)
+
+# Fields of a session record (a plain tuple, in session_dtype order)
+F_ACTIVITY, F_DAY, F_START, F_LENGTH, F_ROOM, F_TEACHER, F_DURATION, F_STUDENTS, \
+    F_KIND, F_SUBJECT, F_SPLIT, F_SUBGROUPS = range(12)
+
+def session_record(row):
+    """
+    Convert one row of an encoded solution into a session record tuple.
+    """
+    subgroups = tuple(int(sg) for sg in np.atleast_1d(row["subgroups"]) if sg >= 0)
+    return (int(row["activity"]), int(row["day"]), int(row["start"]), int(row["length"]),
+            int(row["room"]), int(row["teacher"]), int(row["duration"]), int(row["student_count"]),
+            int(row["kind"]), int(row["subject"]), bool(row["split"]), subgroups)
+
+class DeltaEvaluator:
+    """
+    Incremental version of evaluate_compact for local search.
+
+    Keeps per-slot occupancy counts and per-teacher/per-subgroup day aggregates
+    for one solution, so the fitness change of a move is computed in time
+    proportional to the sessions it touches. A move is a list of
+    (slot, record) changes: (slot, None) removes a session, (None, record)
+    appends one and (slot, record) replaces a session in place. Slot order is
+    the solution order; the score does not depend on it.
+    """
+
+    def __init__(self, problem, sessions, subgroup_conflicts=True):
+        self.problem = problem
+        self.tables = constraint_tables(problem)
+        self.subgroup_conflicts = subgroup_conflicts
+        self.subgroup_width = sessions.dtype["subgroups"].shape[0] if sessions.dtype["subgroups"].shape else 1
+        self.subgroup_width = max(self.subgroup_width, problem.max_subgroups)
+
+        n_d, n_p = problem.n_days, problem.n_periods
+        self.room_cells = [0] * (n_d * n_p * problem.n_rooms)
+        self.teacher_cells = [0] * (n_d * n_p * problem.n_teachers)
+        self.subgroup_cells = [0] * (problem.n_subgroups * n_d * n_p)
+        self.act_count = [0] * problem.n_activities
+        self.act_subgroups = {}            # activity*S + subgroup -> sessions
+        self.act_distinct = [0] * problem.n_activities
+        self.teacher_day_sessions = [0] * (problem.n_teachers * n_d)
+        self.teacher_days = [0] * problem.n_teachers
+        self.teacher_day_hours = [0] * (problem.n_teachers * n_d)
+        self.subgroup_day_classes = [0] * (problem.n_subgroups * n_d)
+        self.teacher_day_slots = {}        # teacher*D + day -> slots (TC-008 only)
+
+        self.slots = []
+        self.totals = [0] * 14
+        self.totals[UNSCHEDULED] = problem.n_activities
+        self.apply([(None, session_record(row)) for row in sessions])
+
+    # -- scores ---------------------------------------------------------
+
+    def score(self):
+        """
+        (hard, soft) for the current solution.
+        """
+        t = self.totals
+        base_hard = (t[ROOM] + t[TEACHER] + t[INTERVAL] + t[AVAILABILITY] + t[CAPACITY]
+                     + t[UNSCHEDULED] + t[DUPLICATES] + t[MISMATCH])
+        if self.subgroup_conflicts:
+            base_hard += t[SUBGROUP]
+        hard = HARD_CONSTRAINT_WEIGHT * base_hard + t[NEW_HARD]
+        soft = t[MAX_DAYS] + t[MIN_DAYS] + t[SPLIT] + t[NEW_SOFT]
+        return _as_number(hard), _as_number(soft)
+
+    def fitness(self):
+        hard, soft = self.score()
+        return hard + soft
+
+    def evaluation(self):
+        """
+        The full evaluate_compact tuple for the current solution.
+        """
+        hard, soft = self.score()
+        t = [_as_number(v) for v in self.totals]
+        result = (hard, soft, t[ROOM], t[TEACHER], t[INTERVAL], t[AVAILABILITY], t[CAPACITY],
+                  t[UNSCHEDULED], t[DUPLICATES], t[MISMATCH], t[MIN_DAYS], t[MAX_DAYS], t[SPLIT],
+                  t[NEW_HARD], t[NEW_SOFT])
+        if self.subgroup_conflicts:
+            result += (t[SUBGROUP],)
+        return result
+
+    def score_change(self, changes):
+        """
+        Fitness change (new - current) of a move, leaving the solution untouched.
+        """
+        before = self.fitness()
+        token = self.apply(changes)
+        after = self.fitness()
+        self.undo(token)
+        return after - before
+
+    # -- moves ----------------------------------------------------------
+
+    def apply(self, changes):
+        """
+        Apply a move and return an undo token.
+        """
+        removed = []
+        added = []
+        undo = []
+        for slot, record in changes:
+            appended = slot is None
+            if appended:
+                slot = len(self.slots)
+                self.slots.append(None)
+            old = self.slots[slot]
+            undo.append((slot, old, appended))
+            if old is not None:
+                removed.append(old)
+            if record is not None:
+                added.append(record)
+        groups = self._groups(removed + added)
+        self._adjust_groups(groups, -1)
+        for (slot, old, _), (_, record) in zip(undo, changes):
+            if old is not None:
+                self._place(slot, old, -1)
+            self.slots[slot] = record
+            if record is not None:
+                self._place(slot, record, 1)
+        self._adjust_groups(groups, 1)
+        return undo
+
+    def undo(self, token):
+        """
+        Revert a move returned by apply().
+        """
+        removed = []
+        added = []
+        for slot, old, _ in token:
+            if self.slots[slot] is not None:
+                removed.append(self.slots[slot])
+            if old is not None:
+                added.append(old)
+        groups = self._groups(removed + added)
+        self._adjust_groups(groups, -1)
+        for slot, old, _ in reversed(token):
+            current = self.slots[slot]
+            if current is not None:
+                self._place(slot, current, -1)
+            self.slots[slot] = old
+            if old is not None:
+                self._place(slot, old, 1)
+        self._adjust_groups(groups, 1)
+        # Drop the slots appended by the move; slots it emptied stay in place
+        for slot, _, appended in reversed(token):
+            if appended:
+                self.slots.pop()
+
+    def copy(self):
+        """
+        Independent evaluator for a copy of the current solution.
+        """
+        return DeltaEvaluator(self.problem, self.sessions(), self.subgroup_conflicts)
+
+    def sessions(self):
+        """
+        Encoded solution (structured array) of the live sessions in slot order.
+        """
+        records = [record for record in self.slots if record is not None]
+        return sessions_from_records(self.problem, records, self.subgroup_width)
+
+    def live_slots(self):
+        return [slot for slot, record in enumerate(self.slots) if record is not None]
+
+    # -- occupancy queries ----------------------------------------------
+
+    def block_is_free(self, day, start, length, teacher=None, room=None, subgroups=()):
+        """
+        True if no session uses the teacher, room or any subgroup in the block.
+        """
+        problem = self.problem
+        n_p = problem.n_periods
+        base = day * n_p
+        for p in range(start, start + length):
+            cell = base + p
+            if teacher is not None and self.teacher_cells[cell * problem.n_teachers + teacher]:
+                return False
+            if room is not None and self.room_cells[cell * problem.n_rooms + room]:
+                return False
+            for sg in subgroups:
+                if self.subgroup_cells[sg * problem.n_days * n_p + cell]:
+                    return False
+        return True
+
+    # -- internals ------------------------------------------------------
+
+    def _session_terms(self, record):
+        """
+        Contributions of one session that do not depend on other sessions.
+        """
+        problem, tables = self.problem, self.tables
+        act, day, start, length, room, teacher, duration, students, kind, subject, _, subgroups = record
+        periods = range(start, start + length)
+        terms = {}
+        terms[CAPACITY] = 1 if students > problem.room_capacity[room] else 0
+        terms[MISMATCH] = 0 if problem.kind_room_suitable[kind, room] else 1
+        terms[AVAILABILITY] = sum(1 for p in periods if tables.teacher_unavailable[teacher, day, p])
+        terms[INTERVAL] = sum(1 for p in periods if problem.period_is_interval[p])
+
+        soft = 0
+        hard = abs(length - duration) * DURATION_PENALTY
+        if tables.has_teacher_pref[teacher] and not any(tables.teacher_pref[teacher, day, p] for p in periods):
+            soft += tables.w003
+        if tables.has_subject_pref[teacher] and not (subject >= 0 and tables.subject_pref[teacher, subject]):
+            soft += tables.w012
+        for layer in tables.room_unavailable:
+            if any(layer[room, day, p] for p in periods):
+                hard += tables.w011
+        for sg in subgroups:
+            if tables.has_subgroup_pref[sg] and not any(tables.subgroup_pref[sg, day, p] for p in periods):
+                soft += tables.w005
+        if tables.has_max_consec[teacher] and length:
+            first = problem.period_order[start]
+            last = problem.period_order[start + length - 1]
+            over = abs(int(last) - int(first)) + 1 - tables.max_consec[teacher]
+            if over > 0:
+                hard += over * tables.w004
+        terms[NEW_HARD] = hard
+        terms[NEW_SOFT] = soft
+        return terms
+
+    def _place(self, slot, record, sign):
+        problem = self.problem
+        n_d, n_p = problem.n_days, problem.n_periods
+        n_r, n_t, n_s = problem.n_rooms, problem.n_teachers, problem.n_subgroups
+        act, day, start, length, room, teacher, duration = record[:7]
+        subgroups = record[F_SUBGROUPS]
+        totals = self.totals
+
+        for key, value in self._session_terms(record).items():
+            totals[key] += sign * value
+
+        for p in range(start, start + length):
+            cell = day * n_p + p
+            for cells, idx, total in ((self.room_cells, cell * n_r + room, ROOM),
+                                      (self.teacher_cells, cell * n_t + teacher, TEACHER)):
+                if sign > 0:
+                    if cells[idx] >= 1:
+                        totals[total] += 1
+                    cells[idx] += 1
+                else:
+                    cells[idx] -= 1
+                    if cells[idx] >= 1:
+                        totals[total] -= 1
+            for sg in subgroups:
+                idx = sg * n_d * n_p + cell
+                if sign > 0:
+                    if self.subgroup_cells[idx] >= 1:
+                        totals[SUBGROUP] += 1
+                    self.subgroup_cells[idx] += 1
+                else:
+                    self.subgroup_cells[idx] -= 1
+                    if self.subgroup_cells[idx] >= 1:
+                        totals[SUBGROUP] -= 1
+
+        if act >= 0:
+            self.act_count[act] += sign
+            for sg in subgroups:
+                key = act * n_s + sg
+                count = self.act_subgroups.get(key, 0) + sign
+                if count:
+                    self.act_subgroups[key] = count
+                else:
+                    self.act_subgroups.pop(key, None)
+                if (sign > 0 and count == 1) or (sign < 0 and count == 0):
+                    self.act_distinct[act] += sign
+
+        td = teacher * n_d + day
+        self.teacher_day_sessions[td] += sign
+        if (sign > 0 and self.teacher_day_sessions[td] == 1) or (sign < 0 and self.teacher_day_sessions[td] == 0):
+            self.teacher_days[teacher] += sign
+        self.teacher_day_hours[td] += sign * duration
+        for sg in subgroups:
+            self.subgroup_day_classes[sg * n_d + day] += sign
+        if self.tables.has_min_gap[teacher]:
+            slots = self.teacher_day_slots.setdefault(td, [])
+            if sign > 0:
+                slots.append(slot)
+                slots.sort()
+            else:
+                slots.remove(slot)
+
+    def _groups(self, records):
+        """
+        Aggregate groups (activities, teachers, teacher-days, subgroup-days)
+        touched by a set of records.
+        """
+        n_d = self.problem.n_days
+        acts, teachers, teacher_days, subgroup_days = set(), set(), set(), set()
+        for record in records:
+            if record[F_ACTIVITY] >= 0:
+                acts.add(record[F_ACTIVITY])
+            teachers.add(record[F_TEACHER])
+            teacher_days.add(record[F_TEACHER] * n_d + record[F_DAY])
+            for sg in record[F_SUBGROUPS]:
+                subgroup_days.add(sg * n_d + record[F_DAY])
+        return acts, teachers, teacher_days, subgroup_days
+
+    def _adjust_groups(self, groups, sign):
+        """
+        Add (sign=1) or remove (sign=-1) the group-level penalties of the touched groups.
+        """
+        problem, tables, totals = self.problem, self.tables, self.totals
+        n_d = problem.n_days
+        acts, teachers, teacher_days, subgroup_days = groups
+
+        for act in acts:
+            count = self.act_count[act]
+            if count == 0:
+                totals[UNSCHEDULED] += sign
+            elif problem.activity_kind[act] == 1:
+                missing = problem.activity_subgroup_count[act] - self.act_distinct[act]
+                if missing > 0:
+                    totals[SPLIT] += sign * missing * SPLIT_PENALTY
+            elif count > 1:
+                totals[DUPLICATES] += sign * (count - 1)
+
+        for teacher in teachers:
+            worked = self.teacher_days[teacher]
+            if worked:
+                over = worked - tables.teacher_max_days[teacher]
+                if over > 0:
+                    totals[MAX_DAYS] += sign * over * tables.max_days_weight
+                under = tables.teacher_min_days[teacher] - worked
+                if under > 0:
+                    totals[MIN_DAYS] += sign * under * tables.min_days_weight
+
+        for td in teacher_days:
+            teacher = td // n_d
+            if tables.has_max_hours[teacher]:
+                over = self.teacher_day_hours[td] - tables.max_hours[teacher]
+                if over > 0:
+                    totals[NEW_HARD] += sign * over * tables.w009
+            if tables.has_min_gap[teacher]:
+                totals[NEW_SOFT] += sign * self._gap_penalty(td, teacher)
+
+        for sd in subgroup_days:
+            sg = sd // n_d
+            if tables.has_max_classes[sg]:
+                over = self.subgroup_day_classes[sd] - tables.max_classes[sg]
+                if over > 0:
+                    totals[NEW_SOFT] += sign * over * tables.w010
+
+    def _gap_penalty(self, td, teacher):
+        order = self.problem.period_order
+        blocks = []
+        for slot in self.teacher_day_slots.get(td, ()):
+            record = self.slots[slot]
+            first = int(order[record[F_START]])
+            last = int(order[record[F_START] + record[F_LENGTH] - 1])
+            blocks.append((min(first, last), max(first, last)))
+        blocks.sort()
+        min_gap = self.tables.min_gap[teacher]
+        penalty = 0
+        for i in range(len(blocks) - 1):
+            gap = blocks[i + 1][0] - blocks[i][1] - 1
+            if gap < min_gap:
+                penalty += (min_gap - gap) * self.tables.w008
+        return penalty
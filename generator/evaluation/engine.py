@@ -0,0 +1,373 @@
+import numpy as np
+from collections import namedtuple
+from generator.constraints import constraint_tables
+
+HARD_CONSTRAINT_WEIGHT = 10
+SPLIT_PENALTY = 10
+DURATION_PENALTY = 10
+
+# Kinds of constraint kernels:
+#   "conflict" - hard conflict count, weighted by HARD_CONSTRAINT_WEIGHT
+#   "hard"     - hard penalty, already weighted
+#   "soft"     - soft penalty, already weighted
+# Hard and soft kernels with a constraint code (TC-...) are also summed into
+# new_hard_penalties / new_soft_penalties.
+Kernel = namedtuple("Kernel", ["name", "kind", "code", "fn"])
+
+KERNELS = []
+
+# Order of the evaluate_compact tuple after (hard, soft)
+RESULT_FIELDS = (
+    "room_conflicts", "teacher_conflicts", "interval_conflicts", "teacher_availability_conflicts",
+    "capacity_conflicts", "unscheduled_activities", "duplicate_activities", "room_type_mismatches",
+    "min_days_violations", "max_days_violations", "split_activities_penalty",
+    "new_hard_penalties", "new_soft_penalties",
+)
+
+def register_constraint(name, kind, code=None):
+    """
+    Decorator adding a kernel to the registry. A kernel takes a SessionBatch
+    and returns one value per solution in the batch.
+    """
+    if kind not in ("conflict", "hard", "soft"):
+        raise ValueError(f"Unknown constraint kind {kind}")
+
+    def decorator(fn):
+        global KERNELS
+        KERNELS = [k for k in KERNELS if k.name != name] + [Kernel(name, kind, code, fn)]
+        return fn
+    return decorator
+
+def _as_number(value):
+    value = value.item() if hasattr(value, "item") else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class SessionBatch:
+    """
+    Encoded solutions (see generator.solution) concatenated into one set of
+    arrays, plus the (session, period) pairs and (session, subgroup, period)
+    triples the kernels work on. ``sol`` holds the solution of every session;
+    kernels turn per-session facts into per-solution values with count() and
+    total().
+    """
+
+    def __init__(self, problem, solutions):
+        self.problem = problem
+        self.tables = constraint_tables(problem)
+        self.m = len(solutions)
+
+        width = 1
+        for sessions in solutions:
+            if sessions.dtype["subgroups"].shape:
+                width = max(width, sessions.dtype["subgroups"].shape[0])
+        n = sum(len(sessions) for sessions in solutions)
+        self.n = n
+
+        def field(name):
+            if not solutions:
+                return np.zeros(0, dtype=np.int64)
+            return np.concatenate([sessions[name].astype(np.int64) for sessions in solutions])
+
+        self.sol = np.repeat(np.arange(self.m), [len(sessions) for sessions in solutions])
+        self.act = field("activity")
+        self.day = field("day")
+        self.start = field("start")
+        self.length = field("length")
+        self.room = field("room")
+        self.teacher = field("teacher")
+        self.duration = field("duration")
+        self.kind = field("kind")
+        self.subject = field("subject")
+        self.student_count = field("student_count")
+        self.subgroups = np.full((n, width), -1, dtype=np.int64)
+        row = 0
+        for sessions in solutions:
+            block = sessions["subgroups"].astype(np.int64)
+            if block.ndim == 1:
+                block = block[:, np.newaxis]
+            self.subgroups[row:row + len(sessions), :block.shape[1]] = block
+            row += len(sessions)
+
+        # (session, period) pairs
+        length = self.length
+        self.pair_s = np.repeat(np.arange(n), length)
+        self.pair_p = self.start[self.pair_s] + (np.arange(self.pair_s.size) - np.repeat(np.cumsum(length) - length, length))
+        self.pair_d = self.day[self.pair_s]
+        self.pair_t = self.teacher[self.pair_s]
+        self.pair_sol = self.sol[self.pair_s]
+
+        # (session, subgroup) pairs and (session, subgroup, period) triples
+        self.sg_s, sg_col = np.nonzero(self.subgroups >= 0)
+        self.sg_v = self.subgroups[self.sg_s, sg_col]
+        sg_len = length[self.sg_s]
+        self.trip_j = np.repeat(np.arange(self.sg_s.size), sg_len)
+        self.trip_s = self.sg_s[self.trip_j]
+        self.trip_p = self.start[self.trip_s] + (np.arange(self.trip_j.size) - np.repeat(np.cumsum(sg_len) - sg_len, sg_len))
+        self.trip_sg = self.sg_v[self.trip_j]
+
+        # Block start/end (period index values) per session
+        n_p = problem.n_periods
+        first = problem.period_order[np.minimum(self.start, n_p - 1)]
+        last = problem.period_order[np.minimum(self.start + length - 1, n_p - 1)]
+        self.block_start = np.minimum(first, last)
+        self.block_end = np.maximum(first, last)
+
+    def count(self, sol):
+        """
+        Number of entries per solution, given the solution of each entry.
+        """
+        return np.bincount(sol, minlength=self.m)
+
+    def total(self, sol, values):
+        """
+        Sum of values per solution, given the solution of each value.
+        """
+        return np.bincount(sol, weights=values, minlength=self.m)
+
+    def excess(self, keys, sol):
+        """
+        Per solution, the sum over keys of (occurrences - 1), i.e. the clash
+        count of a slot map.
+        """
+        distinct = np.unique(keys * self.m + sol) % self.m if self.m else keys
+        return self.count(sol) - np.bincount(distinct, minlength=self.m)
+
+# -- hard conflicts -----------------------------------------------------
+
+@register_constraint("room_conflicts", "conflict")
+def room_conflicts(b):
+    slot = b.pair_d * b.problem.n_periods + b.pair_p
+    return b.excess(slot * b.problem.n_rooms + b.room[b.pair_s], b.pair_sol)
+
+@register_constraint("teacher_conflicts", "conflict")
+def teacher_conflicts(b):
+    slot = b.pair_d * b.problem.n_periods + b.pair_p
+    return b.excess(slot * b.problem.n_teachers + b.pair_t, b.pair_sol)
+
+@register_constraint("interval_conflicts", "conflict")
+def interval_conflicts(b):
+    return b.count(b.pair_sol[b.problem.period_is_interval[b.pair_p]])
+
+@register_constraint("teacher_availability_conflicts", "conflict", "TC-001")
+def teacher_availability_conflicts(b):
+    return b.count(b.pair_sol[b.tables.teacher_unavailable[b.pair_t, b.pair_d, b.pair_p]])
+
+@register_constraint("capacity_conflicts", "conflict")
+def capacity_conflicts(b):
+    return b.count(b.sol[b.student_count > b.problem.room_capacity[b.room]])
+
+def _activity_counts(b):
+    """
+    Sessions per (solution, activity) and distinct subgroups per (solution, activity).
+    """
+    cached = getattr(b, "_activity_counts", None)
+    if cached is not None:
+        return cached
+    problem = b.problem
+    n_a, n_s = problem.n_activities, problem.n_subgroups
+    known = b.act >= 0
+    act_count = np.bincount(b.sol[known] * n_a + b.act[known], minlength=b.m * n_a).reshape(b.m, n_a)
+    sg_known = b.act[b.sg_s] >= 0
+    sg_act = b.sol[b.sg_s][sg_known] * n_a + b.act[b.sg_s][sg_known]
+    act_sg = np.unique(sg_act * n_s + b.sg_v[sg_known])
+    act_distinct_sg = np.bincount(act_sg // max(n_s, 1), minlength=b.m * n_a).reshape(b.m, n_a)
+    b._activity_counts = (act_count, act_distinct_sg)
+    return b._activity_counts
+
+@register_constraint("unscheduled_activities", "conflict")
+def unscheduled_activities(b):
+    act_count, _ = _activity_counts(b)
+    return np.count_nonzero(act_count == 0, axis=1)
+
+@register_constraint("duplicate_activities", "conflict")
+def duplicate_activities(b):
+    act_count, _ = _activity_counts(b)
+    repeated = (act_count > 0) & (b.problem.activity_kind != 1)
+    return np.sum(np.where(repeated, act_count - 1, 0), axis=1)
+
+@register_constraint("room_type_mismatches", "conflict")
+def room_type_mismatches(b):
+    return b.count(b.sol[~b.problem.kind_room_suitable[b.kind, b.room]])
+
+@register_constraint("subgroup_conflicts", "conflict")
+def subgroup_conflicts(b):
+    problem = b.problem
+    keys = (b.trip_sg * problem.n_days + b.day[b.trip_s]) * problem.n_periods + b.trip_p
+    return b.excess(keys, b.sol[b.trip_s])
+
+# -- soft penalties without a constraint code ----------------------------
+
+def _days_worked(b):
+    n_t, n_d = b.problem.n_teachers, b.problem.n_days
+    worked = np.unique((b.sol * n_t + b.teacher) * n_d + b.day)
+    return np.bincount(worked // n_d, minlength=b.m * n_t).reshape(b.m, n_t)
+
+@register_constraint("min_days_violations", "soft")
+def min_days_violations(b):
+    days_worked = _days_worked(b)
+    short = np.clip(b.tables.teacher_min_days - days_worked, 0, None)
+    return np.sum(np.where(days_worked > 0, short, 0), axis=1) * b.tables.min_days_weight
+
+@register_constraint("max_days_violations", "soft")
+def max_days_violations(b):
+    days_worked = _days_worked(b)
+    over = np.clip(days_worked - b.tables.teacher_max_days, 0, None)
+    return np.sum(np.where(days_worked > 0, over, 0), axis=1) * b.tables.max_days_weight
+
+@register_constraint("split_activities_penalty", "soft")
+def split_activities_penalty(b):
+    act_count, act_distinct_sg = _activity_counts(b)
+    problem = b.problem
+    missing = np.clip(problem.activity_subgroup_count - act_distinct_sg, 0, None)
+    split = (act_count > 0) & (problem.activity_kind == 1)
+    return np.sum(np.where(split, missing, 0), axis=1) * SPLIT_PENALTY
+
+# -- constraint documents (TC-...) ----------------------------------------
+
+@register_constraint("teacher_preferred_time", "soft", "TC-003")
+def teacher_preferred_time(b):
+    t = b.tables
+    pref_hits = np.bincount(b.pair_s, weights=t.teacher_pref[b.pair_t, b.pair_d, b.pair_p], minlength=b.n) > 0
+    return b.count(b.sol[t.has_teacher_pref[b.teacher] & ~pref_hits]) * t.w003
+
+@register_constraint("teacher_subject_preference", "soft", "TC-012")
+def teacher_subject_preference(b):
+    t = b.tables
+    subject_ok = (b.subject >= 0) & t.subject_pref[b.teacher, np.maximum(b.subject, 0)]
+    return b.count(b.sol[t.has_subject_pref[b.teacher] & ~subject_ok]) * t.w012
+
+@register_constraint("activity_duration", "hard", "TC-014")
+def activity_duration(b):
+    return b.total(b.sol, np.abs(b.length - b.duration)).astype(np.int64) * DURATION_PENALTY
+
+@register_constraint("room_unavailable", "hard", "TC-011")
+def room_unavailable(b):
+    hits = np.zeros(b.m, dtype=np.int64)
+    for layer in b.tables.room_unavailable:
+        session_hits = np.bincount(b.pair_s, weights=layer[b.room[b.pair_s], b.pair_d, b.pair_p], minlength=b.n) > 0
+        hits += b.count(b.sol[session_hits])
+    return hits * b.tables.w011
+
+@register_constraint("student_preferred_time", "soft", "TC-005")
+def student_preferred_time(b):
+    t = b.tables
+    weights = t.subgroup_pref[b.trip_sg, b.day[b.trip_s], b.trip_p]
+    sg_pref_hits = np.bincount(b.trip_j, weights=weights, minlength=b.sg_s.size) > 0
+    return b.count(b.sol[b.sg_s][t.has_subgroup_pref[b.sg_v] & ~sg_pref_hits]) * t.w005
+
+@register_constraint("teacher_max_consecutive", "hard", "TC-004")
+def teacher_max_consecutive(b):
+    t = b.tables
+    block_len = b.block_end - b.block_start + 1
+    over = np.clip(block_len - t.max_consec[b.teacher], 0, None)
+    return b.total(b.sol, np.where(t.has_max_consec[b.teacher], over, 0)) * t.w004
+
+@register_constraint("teacher_min_gap", "soft", "TC-008")
+def teacher_min_gap(b):
+    t = b.tables
+    gap_sessions = np.nonzero(t.has_min_gap[b.teacher])[0]
+    if gap_sessions.size < 2:
+        return np.zeros(b.m, dtype=np.int64)
+    teacher, day, block_start, sol = b.teacher, b.day, b.block_start, b.sol
+    # Sessions starting together are ordered by their end, so the penalty does not depend on session order
+    order = gap_sessions[np.lexsort((b.block_end[gap_sessions], block_start[gap_sessions], day[gap_sessions],
+                                     teacher[gap_sessions], sol[gap_sessions]))]
+    cur, nxt = order[:-1], order[1:]
+    same = (sol[cur] == sol[nxt]) & (teacher[cur] == teacher[nxt]) & (day[cur] == day[nxt])
+    gap = block_start[nxt] - b.block_end[cur] - 1
+    shortfall = np.clip(t.min_gap[teacher[cur]] - gap, 0, None)
+    return b.total(sol[cur][same], shortfall[same]) * t.w008
+
+@register_constraint("teacher_max_hours", "hard", "TC-009")
+def teacher_max_hours(b):
+    t, n_t, n_d = b.tables, b.problem.n_teachers, b.problem.n_days
+    keys = (b.sol * n_t + b.teacher) * n_d + b.day
+    day_hours = np.bincount(keys, weights=b.duration, minlength=b.m * n_t * n_d).reshape(b.m, n_t, n_d)
+    over = np.clip(day_hours - t.max_hours[None, :, None], 0, None)
+    return np.sum(np.where(t.has_max_hours[None, :, None], over, 0), axis=(1, 2)) * t.w009
+
+@register_constraint("student_max_classes", "soft", "TC-010")
+def student_max_classes(b):
+    t, n_s, n_d = b.tables, b.problem.n_subgroups, b.problem.n_days
+    keys = (b.sol[b.sg_s] * n_s + b.sg_v) * n_d + b.day[b.sg_s]
+    day_classes = np.bincount(keys, minlength=b.m * n_s * n_d).reshape(b.m, n_s, n_d)
+    over = np.clip(day_classes - t.max_classes[None, :, None], 0, None)
+    return np.sum(np.where(t.has_max_classes[None, :, None], over, 0), axis=(1, 2)) * t.w010
+
+# -- API ------------------------------------------------------------------
+
+def breakdown_many(problem, solutions, subgroup_conflicts=False):
+    """
+    Per-constraint breakdown of several encoded solutions, evaluated together.
+
+    Returns one dict per solution with the value of every registered kernel,
+    new_hard_penalties / new_soft_penalties, and the hard and soft totals.
+    Subgroup clashes are always reported but only count as hard conflicts
+    with subgroup_conflicts=True (BC/PSO scoring).
+    """
+    batch = SessionBatch(problem, list(solutions))
+    values = [(kernel, kernel.fn(batch)) for kernel in KERNELS]
+    results = []
+    for i in range(batch.m):
+        breakdown = {}
+        base_hard = 0
+        new_hard = 0
+        new_soft = 0
+        soft = 0
+        for kernel, per_solution in values:
+            value = _as_number(per_solution[i])
+            breakdown[kernel.name] = value
+            if kernel.kind == "conflict":
+                if kernel.name != "subgroup_conflicts" or subgroup_conflicts:
+                    base_hard += value
+            elif kernel.code is None:
+                soft += value
+            elif kernel.kind == "hard":
+                new_hard += value
+            else:
+                new_soft += value
+        breakdown["new_hard_penalties"] = _as_number(new_hard)
+        breakdown["new_soft_penalties"] = _as_number(new_soft)
+        breakdown["hard"] = HARD_CONSTRAINT_WEIGHT * base_hard + breakdown["new_hard_penalties"]
+        breakdown["soft"] = soft + breakdown["new_soft_penalties"]
+        results.append(breakdown)
+    return results
+
+def evaluate_breakdown(problem, sessions, subgroup_conflicts=False):
+    """
+    Per-constraint breakdown of one encoded solution (see breakdown_many).
+    """
+    return breakdown_many(problem, [sessions], subgroup_conflicts)[0]
+
+def as_result(breakdown, subgroup_conflicts=False):
+    """
+    The evaluate_compact tuple of a breakdown.
+    """
+    result = (breakdown["hard"], breakdown["soft"]) + tuple(breakdown[name] for name in RESULT_FIELDS)
+    if subgroup_conflicts:
+        result += (breakdown["subgroup_conflicts"],)
+    return result
+
+def evaluate_many(problem, solutions, subgroup_conflicts=False):
+    """
+    evaluate_compact for several encoded solutions at once, in one pass of
+    every kernel over the concatenated sessions.
+    """
+    return [as_result(breakdown, subgroup_conflicts)
+            for breakdown in breakdown_many(problem, solutions, subgroup_conflicts)]
+
+def evaluate_compact(problem, sessions, subgroup_conflicts=False):
+    """
+    Score one encoded solution.
+
+    Returns the same 15-tuple as the solvers' evaluate_solution:
+    (hard, soft, room, teacher, interval, teacher availability, capacity,
+     unscheduled, duplicates, room type mismatches, min days, max days,
+     split penalty, new hard penalties, new soft penalties).
+
+    With subgroup_conflicts=True, subgroup clashes are counted as hard
+    conflicts and appended as a 16th value (BC/PSO scoring).
+    """
+    return evaluate_many(problem, [sessions], subgroup_conflicts)[0]
@@ -0,0 +1,90 @@
+import numpy as np
+
+class Occupancy:
+    """
+    Busy periods of every teacher, room and subgroup of a ProblemInstance, as
+    one int bit mask per resource and day (bit p stands for problem.periods[p],
+    see ProblemInstance.period_mask).
+
+    Testing, reserving and releasing a block are a few integer operations and
+    copy() only copies three flat lists. Sessions are expected not to overlap
+    on a resource: release() clears the block's bits even if another session
+    still holds them.
+    """
+
+    def __init__(self, problem):
+        self.n_days = problem.n_days
+        self.teachers = [0] * (problem.n_teachers * self.n_days)
+        self.rooms = [0] * (problem.n_rooms * self.n_days)
+        self.subgroups = [0] * (problem.n_subgroups * self.n_days)
+
+    def copy(self):
+        other = Occupancy.__new__(Occupancy)
+        other.n_days = self.n_days
+        other.teachers = self.teachers[:]
+        other.rooms = self.rooms[:]
+        other.subgroups = self.subgroups[:]
+        return other
+
+    def busy(self, day, teacher=None, room=None, subgroups=()):
+        """
+        Mask of the periods on 'day' where any of the given resources is in use.
+        """
+        mask = 0
+        if teacher is not None:
+            mask |= self.teachers[teacher * self.n_days + day]
+        if room is not None:
+            mask |= self.rooms[room * self.n_days + day]
+        for sg in subgroups:
+            mask |= self.subgroups[sg * self.n_days + day]
+        return mask
+
+    def is_free(self, day, mask, teacher=None, room=None, subgroups=()):
+        """
+        True if none of the given resources uses a period of 'mask' on 'day'.
+        """
+        return not self.busy(day, teacher, room, subgroups) & mask
+
+    def reserve(self, day, mask, teacher=None, room=None, subgroups=()):
+        if teacher is not None:
+            self.teachers[teacher * self.n_days + day] |= mask
+        if room is not None:
+            self.rooms[room * self.n_days + day] |= mask
+        for sg in subgroups:
+            self.subgroups[sg * self.n_days + day] |= mask
+
+    def release(self, day, mask, teacher=None, room=None, subgroups=()):
+        if teacher is not None:
+            self.teachers[teacher * self.n_days + day] &= ~mask
+        if room is not None:
+            self.rooms[room * self.n_days + day] &= ~mask
+        for sg in subgroups:
+            self.subgroups[sg * self.n_days + day] &= ~mask
+
+def item_slot(problem, item):
+    """
+    Occupancy keys of a scheduled item dict: (day, mask, teacher, room, subgroups).
+    """
+    subgroups = item.get("subgroup", [])
+    if not isinstance(subgroups, list):
+        subgroups = [subgroups]
+    return (
+        problem.day_index[item["day"]["_id"]],
+        problem.period_mask(problem.period_index[p["_id"]] for p in item["period"]),
+        problem.teacher_index[item["teacher"]],
+        problem.room_index[item["room"]["code"]],
+        [problem.subgroup_index[sg] for sg in subgroups],
+    )
+
+def session_slot(problem, row):
+    """
+    Occupancy keys of one row of an encoded solution.
+    """
+    start = int(row["start"])
+    return (
+        int(row["day"]),
+        problem.period_mask(range(start, start + int(row["length"]))),
+        int(row["teacher"]),
+        int(row["room"]),
+        [int(sg) for sg in np.atleast_1d(row["subgroups"]) if sg >= 0],
+    )
@@ -0,0 +1,322 @@
+import numpy as np
+from generator.data_collector import *
+
+STUDENTS_PER_SUBGROUP = 40
+
+# Activity kinds stored in ProblemInstance.activity_kind
+KIND_LECTURE = 0
+KIND_LAB = 1
+KIND_OTHER = 2
+
+ACTIVITY_KINDS = {
+    "Lecture+Tutorial": KIND_LECTURE,
+    "Lab": KIND_LAB,
+}
+
+def activity_kind(activity_type):
+    """
+    Map an activity type string to its integer kind.
+    """
+    return ACTIVITY_KINDS.get(activity_type, KIND_OTHER)
+
+def is_space_suitable(room, activity_type, space_requirements):
+    """
+    Determines if a space is suitable for an activity based on type and requirements.
+    """
+    attributes = room.get("attributes", {})
+    room_name = room.get("name", "").lower()
+    room_code = room.get("code", "").lower()
+    
+    if activity_type == "Lecture+Tutorial":
+        if ("lecture" in room_name or 
+            "lh" in room_code or 
+            room.get("capacity", 0) >= 100):
+            return True
+    
+    elif activity_type == "Lab":
+        if ("lab" in room_name or 
+            "lab" in room_code or 
+            attributes.get("computers") == "Yes"):
+            return True
+    
+    if space_requirements:
+        for req in space_requirements:
+            req_lower = req.lower()
+            if "lecture hall" in req_lower and ("lecture" in room_name or "lh" in room_code):
+                return True
+            elif "lab" in req_lower and ("lab" in room_name or attributes.get("computers") == "Yes"):
+                return True
+    
+    return False
+
+class ProblemInstance:
+    """
+    Integer-indexed view of the scheduling data shared by all solvers.
+
+    Days, periods, rooms, teachers, subgroups, subjects and activities are
+    mapped to dense ids once, and the facts every solver keeps re-deriving
+    from the raw documents (capacities, durations, interval flags, activity
+    to subgroup/teacher incidence) are kept in NumPy arrays.
+
+    The raw documents are kept as well (``days``, ``periods``, ``rooms``,
+    ``activities``...) so a solution can still be expanded into the stored
+    document format.
+    """
+
+    def __init__(self, days, periods, spaces, activities, teachers=None, students=None,
+                 modules=None, years=None, constraints=None,
+                 students_per_subgroup=STUDENTS_PER_SUBGROUP, student_counts=None):
+        self.days = list(days)
+        self.periods = list(periods)
+        self.rooms = list(spaces)
+        self.teachers = list(teachers or [])
+        self.modules = list(modules or [])
+        self.years = list(years or [])
+        self.constraints = list(constraints or [])
+        self.students_per_subgroup = students_per_subgroup
+
+        # Solvers rely on every period carrying its position in the day
+        for idx, period in enumerate(self.periods):
+            if "index" not in period:
+                period["index"] = idx
+
+        # Activities are identified by code; the first document wins, like the
+        # next(...) lookups the solvers used to do.
+        self.activities = []
+        self.activity_index = {}
+        for activity in activities:
+            if activity["code"] in self.activity_index:
+                continue
+            self.activity_index[activity["code"]] = len(self.activities)
+            self.activities.append(activity)
+        self.activity_codes = [a["code"] for a in self.activities]
+
+        self.day_index = {d["_id"]: i for i, d in enumerate(self.days)}
+        self.period_index = {p["_id"]: i for i, p in enumerate(self.periods)}
+        self.room_index = {}
+        for i, room in enumerate(self.rooms):
+            self.room_index.setdefault(room["code"], i)
+        self.room_codes = [r["code"] for r in self.rooms]
+
+        self.teacher_ids = []
+        self.teacher_index = {}
+        for teacher in self.teachers:
+            if "id" in teacher:
+                self._add_teacher(teacher["id"])
+        for activity in self.activities:
+            for t_id in activity.get("teacher_ids", []):
+                self._add_teacher(t_id)
+
+        self.subgroup_ids = []
+        self.subgroup_index = {}
+        for activity in self.activities:
+            for sg in activity.get("subgroup_ids", []):
+                self._add_subgroup(sg)
+
+        self.subject_codes = []
+        self.subject_index = {}
+        for module in self.modules:
+            if "code" in module:
+                self._add_subject(module["code"])
+        for activity in self.activities:
+            self._add_subject(activity.get("subject"))
+
+        self._build_arrays(students, student_counts)
+
+    def _add_teacher(self, teacher_id):
+        if teacher_id not in self.teacher_index:
+            self.teacher_index[teacher_id] = len(self.teacher_ids)
+            self.teacher_ids.append(teacher_id)
+        return self.teacher_index[teacher_id]
+
+    def _add_subgroup(self, subgroup_id):
+        if subgroup_id not in self.subgroup_index:
+            self.subgroup_index[subgroup_id] = len(self.subgroup_ids)
+            self.subgroup_ids.append(subgroup_id)
+        return self.subgroup_index[subgroup_id]
+
+    def _add_subject(self, subject):
+        if subject is None:
+            return -1
+        if subject not in self.subject_index:
+            self.subject_index[subject] = len(self.subject_codes)
+            self.subject_codes.append(subject)
+        return self.subject_index[subject]
+
+    def _build_arrays(self, students, student_counts):
+        n_act = len(self.activities)
+
+        self.room_capacity = np.array([r.get("capacity", 0) for r in self.rooms], dtype=np.int64)
+        self.period_order = np.array([p["index"] for p in self.periods], dtype=np.int64)
+        self.period_is_interval = np.array([bool(p.get("is_interval", False)) for p in self.periods], dtype=bool)
+
+        self.activity_duration = np.array([a.get("duration", 1) for a in self.activities], dtype=np.int64)
+        self.activity_kind = np.array([activity_kind(a.get("type", "Lecture+Tutorial")) for a in self.activities], dtype=np.int8)
+        self.activity_subject = np.array([self.subject_index.get(a.get("subject"), -1) for a in self.activities], dtype=np.int64)
+
+        # Ragged incidence lists (in document order) plus dense boolean matrices
+        self.activity_subgroup_list = [
+            np.array([self.subgroup_index[sg] for sg in a.get("subgroup_ids", [])], dtype=np.int64)
+            for a in self.activities
+        ]
+        self.activity_teacher_list = [
+            np.array([self.teacher_index[t] for t in a.get("teacher_ids", [])], dtype=np.int64)
+            for a in self.activities
+        ]
+        self.activity_subgroups = np.zeros((n_act, self.n_subgroups), dtype=bool)
+        self.activity_teachers = np.zeros((n_act, self.n_teachers), dtype=bool)
+        for a_idx in range(n_act):
+            self.activity_subgroups[a_idx, self.activity_subgroup_list[a_idx]] = True
+            self.activity_teachers[a_idx, self.activity_teacher_list[a_idx]] = True
+
+        self.activity_subgroup_count = np.array([len(sgs) for sgs in self.activity_subgroup_list], dtype=np.int64)
+        self.activity_student_count = self.activity_subgroup_count * self.students_per_subgroup
+        self.max_subgroups = max(1, int(self.activity_subgroup_count.max(initial=0)))
+
+        # Room type check used when scoring, per activity kind (no extra requirements)
+        kind_types = {KIND_LECTURE: "Lecture+Tutorial", KIND_LAB: "Lab", KIND_OTHER: None}
+        self.kind_room_suitable = np.zeros((len(kind_types), self.n_rooms), dtype=bool)
+        for kind, activity_type in kind_types.items():
+            for r_idx, room in enumerate(self.rooms):
+                self.kind_room_suitable[kind, r_idx] = is_space_suitable(room, activity_type, [])
+
+        # Every block of consecutive non-interval periods per duration, earliest
+        # first, as (positions, mask) with bit p of mask standing for periods[p].
+        # Consecutive means no period index value is skipped.
+        non_interval = sorted((p for p in range(len(self.periods)) if not self.period_is_interval[p]),
+                              key=lambda p: self.periods[p]["index"])
+        self.block_table = {}
+        for duration in range(1, len(non_interval) + 1):
+            blocks = []
+            for i in range(len(non_interval) - duration + 1):
+                positions = tuple(non_interval[i:i + duration])
+                indices = [self.periods[p]["index"] for p in positions]
+                if all(indices[j + 1] == indices[j] + 1 for j in range(duration - 1)):
+                    blocks.append((positions, self.period_mask(positions)))
+            blocks.sort(key=lambda block: self.periods[block[0][0]]["index"])
+            self.block_table[duration] = blocks
+
+        # Room suitability per activity (type and space requirements), and whether
+        # the room also seats the whole activity. Computed once here so the
+        # constructors never call is_space_suitable while building.
+        self.activity_room_suitable = np.zeros((n_act, self.n_rooms), dtype=bool)
+        for a_idx, activity in enumerate(self.activities):
+            activity_type = activity.get("type", "Lecture+Tutorial")
+            space_requirements = activity.get("space_requirements", [])
+            for r_idx, room in enumerate(self.rooms):
+                self.activity_room_suitable[a_idx, r_idx] = is_space_suitable(room, activity_type, space_requirements)
+        self.activity_room_feasible = self.activity_room_suitable & (
+            self.room_capacity[np.newaxis, :] >= self.activity_student_count[:, np.newaxis])
+        self.lab_room_suitable = np.array([is_space_suitable(r, "Lab", ["Lab Room"]) for r in self.rooms], dtype=bool)
+
+        # Candidate rooms per activity, largest first (ties in document order)
+        by_capacity = np.argsort(-self.room_capacity, kind="stable")
+        self.activity_candidate_rooms = [by_capacity[self.activity_room_suitable[a_idx, by_capacity]] for a_idx in range(n_act)]
+        self.activity_fitting_rooms = [by_capacity[self.activity_room_feasible[a_idx, by_capacity]] for a_idx in range(n_act)]
+
+        # Enrolment per subject, used where the solvers counted matching students,
+        # and registered students per subgroup. Either counted here from student
+        # documents or taken from the counts aggregated by load_student_counts().
+        self.subject_student_count = np.zeros(self.n_subjects, dtype=np.int64)
+        self.subgroup_student_count = np.zeros(self.n_subgroups, dtype=np.int64)
+        if student_counts is not None:
+            for subject, count in student_counts.get("subjects", {}).items():
+                s_idx = self.subject_index.get(subject)
+                if s_idx is not None:
+                    self.subject_student_count[s_idx] = count
+            for subgroup, count in student_counts.get("subgroups", {}).items():
+                sg_idx = self.subgroup_index.get(subgroup)
+                if sg_idx is not None:
+                    self.subgroup_student_count[sg_idx] = count
+        for student in students or []:
+            for subject in set(student.get("subjects") or []):
+                s_idx = self.subject_index.get(subject)
+                if s_idx is not None:
+                    self.subject_student_count[s_idx] += 1
+            sg_idx = self.subgroup_index.get(student.get("year_group"))
+            if sg_idx is not None:
+                self.subgroup_student_count[sg_idx] += 1
+
+    @classmethod
+    def from_data_collector(cls, students_per_subgroup=STUDENTS_PER_SUBGROUP):
+        """
+        Build an instance straight from the database collections.
+        """
+        return cls(
+            get_days(),
+            get_periods(),
+            get_spaces(),
+            get_activities(),
+            teachers=get_teachers(),
+            student_counts=get_student_counts(),
+            modules=get_modules(),
+            years=get_years(),
+            constraints=get_constraints(),
+            students_per_subgroup=students_per_subgroup,
+        )
+
+    @property
+    def n_days(self):
+        return len(self.days)
+
+    @property
+    def n_periods(self):
+        return len(self.periods)
+
+    @property
+    def n_rooms(self):
+        return len(self.rooms)
+
+    @property
+    def n_teachers(self):
+        return len(self.teacher_ids)
+
+    @property
+    def n_subgroups(self):
+        return len(self.subgroup_ids)
+
+    @property
+    def n_subjects(self):
+        return len(self.subject_codes)
+
+    @property
+    def n_activities(self):
+        return len(self.activities)
+
+    def period_mask(self, positions):
+        """
+        Bit mask of period positions (bit p stands for periods[p]).
+        """
+        mask = 0
+        for p in positions:
+            mask |= 1 << int(p)
+        return mask
+
+    def free_blocks(self, duration, busy):
+        """
+        Blocks of 'duration' consecutive non-interval periods (tuples of period
+        positions, earliest first) that do not touch any period in the 'busy' mask.
+        """
+        return [positions for positions, mask in self.block_table.get(duration, ()) if not busy & mask]
+
+    def activity_by_code(self, code):
+        """
+        Return the activity document for a code, or None if it is unknown.
+        """
+        idx = self.activity_index.get(code)
+        return self.activities[idx] if idx is not None else None
+
+    def day_by_id(self, day_id):
+        idx = self.day_index.get(day_id)
+        return self.days[idx] if idx is not None else None
+
+    def room_by_code(self, room_code):
+        idx = self.room_index.get(room_code)
+        return self.rooms[idx] if idx is not None else None
+
+    def subject_demand(self, subject):
+        """
+        Number of students enrolled in a subject.
+        """
+        idx = self.subject_index.get(subject)
+        return int(self.subject_student_count[idx]) if idx is not None else 0
@@ -0,0 +1,193 @@
+import random
+from generator.data_collector import load_snapshot
+from generator.problem import ProblemInstance, KIND_LAB
+from generator.constraints import activity_durations
+from generator.solution import make_session, EncodedSolution
+from generator.warm_start import load_stored_timetable, warm_start_sessions
+from generator.evaluation.delta import DeltaEvaluator, F_ACTIVITY
+from generator.budget import Budget
+
+REPAIR_CANDIDATES = 200  # placements scored per session and pass; more finds better slots, but slower
+REPAIR_ROUNDS = 3        # local search passes over the re-placed sessions
+
+def load_problem(snapshot=None):
+    """
+    ProblemInstance of the current data, with the TC-014 durations applied
+    the way the solvers apply them.
+    """
+    if snapshot is None:
+        snapshot = load_snapshot()
+    for idx, period in enumerate(snapshot["periods"]):
+        period.setdefault("index", idx)
+    durations = activity_durations(snapshot["constraints"])
+    for activity in snapshot["activities"]:
+        if activity["code"] in durations:
+            activity["duration"] = durations[activity["code"]]
+    return ProblemInstance(snapshot["days"], snapshot["periods"], snapshot["spaces"], snapshot["activities"],
+                           teachers=snapshot["teachers"], student_counts=snapshot["student_counts"],
+                           modules=snapshot["modules"], years=snapshot["years"],
+                           constraints=snapshot["constraints"])
+
+def changed_resources(problem, changes):
+    """
+    Resources touched by a diff {"activities": [codes], "rooms": [codes],
+    "teachers": [ids], "constraints": [constraint codes]}, keyed by the field
+    names the constraint details use. A changed constraint touches every
+    teacher, subgroup, room and activity named in its details.
+    """
+    touched = {
+        "activity_code": set(changes.get("activities", [])),
+        "room_id": set(changes.get("rooms", [])),
+        "teacher_id": set(changes.get("teachers", [])),
+        "subgroup_id": set(),
+    }
+    codes = set(changes.get("constraints", []))
+    for constraint in problem.constraints:
+        details = constraint.get("details")
+        if constraint.get("code") not in codes or not isinstance(details, dict):
+            continue
+        for key, entries in details.items():
+            if key in problem.teacher_index:
+                # TC-001 is keyed by teacher id
+                touched["teacher_id"].add(key)
+            if not isinstance(entries, list):
+                continue
+            for entry in entries:
+                for field, ids in touched.items():
+                    if isinstance(entry, dict) and field in entry:
+                        ids.add(entry[field])
+    return touched
+
+def is_affected(item, touched):
+    """
+    True if a stored scheduled item uses a touched resource.
+    """
+    subgroups = item.get("subgroup", [])
+    if not isinstance(subgroups, list):
+        subgroups = [subgroups]
+    return (item.get("activity_id") in touched["activity_code"]
+            or (item.get("room") or {}).get("code") in touched["room_id"]
+            or item.get("teacher") in touched["teacher_id"]
+            or not touched["subgroup_id"].isdisjoint(subgroups))
+
+def session_templates(problem, a_idx):
+    """
+    (subgroup ids, student count, split, rooms) of each session an activity
+    needs: one for the whole activity, or one per subgroup for a lab that
+    no room can seat.
+    """
+    subgroups = problem.activities[a_idx].get("subgroup_ids", [])
+    fitting = problem.activity_fitting_rooms[a_idx].tolist()
+    if fitting or problem.activity_kind[a_idx] != KIND_LAB:
+        return [(subgroups, len(subgroups) * problem.students_per_subgroup, False, fitting)]
+    labs = [r for r in problem.activity_candidate_rooms[a_idx].tolist() if problem.lab_room_suitable[r]]
+    return [([sg], problem.students_per_subgroup, True, labs) for sg in subgroups]
+
+def placements(state, a_idx, template):
+    """
+    Session records for every clash-free block, teacher and room the
+    template can take around the sessions held by 'state'.
+    """
+    problem = state.problem
+    subgroups, students, split, rooms = template
+    activity = problem.activities[a_idx]
+    duration = activity["duration"]
+    sg_indices = [problem.subgroup_index[sg] for sg in subgroups]
+    unavailable = state.tables.teacher_unavailable_mask
+    result = []
+    for t_idx in problem.activity_teacher_list[a_idx].tolist():
+        for d_idx in range(problem.n_days):
+            for positions in problem.free_blocks(duration, unavailable[t_idx][d_idx]):
+                start = positions[0]
+                if not state.block_is_free(d_idx, start, duration, teacher=t_idx, subgroups=sg_indices):
+                    continue
+                for r_idx in rooms:
+                    if state.block_is_free(d_idx, start, duration, room=r_idx):
+                        result.append(make_session(problem, activity, d_idx, start, r_idx, t_idx, subgroups,
+                                                   students, split))
+    return result
+
+def best_placement(state, slot, candidates, budget, limit=REPAIR_CANDIDATES):
+    """
+    (fitness change, record) of the best of up to 'limit' candidates for
+    'slot' (None appends a session), or None if there are none.
+    """
+    if len(candidates) > limit:
+        candidates = random.sample(candidates, limit)
+    best = None
+    for record in candidates:
+        change = state.score_change([(slot, record)])
+        if best is None or change < best[0]:
+            best = (change, record)
+    budget.spend(len(candidates))
+    return best
+
+def repair_timetable(algorithm, changes=None, snapshot=None, time_limit=None, max_evaluations=None):
+    """
+    Incremental re-solve of the stored timetables of 'algorithm' after small
+    data edits.
+
+    Sessions using a resource named in 'changes' (see changed_resources) are
+    unscheduled, as are those that no longer fit the current data or clash
+    with the rest (see warm_start_sessions). Everything else stays fixed.
+    The activities left without sessions are placed greedily at their best
+    scoring slot, then a local search moves only those sessions while it
+    improves the fitness, for REPAIR_ROUNDS passes or until the budget runs
+    out.
+
+    Returns (EncodedSolution, run stats).
+    """
+    problem = load_problem(snapshot)
+    budget = Budget(time_limit, max_evaluations)
+    touched = changed_resources(problem, changes or {})
+    items = load_stored_timetable(algorithm)
+    kept = [item for item in items if not is_affected(item, touched)]
+    state = DeltaEvaluator(problem, warm_start_sessions(problem, kept))
+    fixed = len(state.slots)
+    before = state.score()
+
+    scheduled = {record[F_ACTIVITY] for record in state.slots}
+    missing = [a_idx for a_idx in range(problem.n_activities) if a_idx not in scheduled]
+    missing.sort(key=lambda a_idx: -problem.activity_subgroup_count[a_idx])
+    templates = {}  # slot -> (activity, template) of the sessions placed here
+    unplaced = []
+    for a_idx in missing:
+        for template in session_templates(problem, a_idx):
+            best = best_placement(state, None, placements(state, a_idx, template), budget)
+            if best is None:
+                unplaced.append(problem.activity_codes[a_idx])
+                break
+            templates[len(state.slots)] = (a_idx, template)
+            state.apply([(None, best[1])])
+
+    rounds = 0
+    while rounds < REPAIR_ROUNDS and not budget.exhausted():
+        rounds += 1
+        improved = False
+        for slot, (a_idx, template) in templates.items():
+            if budget.exhausted():
+                break
+            token = state.apply([(slot, None)])
+            candidates = placements(state, a_idx, template)
+            state.undo(token)
+            best = best_placement(state, slot, candidates, budget)
+            if best is not None and best[0] < 0:
+                state.apply([(slot, best[1])])
+                improved = True
+        if not improved:
+            break
+
+    hard, soft = state.score()
+    stats = {
+        "kept_sessions": fixed,
+        "released_sessions": len(items) - fixed,
+        "placed_sessions": len(templates),
+        "unplaced_activities": sorted(set(unplaced)),
+        "iterations": rounds,
+        "stop_reason": budget.exhausted() or "completed",
+        "score_before": sum(before),
+        "hard": hard,
+        "soft": soft,
+    }
+    stats.update(budget.stats())
+    return EncodedSolution(problem, state.sessions()), stats
@@ -0,0 +1,156 @@
+import uuid
+import numpy as np
+from generator.problem import activity_kind, KIND_LECTURE, KIND_LAB
+
+def session_dtype(subgroup_width):
+    """
+    Structured dtype for one encoded session. Subgroups are stored as a fixed
+    width row of subgroup ids padded with -1.
+    """
+    return np.dtype([
+        ("activity", np.int32),       # activity id, -1 if the code is unknown
+        ("day", np.int16),
+        ("start", np.int16),          # position of the first period in problem.periods
+        ("length", np.int16),         # number of periods in the block
+        ("room", np.int32),
+        ("teacher", np.int32),
+        ("duration", np.int16),       # duration the session was scheduled for
+        ("student_count", np.int32),
+        ("kind", np.int8),            # activity kind of the session
+        ("subject", np.int32),        # subject id, -1 if unknown
+        ("split", np.bool_),          # lab session split per subgroup
+        ("subgroups", np.int32, (subgroup_width,)),
+    ])
+
+def make_session(problem, activity, day, start, room, teacher, subgroup_ids, student_count, is_split=False):
+    """
+    Session record (a plain tuple in session_dtype order, subgroups as a tuple
+    of ids) for an activity placed on a block of its duration.
+    """
+    act = problem.activity_index[activity["code"]]
+    return (
+        act, day, start, activity["duration"], room, teacher, activity["duration"],
+        student_count, int(problem.activity_kind[act]), int(problem.activity_subject[act]),
+        is_split, tuple(problem.subgroup_index[sg] for sg in subgroup_ids),
+    )
+
+def sessions_from_records(problem, records, width=None):
+    """
+    Build an encoded solution from session records.
+    """
+    width = max(width or 0, problem.max_subgroups)
+    rows = [record[:-1] + (list(record[-1]) + [-1] * (width - len(record[-1])),) for record in records]
+    return np.array(rows, dtype=session_dtype(width))
+
+class EncodedSolution:
+    """
+    A solution as returned by the solvers: the encoded sessions plus the
+    ProblemInstance their ids refer to. Copying it copies one buffer; the
+    scheduled item dicts are only built by decode(), when the timetable is saved.
+    """
+    __slots__ = ("problem", "sessions")
+
+    def __init__(self, problem, sessions):
+        self.problem = problem
+        self.sessions = sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def copy(self):
+        return EncodedSolution(self.problem, self.sessions.copy())
+
+    def decode(self):
+        return decode_solution(self.problem, self.sessions)
+
+def _item_subgroups(item):
+    subgroups = item.get("subgroup", [])
+    if isinstance(subgroups, list):
+        return subgroups
+    return [subgroups]
+
+def _item_activity(item):
+    # RL items name the activity code "activity" instead of "activity_id"
+    return item.get("activity_id", item.get("activity"))
+
+def item_resolves(problem, item):
+    """
+    True if the activity, day, periods, room, teacher and subgroups a stored
+    scheduled item refers to still exist in the ProblemInstance and its
+    periods are a run of consecutive problem.periods, i.e. encode_solution
+    can encode it. RL blocks that wrap around the end of the day are not.
+    """
+    block = item.get("period") or []
+    if not (block and all(period.get("_id") in problem.period_index for period in block)):
+        return False
+    start = problem.period_index[block[0]["_id"]]
+    return (_item_activity(item) in problem.activity_index
+            and [period["_id"] for period in block] == [period["_id"] for period in problem.periods[start:start + len(block)]]
+            and (item.get("day") or {}).get("_id") in problem.day_index
+            and (item.get("room") or {}).get("code") in problem.room_index
+            and item.get("teacher") in problem.teacher_index
+            and all(sg in problem.subgroup_index for sg in _item_subgroups(item)))
+
+def encode_solution(problem, solution):
+    """
+    Encode a solution (list of scheduled item dicts) as a structured array with
+    one row per session.
+
+    A session's periods are stored as (start, length) over problem.periods, which
+    holds for every constructor since they only ever place consecutive periods.
+    Every item must resolve against the problem (see item_resolves).
+    """
+    width = problem.max_subgroups
+    for item in solution:
+        width = max(width, len(_item_subgroups(item)))
+
+    rows = []
+    for item in solution:
+        subgroup_ids = [problem.subgroup_index[sg] for sg in _item_subgroups(item)]
+        subgroup_ids += [-1] * (width - len(subgroup_ids))
+        block = item["period"]
+        rows.append((
+            problem.activity_index.get(_item_activity(item), -1),
+            problem.day_index[item["day"]["_id"]],
+            problem.period_index[block[0]["_id"]],
+            len(block),
+            problem.room_index[item["room"]["code"]],
+            problem.teacher_index[item["teacher"]],
+            item["duration"],
+            item.get("student_count", 0),
+            activity_kind(item.get("activity_type", "Lecture+Tutorial")),
+            problem.subject_index.get(item.get("subject"), -1),
+            bool(item.get("is_split", False)),
+            subgroup_ids,
+        ))
+    return np.array(rows, dtype=session_dtype(width))
+
+def decode_solution(problem, sessions):
+    """
+    Expand an encoded solution back into the scheduled item dicts stored by
+    save_timetable. Each session gets a fresh session_id.
+    """
+    kind_types = {KIND_LECTURE: "Lecture+Tutorial", KIND_LAB: "Lab"}
+    solution = []
+    for row in sessions:
+        act = int(row["activity"])
+        activity = problem.activities[act] if act >= 0 else {}
+        start, length = int(row["start"]), int(row["length"])
+        subject = int(row["subject"])
+        item = {
+            "session_id": str(uuid.uuid4()),
+            "subgroup": [problem.subgroup_ids[sg] for sg in np.atleast_1d(row["subgroups"]) if sg >= 0],
+            "activity_id": activity.get("code"),
+            "day": problem.days[int(row["day"])],
+            "period": problem.periods[start:start + length],
+            "room": problem.rooms[int(row["room"])],
+            "teacher": problem.teacher_ids[int(row["teacher"])],
+            "duration": int(row["duration"]),
+            "subject": problem.subject_codes[subject] if subject >= 0 else activity.get("subject"),
+            "student_count": int(row["student_count"]),
+            "activity_type": kind_types.get(int(row["kind"]), activity.get("type", "Lecture+Tutorial")),
+        }
+        if row["split"]:
+            item["is_split"] = True
+        solution.append(item)
+    return solution
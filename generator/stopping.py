@@ -0,0 +1,41 @@
+PATIENCE = None     # iterations without improvement before stopping; None never stops
+SOFT_TARGET = None  # stop once the best has no hard violations and soft is at most this
+LOWER_BOUND = 0     # stop once the best score reaches this; 0 is a timetable without violations
+
+class EarlyStopping:
+    """
+    Convergence rules checked by the metaheuristics after every iteration.
+    Each rule is disabled with None.
+
+    check() returns the reason to stop ("lower_bound", "soft_target" or
+    "no_improvement"), which the solvers record as stop_reason in their run
+    stats, or None to carry on.
+    """
+
+    def __init__(self, patience=PATIENCE, soft_target=SOFT_TARGET, lower_bound=LOWER_BOUND):
+        self.patience = patience
+        self.soft_target = soft_target
+        self.lower_bound = lower_bound
+        self.best = float('inf')
+        self.stale = 0  # checks since the best score last improved
+
+    def check(self, best_score, hard_soft=None):
+        """
+        Call with the best score found so far. hard_soft is a callable
+        returning the (hard, soft) split of that best; it is only called when
+        soft_target is set.
+        """
+        if best_score < self.best:
+            self.best = best_score
+            self.stale = 0
+        else:
+            self.stale += 1
+        if self.lower_bound is not None and best_score <= self.lower_bound:
+            return "lower_bound"
+        if self.soft_target is not None and hard_soft is not None:
+            hard, soft = hard_soft()
+            if hard == 0 and soft <= self.soft_target:
+                return "soft_target"
+        if self.patience is not None and self.stale >= self.patience:
+            return "no_improvement"
+        return None
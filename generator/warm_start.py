@@ -0,0 +1,120 @@
+from collections import defaultdict
+from generator.solution import make_session, sessions_from_records
+from generator.occupancy import Occupancy
+from generator.constraints import constraint_tables
+from generator.evaluation.delta import session_record
+
+WARM_SHARE = 0.5  # share of food sources, particles or GA individuals seeded from the stored timetable
+
+def load_stored_timetable(source="published"):
+    """
+    Scheduled items of a stored timetable to warm-start from.
+
+    source is "published" (the timetable of the published algorithm), an
+    algorithm code such as "CO" (all its semester timetables in Timetable) or
+    a timetable code such as "CO-TT0000" (that timetable, or its latest copy
+    in old_timetables). Returns an empty list when nothing matches.
+    """
+    from utils.database import db
+    if source == "published":
+        published = db["settings"].find_one({"option": "published_algorithm"})
+        if not published:
+            return []
+        source = published["value"]
+    docs = list(db["Timetable"].find({"algorithm": source}))
+    if not docs:
+        docs = list(db["Timetable"].find({"code": source}))
+    if not docs:
+        docs = list(db["old_timetables"].find({"code": source}).sort("date_created", -1).limit(1))
+    return [item for doc in docs for item in doc.get("timetable", [])]
+
+def warm_start_sessions(problem, items):
+    """
+    Map stored scheduled items onto the activities of a ProblemInstance and
+    return the encoded sessions that still fit.
+
+    Items are matched by activity code; days and periods by id, then by name.
+    A session is kept only if its block still has the activity's current
+    duration, its room is still suitable (and seats the activity unless it is
+    a split lab), its teacher still teaches the activity and is available,
+    and it does not clash with the sessions kept before it. An activity is
+    kept whole or dropped: all its current subgroups must be covered. The
+    dropped activities are left for the constructors to place.
+    """
+    days = {day.get("name"): d for d, day in enumerate(problem.days)}
+    periods = {period.get("name"): p for p, period in enumerate(problem.periods)}
+    blocks = {}  # duration -> start position -> mask
+    unavailable = constraint_tables(problem).teacher_unavailable_mask
+    occupancy = Occupancy(problem)
+
+    by_activity = defaultdict(list)
+    for item in items:
+        if item.get("activity_id") in problem.activity_index:
+            by_activity[item["activity_id"]].append(item)
+
+    records = []
+    for code, stored in by_activity.items():
+        a_idx = problem.activity_index[code]
+        activity = problem.activities[a_idx]
+        duration = activity["duration"]
+        if duration not in blocks:
+            blocks[duration] = {positions[0]: mask for positions, mask in problem.block_table.get(duration, [])}
+        subgroup_ids = activity.get("subgroup_ids", [])
+
+        sessions = []
+        for item in stored:
+            day, period = item.get("day") or {}, (item.get("period") or [{}])[0]
+            d_idx = problem.day_index.get(day.get("_id"), days.get(day.get("name")))
+            start = problem.period_index.get(period.get("_id"), periods.get(period.get("name")))
+            r_idx = problem.room_index.get((item.get("room") or {}).get("code"))
+            t_idx = problem.teacher_index.get(item.get("teacher"))
+            if d_idx is None or start not in blocks[duration] or r_idx is None or t_idx is None:
+                break
+            split = bool(item.get("is_split", False))
+            rooms = problem.activity_room_suitable if split else problem.activity_room_feasible
+            if not rooms[a_idx, r_idx] or not problem.activity_teachers[a_idx, t_idx]:
+                break
+            mask = blocks[duration][start]
+            if mask & unavailable[t_idx][d_idx]:
+                break
+            subgroups = item.get("subgroup", [])
+            if not isinstance(subgroups, list):
+                subgroups = [subgroups]
+            sessions.append((d_idx, start, mask, r_idx, t_idx, subgroups, split))
+        else:
+            covered = [sg for session in sessions for sg in session[5]]
+            if sorted(covered) != sorted(subgroup_ids):
+                continue
+            if len(sessions) > 1 and not all(session[6] for session in sessions):
+                continue
+            kept = []
+            for d_idx, start, mask, r_idx, t_idx, subgroups, split in sessions:
+                sg_indices = [problem.subgroup_index[sg] for sg in subgroups]
+                if not occupancy.is_free(d_idx, mask, t_idx, r_idx, sg_indices):
+                    break
+                occupancy.reserve(d_idx, mask, t_idx, r_idx, sg_indices)
+                kept.append((d_idx, mask, t_idx, r_idx, sg_indices))
+                records.append(make_session(problem, activity, d_idx, start, r_idx, t_idx, subgroups,
+                                            len(subgroups) * problem.students_per_subgroup, split))
+            else:
+                continue
+            # Clashes with an activity kept earlier: drop this one
+            for slot in kept:
+                occupancy.release(*slot)
+            del records[len(records) - len(kept):]
+    return sessions_from_records(problem, records)
+
+def seed_construction(problem, seed, occupancy):
+    """
+    Start a construction from warm-start sessions: reserve them in occupancy
+    and return their records, which the constructors extend with the
+    activities still missing.
+    """
+    records = []
+    for row in seed:
+        record = session_record(row)
+        start, length = record[2], record[3]
+        occupancy.reserve(record[1], problem.period_mask(range(start, start + length)),
+                          record[5], record[4], record[-1])
+        records.append(record)
+    return records
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from models.activity_model import Activity 
 from utils.database import db 
+from generator.data_collector import invalidate_snapshot
 from routers.user_router import get_current_user
 
 router = APIRouter()
@@ -16,6 +17,7 @@ async def create_activity(activity: Activity, current_user: dict = Depends(get_c
         raise HTTPException(status_code=400, detail="Activity code must be unique")
     
     db["Activities"].insert_one(activity.model_dump())
+    invalidate_snapshot()
     return activity
 
 @router.get("/activities", response_model=List[Activity])
@@ -40,6 +42,7 @@ async def update_activity(activity_code: str, updated_activity: Activity, curren
         raise HTTPException(status_code=404, detail="Activity not found")
     
     db["Activities"].update_one({"code": activity_code}, {"$set": updated_activity.model_dump()})
+    invalidate_snapshot()
     return updated_activity
 
 @router.delete("/activities/{activity_code}")
@@ -52,4 +55,5 @@ async def delete_activity(activity_code: str, current_user: dict = Depends(get_c
         raise HTTPException(status_code=404, detail="Activity not found")
     
     db["Activities"].delete_one({"code": activity_code})
+    invalidate_snapshot()
     return {"message": "Activity deleted successfully"}
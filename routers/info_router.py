@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from pymongo import ReplaceOne
 from models.info_model import UniversityInfo, PeriodOfOperation, DayOfOperation
 from utils.database import db
+from generator.data_collector import invalidate_snapshot
 from typing import List
 from fastapi.security import OAuth2PasswordBearer
 from routers.user_router import get_current_user
@@ -53,6 +54,7 @@ async def add_days_of_operation(days: List[DayOfOperation], current_user: dict =
     for day in existing_days:
         if day not in {day.name for day in days}:
             days_collection.delete_one({"name": day})
+    invalidate_snapshot()
 
     return list(days_collection.find())
 
@@ -78,6 +80,7 @@ async def add_periods_of_operation(periods: List[PeriodOfOperation], current_use
             raise HTTPException(status_code=400, detail=f"Period {period.name} already exists.")
     
     db["periods_of_operation"].insert_many([period.dict() for period in periods])
+    invalidate_snapshot()
     return periods
 
 
@@ -111,6 +114,7 @@ async def update_periods_of_operation(periods: List[PeriodOfOperation], current_
     for period in existing_periods:
         if period['name'] not in incoming_period_names:
             collection.delete_one({"name": period['name']})
+    invalidate_snapshot()
 
     return updated_periods
 
@@ -118,9 +122,13 @@ async def update_periods_of_operation(periods: List[PeriodOfOperation], current_
 @router.delete("/periods", response_model=List[str])
 async def delete_periods_of_operation(period_names: List[str], current_user: dict = Depends(get_admin_role)):
     deleted_periods = []
-    for period_name in period_names:
-        result = db["periods_of_operation"].delete_one({"name": period_name})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail=f"Period {period_name} not found.")
-        deleted_periods.append(period_name)
+    try:
+        for period_name in period_names:
+            result = db["periods_of_operation"].delete_one({"name": period_name})
+            if result.deleted_count == 0:
+                raise HTTPException(status_code=404, detail=f"Period {period_name} not found.")
+            deleted_periods.append(period_name)
+    finally:
+        # Periods deleted before a 404 are gone too
+        invalidate_snapshot()
     return {"message": f"Periods {', '.join(deleted_periods)} deleted successfully"}
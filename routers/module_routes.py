@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.module_model import Module
 from utils.database import db
+from generator.data_collector import invalidate_snapshot
 from typing import List
 from routers.user_router import get_current_user
 
@@ -24,6 +25,7 @@ async def add_module(module: Module, current_user: dict = Depends(get_admin_role
         raise HTTPException(status_code=400, detail=f"Module with code {module.code} already exists.")
     
     db["modules"].insert_one(module.dict())
+    invalidate_snapshot()
     return module
 
 
@@ -38,6 +40,7 @@ async def update_module(module_code: str, module: Module, current_user: dict = D
     result = db["modules"].update_one(
         {"code": module_code}, {"$set": module.dict()}
     )
+    invalidate_snapshot()
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail=f"Module with code {module_code} not found.")
     # Fix: Return the updated module instead of all modules
@@ -50,6 +53,7 @@ async def update_module(module_code: str, module: Module, current_user: dict = D
 @router.delete("/modules/{module_code}")
 async def delete_module(module_code: str, current_user: dict = Depends(get_admin_role)):
     result = db["modules"].delete_one({"code": module_code})
+    invalidate_snapshot()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail=f"Module with code {module_code} not found.")
     return {"message": f"Module with code {module_code} deleted successfully"}
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from models.space_model import Space
 from utils.database import db
+from generator.data_collector import invalidate_snapshot
 from typing import List
 from routers.user_router import get_current_user
 
@@ -16,6 +17,7 @@ async def add_space(space: Space, current_user: dict = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Space with this code already exists")
     
     db["Spaces"].insert_one(space.dict())
+    invalidate_snapshot()
     return space
 
 @router.get("/spaces", response_model=List[dict])
@@ -47,6 +49,7 @@ async def update_space(space_code: str, updated_space: Space, current_user: dict
         raise HTTPException(status_code=403, detail="Permission denied")
     
     result = db["Spaces"].update_one({"code": space_code}, {"$set": updated_space.dict()})
+    invalidate_snapshot()
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Space not found")
     spaces = list(db["Spaces"].find())
@@ -59,6 +62,7 @@ async def delete_space(space_code: str, current_user: dict = Depends(get_current
         raise HTTPException(status_code=403, detail="Permission denied")
     
     result = db["Spaces"].delete_one({"code": space_code})
+    invalidate_snapshot()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Space not found")
     
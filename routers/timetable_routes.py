@@ -9,26 +9,61 @@ from generator.algorithms.rl.rl import *
 from generator.algorithms.eval.eval import *
 from generator.algorithms.bc.bc_v1 import *
 from generator.algorithms.pso.pso_v1 import *
+from generator.algorithms.sa.sa_v1 import *
+from generator.algorithms.ts.ts_v1 import *
+from generator.solution import EncodedSolution
+from generator.repair import repair_timetable
 from datetime import datetime
 from bson import ObjectId
 from models.timetable_model import Timetable
 from utils.timetable_validator import ConflictChecker
+from services.generation_jobs import submit_generation, get_job, cancel_job, TIME_LIMIT, ALGORITHMS
 
 
 router = APIRouter()
 
 @router.post("/generate")
-async def generate_timetable(current_user: dict = Depends(get_current_user)):
-    # Example usage of your scheduling algorithm:
-    sol = generate_co()  # The solution returned by your ACO-based function
-    save_timetable(sol, "CO", current_user)
-    bc = generate_bco()
-    save_timetable(bc, "BC", current_user)
-    pso = generate_pso()
-    save_timetable(pso, "PSO", current_user)
-    # Save solution under "CO" algorithm name
-    
-    return {"message": "Timetable generated using CO."}
+async def generate_timetable(time_limit: float = Query(None, gt=0),
+                             warm_start: str = Query(None),
+                             lns: List[str] = Query(None),
+                             algorithms: List[str] = Query(None),
+                             current_user: dict = Depends(get_current_user)):
+    # The enabled algorithms run concurrently in a background job; poll GET /generate/{job_id}.
+    # time_limit (seconds) caps each algorithm's run.
+    # warm_start ("published", an algorithm such as CO, or a timetable code) seeds the
+    # solvers from that stored timetable; activities that no longer fit are rescheduled.
+    # lns lists the algorithms whose result is post-optimized with LNS (?lns=CO&lns=PSO).
+    # algorithms picks the algorithms to run (?algorithms=SA&algorithms=TS); default: the enabled ones.
+    unknown = sorted(set(algorithms or []) - set(ALGORITHMS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown algorithms: {', '.join(unknown)}")
+    job_id = submit_generation(current_user, time_limit or TIME_LIMIT, warm_start, lns, algorithms)
+    return {"message": "Timetable generation started.", "job_id": job_id}
+
+@router.post("/generate/repair/{algorithm}")
+def repair_timetables(algorithm: str, changes: dict, time_limit: float = Query(None, gt=0),
+                      current_user: dict = Depends(get_current_user)):
+    # Incremental re-solve after small edits: only the sessions touched by 'changes'
+    # ({"activities": [...], "rooms": [...], "teachers": [...], "constraints": [...]})
+    # or no longer valid are rescheduled; the rest of the stored timetables stay as they are.
+    if not db["Timetable"].find_one({"algorithm": algorithm}):
+        raise HTTPException(status_code=404, detail=f"No stored timetables for {algorithm}")
+    solution, stats = repair_timetable(algorithm, changes, time_limit=time_limit or TIME_LIMIT)
+    save_timetable(solution, algorithm, current_user, stats)
+    return {"message": "Timetables repaired.", "algorithm": algorithm, "run": stats}
+
+@router.get("/generate/{job_id}")
+async def get_generation_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    status = get_job(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return status
+
+@router.delete("/generate/{job_id}")
+async def cancel_generation(job_id: str, current_user: dict = Depends(get_current_user)):
+    if not cancel_job(job_id):
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return {"message": "Cancellation requested", "job_id": job_id}
 
 def map_subgroup_to_semester(subgroup_id: str):
     """
@@ -58,9 +93,10 @@ def map_subgroup_to_semester(subgroup_id: str):
     
     return None  # No known mapping
 
-def save_timetable(li, algorithm, current_user):
+def save_timetable(li, algorithm, current_user, run_stats=None):
     """
     Saves the timetable solution to the DB, mapped by semester.
+    run_stats (iterations, stop reason, ...) is stored with it as "run".
     
     Fix #1: only append each activity once per solution.
     Fix #2: remove the stray period in generate_timetable_code.
@@ -76,6 +112,10 @@ def save_timetable(li, algorithm, current_user):
         })
         return
 
+    # CO, BC and PSO return encoded solutions; build the session documents here
+    if isinstance(li, EncodedSolution):
+        li = li.decode()
+
     # List all valid semester codes you expect
     subgroups = [
         "SEM101", "SEM102", "SEM201", "SEM202",
@@ -127,7 +167,8 @@ def save_timetable(li, algorithm, current_user):
                 "code": generate_timetable_code(index, algorithm),
                 "algorithm": algorithm,
                 "semester": semester,
-                "timetable": activities
+                "timetable": activities,
+                "run": run_stats
             },
             upsert=True
         )
@@ -137,6 +178,7 @@ def save_timetable(li, algorithm, current_user):
             "algorithm": algorithm,
             "semester": semester,
             "timetable": activities,
+            "run": run_stats,
             "date_created": datetime.now()
         })
 
@@ -430,27 +472,13 @@ def store_latest_score(score, algorithm_name="unknown"):
         score: The score value to store
         algorithm_name: The name of the algorithm (CO, PSO, BCO, etc.)
     """
-    # Retrieve the current scores document
-    settings_doc = db["settings"].find_one({"option": "latest_score"})
-    
-    if settings_doc:
-        # Update existing document
-        current_values = settings_doc.get("value", {})
-        if algorithm_name in current_values:
-            current_values[algorithm_name].append(score)
-        else:
-            current_values[algorithm_name] = [score]
-            
-        db["settings"].update_one(
-            {"option": "latest_score"},
-            {"$set": {"value": current_values}}
-        )
-    else:
-        # Create new document with initial value
-        db["settings"].insert_one({
-            "option": "latest_score", 
-            "value": {algorithm_name: [score]}
-        })
+    # One atomic update: solvers of a job finish in parallel processes, and a
+    # read-modify-write of "value" would drop the score of whichever wrote first
+    db["settings"].update_one(
+        {"option": "latest_score"},
+        {"$push": {f"value.{algorithm_name}": score}},
+        upsert=True
+    )
     
     # Also store in historical collection for tracking
     db["old_scores"].insert_one({
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from models.user_model import User, UserCreate, LoginModel
 from utils.database import db
+from generator.data_collector import invalidate_snapshot
 from passlib.context import CryptContext
 from typing import List
 from utils.jwt_util import create_access_token, verify_access_token
@@ -46,6 +47,7 @@ async def register_user(user: UserCreate):
     user_dict = user.dict()
     user_dict["hashed_password"] = hash_password(user_dict.pop("password"))
     result = db["Users"].insert_one(user_dict)
+    invalidate_snapshot()
     x = db["Users"].find_one({"_id": result.inserted_id })
     if not x:
         raise HTTPException(status_code=500, detail="Failed to create user.")
@@ -79,6 +81,7 @@ async def delete_faculty(faculty_id: str, current_user: dict = Depends(get_curre
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Permission denied")
     result = db["Users"].delete_one({"id": faculty_id})
+    invalidate_snapshot()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Faculty member not found")
     return {"message": "Faculty member deleted successfully"}
@@ -112,6 +115,7 @@ async def update_user(user_id: str, updated_user: UserCreate, current_user: dict
             raise HTTPException(status_code=400, detail="Invalid semester specified")
         
     result = db["Users"].update_one({"id": user_id}, {"$set": updated_data})
+    invalidate_snapshot()
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return db["Users"].find_one({"id": user_id})
@@ -121,6 +125,7 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Permission denied")
     result = db["Users"].delete_one({"id": user_id})
+    invalidate_snapshot()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
@@ -147,6 +152,7 @@ async def add_subjects(user_id: str, subjects: List[str], current_user: dict = D
 
     updated_subjects = set(user.get("subjects", [])) | set(subjects)
     db["Users"].update_one({"id": user_id}, {"$set": {"subjects": list(updated_subjects)}})
+    invalidate_snapshot()
     return {"message": "Subjects added successfully", "subjects": list(updated_subjects)}
 
 @router.delete("/{user_id}/subjects/{subject_code}")
@@ -162,6 +168,7 @@ async def remove_subject(user_id: str, subject_code: str, current_user: dict = D
 
     updated_subjects = [subj for subj in user.get("subjects", []) if subj != subject_code]
     db["Users"].update_one({"id": user_id}, {"$set": {"subjects": updated_subjects}})
+    invalidate_snapshot()
     return {"message": f"Subject {subject_code} removed successfully", "subjects": updated_subjects}
 
 @router.put("/{user_id}/target_hours")
@@ -176,6 +183,7 @@ async def update_target_hours(user_id: str, target_hours: int, current_user: dic
         raise HTTPException(status_code=400, detail="Only faculty members can have target hours")
 
     db["Users"].update_one({"id": user_id}, {"$set": {"target_hours": target_hours}})
+    invalidate_snapshot()
     return {"message": f"Target hours updated successfully to {target_hours}"}
 
 #---------------------------------------------------------------------------------------------------------
@@ -193,6 +201,7 @@ async def assign_year_to_student(user_id: str, year: int, current_user: dict = D
     if not valid_year:
         raise HTTPException(status_code=400, detail="Invalid year")
     db["Users"].update_one({"id": user_id}, {"$set": {"year": year}})
+    invalidate_snapshot()
     return {"message": f"Year {year} assigned to user {user_id}"}
 
 @router.delete("/users/{user_id}/year")
@@ -205,4 +214,5 @@ async def remove_year_from_student(user_id: str, current_user: dict = Depends(ge
     if user["role"] != "student":
         raise HTTPException(status_code=400, detail="Year can only be removed from students")
     db["Users"].update_one({"id": user_id}, {"$unset": {"year": ""}})
+    invalidate_snapshot()
     return {"message": f"Year removed from user {user_id}"}
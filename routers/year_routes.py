@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.year_model import Year, SubGroup
 from utils.database import db
+from generator.data_collector import invalidate_snapshot
 from typing import List
 from routers.user_router import get_current_user
 
@@ -29,6 +30,7 @@ async def add_year(year: Year, current_user: dict = Depends(get_current_user)):
             )
     year_dict = year.dict()
     db["Years"].insert_one(year_dict)
+    invalidate_snapshot()
     return year
 
 
@@ -50,6 +52,7 @@ async def update_year(year_name: int, updated_year: Year, current_user: dict = D
         raise HTTPException(status_code=404, detail="Year not found")
     
     result = db["Years"].update_one({"name": year_name}, {"$set": updated_year.dict()})
+    invalidate_snapshot()
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Year update failed")
     
@@ -69,6 +72,7 @@ async def delete_year(year_name: int, current_user: dict = Depends(get_current_u
     
     db["Users"].update_many({"year": year_name}, {"$unset": {"year": ""}})
     result = db["Years"].delete_one({"name": year_name})
+    invalidate_snapshot()
     if result.deleted_count == 0:
         raise HTTPException(status_code=500, detail="Failed to delete year")
     
@@ -98,6 +102,7 @@ async def add_subgroup(year_name: int, subgroup: SubGroup, current_user: dict =
     year_obj = Year(**year)
     year_obj.subgroups.append(subgroup)
     db["Years"].update_one({"name": year_name}, {"$set": {"subgroups": [sg.dict() for sg in year_obj.subgroups]}})
+    invalidate_snapshot()
     return year_obj
 
 
@@ -123,6 +128,7 @@ async def update_subgroup(year_name: int, subgroup_code: str, updated_subgroup:
         raise HTTPException(status_code=400, detail="Total subgroup capacity exceeds the year's total capacity")
     
     db["Years"].update_one({"name": year_name}, {"$set": {"subgroups": [sg.dict() for sg in year_obj.subgroups]}})
+    invalidate_snapshot()
     return year_obj
 
 
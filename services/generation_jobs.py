@@ -0,0 +1,233 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Manager
+
+MAX_CONCURRENT_JOBS = 2
+ALGORITHMS = ["CO", "BC", "PSO", "GA", "RL", "SA", "TS"]  # every algorithm a job can run
+ENABLED_ALGORITHMS = ["CO", "BC", "PSO"]  # run by default; add "GA" / "RL" / "SA" / "TS" to run them as well
+POOLED_ALGORITHMS = ["CO", "PSO", "GA"]  # algorithms that spread their work over cpu_share processes
+TIME_LIMIT = None       # seconds each algorithm may run; None runs every iteration
+MAX_EVALUATIONS = None  # candidate evaluations each algorithm may spend; None for no limit
+EARLY_STOPPING = {"patience": 3}  # EarlyStopping settings (patience, soft_target, lower_bound)
+LNS_ALGORITHMS = []  # algorithms whose best timetable is post-optimized with LNS, e.g. ["CO", "PSO"]
+
+_lock = threading.Lock()
+_executor = None
+_manager = None
+_progress = None   # job_id (and "job_id:algorithm") -> status dict, written by the job processes
+_cancelled = None  # job_id -> True once cancellation was requested
+_futures = {}      # job_id -> Future of the job process
+
+class GenerationCancelled(Exception):
+    """
+    Raised inside a job when its cancellation was requested.
+    """
+
+def _shared():
+    global _executor, _manager, _progress, _cancelled
+    with _lock:
+        if _executor is None:
+            _manager = Manager()
+            _progress = _manager.dict()
+            _cancelled = _manager.dict()
+            _executor = ProcessPoolExecutor(max_workers=MAX_CONCURRENT_JOBS)
+    return _executor, _progress, _cancelled
+
+def _update(progress, key, **fields):
+    status = dict(progress.get(key, {}))
+    status.update(fields)
+    progress[key] = status
+
+def _run_solver(code, snapshot, report, cpu_share, time_limit=None, max_evaluations=None, stopping=None,
+                warm_start=None):
+    """
+    Run one algorithm on a loaded snapshot and return its timetable and run
+    statistics (iterations completed, stop reason, ...). warm_start is the
+    stored timetable to seed CO, BC, PSO, GA, SA and TS from; RL always
+    starts cold.
+    """
+    if code == "CO":
+        from generator.algorithms.co.co_v2 import AntColonySolver
+        solver = AntColonySolver(on_iteration=report)
+        solver.get_data(snapshot)
+        return solver.run(cpu_share, time_limit, max_evaluations, stopping, warm_start), solver.stats
+    if code == "BC":
+        from generator.algorithms.bc.bc_v1 import BeeColonySolver
+        solver = BeeColonySolver(on_iteration=report)
+        solver.get_data(snapshot)
+        return solver.run(time_limit, max_evaluations, stopping, warm_start), solver.stats
+    if code == "PSO":
+        from generator.algorithms.pso.pso_v1 import ParticleSwarmSolver
+        solver = ParticleSwarmSolver(on_iteration=report)
+        solver.get_data(snapshot)
+        return solver.run(cpu_share, time_limit, max_evaluations, stopping, warm_start), solver.stats
+    if code == "SA":
+        from generator.algorithms.sa.sa_v1 import SimulatedAnnealingSolver
+        solver = SimulatedAnnealingSolver(on_iteration=report)
+        solver.get_data(snapshot)
+        return solver.run(time_limit, max_evaluations, stopping, warm_start), solver.stats
+    if code == "TS":
+        from generator.algorithms.ts.ts_v1 import TabuSearchSolver
+        solver = TabuSearchSolver(on_iteration=report)
+        solver.get_data(snapshot)
+        return solver.run(time_limit, max_evaluations, stopping, warm_start), solver.stats
+    if code == "GA":
+        from generator.algorithms.ga.ga import generate_ga, run_stats
+        return generate_ga(snapshot, cpu_share, time_limit, max_evaluations, stopping, warm_start)[3], dict(run_stats)
+    if code == "RL":
+        from generator.algorithms.rl.rl import generate_rl
+        return generate_rl(snapshot, time_limit, max_evaluations), {}
+    raise ValueError(f"Unknown algorithm {code}")
+
+def run_algorithm(job_id, code, snapshot, cpu_share, current_user, progress, cancelled, time_limit=None,
+                  warm_start=None, lns=False):
+    """
+    Run one algorithm of a job in its own process and store its timetable
+    with save_timetable as soon as it finishes. With lns the timetable is
+    first improved by the LNS post-optimizer; its stats go under "lns".
+    """
+    from routers.timetable_routes import save_timetable
+    from generator.stopping import EarlyStopping
+    key = f"{job_id}:{code}"
+
+    def report(iteration, best_score):
+        if job_id in cancelled:
+            raise GenerationCancelled()
+        _update(progress, key, iteration=iteration, best_score=best_score)
+
+    _update(progress, key, status="running", started_at=time.time())
+    try:
+        solution, stats = _run_solver(code, snapshot, report, cpu_share, time_limit, MAX_EVALUATIONS,
+                                      EarlyStopping(**EARLY_STOPPING), warm_start)
+        if job_id in cancelled:
+            # GA and RL have no iteration hook; drop their result instead
+            raise GenerationCancelled()
+        if lns:
+            from generator.algorithms.lns.lns import optimize_lns
+            from generator.repair import load_problem
+            from generator.solution import EncodedSolution
+            _update(progress, key, status="post-optimizing")
+            # GA and RL return item dicts, built on their own copy of the snapshot
+            problem = None if isinstance(solution, EncodedSolution) else load_problem(snapshot)
+            solution, stats["lns"] = optimize_lns(solution, problem)
+        save_timetable(solution, code, current_user, stats)
+        _update(progress, key, status="completed", finished_at=time.time(),
+                iterations=stats.get("iterations"), stop_reason=stats.get("stop_reason"))
+    except GenerationCancelled:
+        _update(progress, key, status="cancelled", finished_at=time.time())
+    except Exception as e:
+        _update(progress, key, status="failed", error=str(e), finished_at=time.time())
+        raise
+
+def run_generation_job(job_id, current_user, progress, cancelled, time_limit=None, warm_start=None,
+                       lns=LNS_ALGORITHMS, algorithms=ENABLED_ALGORITHMS):
+    """
+    Body of a generation job, run in a pool process. The data is loaded once
+    and the listed algorithms run on it at the same time, each in its own process.
+    warm_start names the stored timetable to seed the solvers from (see
+    load_stored_timetable); it is loaded once with the data. The algorithms
+    listed in lns get the LNS post-optimizer.
+    """
+    from generator.data_collector import load_snapshot
+    from generator.warm_start import load_stored_timetable
+    _update(progress, job_id, status="running", started_at=time.time())
+    codes = list(algorithms)
+    try:
+        snapshot = load_snapshot()
+        stored = load_stored_timetable(warm_start) if warm_start else None
+        # The pooled algorithms split the cores the other algorithms leave free
+        pooled = [code for code in codes if code in POOLED_ALGORITHMS]
+        free = (os.cpu_count() or 1) - len(codes) + len(pooled)
+        cpu_share = max(1, free // max(1, len(pooled)))
+        with ProcessPoolExecutor(max_workers=len(codes)) as pool:
+            futures = [
+                pool.submit(run_algorithm, job_id, code, snapshot, cpu_share, current_user, progress, cancelled,
+                            time_limit, stored, code in lns)
+                for code in codes
+            ]
+            errors = [f.exception() for f in as_completed(futures)]
+    except Exception as e:
+        _update(progress, job_id, status="failed", error=str(e), finished_at=time.time())
+        raise
+    if job_id in cancelled:
+        status = "cancelled"
+    elif any(errors):
+        status = "failed"
+    else:
+        status = "completed"
+    _update(progress, job_id, status=status, finished_at=time.time())
+
+def submit_generation(current_user, time_limit=TIME_LIMIT, warm_start=None, lns=None, algorithms=None):
+    """
+    Queue a generation job and return its id. With a time_limit (seconds)
+    every algorithm returns its best timetable once that time is up. With
+    warm_start ("published", an algorithm or a timetable code) the solvers
+    start from that stored timetable instead of from scratch. lns lists the
+    algorithms to post-optimize (LNS_ALGORITHMS by default) and algorithms
+    the ones to run (ENABLED_ALGORITHMS by default).
+    """
+    executor, progress, cancelled = _shared()
+    job_id = uuid.uuid4().hex
+    lns = list(LNS_ALGORITHMS if lns is None else lns)
+    algorithms = list(ENABLED_ALGORITHMS if not algorithms else algorithms)
+    progress[job_id] = {
+        "status": "queued",
+        "algorithms": algorithms,
+        "time_limit": time_limit,
+        "warm_start": warm_start,
+        "lns": lns,
+        "created_at": time.time(),
+    }
+    user = {"id": current_user["id"]}  # save_timetable only needs the recipient id
+    _futures[job_id] = executor.submit(run_generation_job, job_id, user, progress, cancelled, time_limit,
+                                       warm_start, lns, algorithms)
+    return job_id
+
+def get_job(job_id):
+    """
+    Status of a job, or None if the id is unknown. Each algorithm reports its
+    own status, iteration and best score, and once finished the iterations it
+    completed and why it stopped; best_score is the best of them.
+    """
+    if job_id not in _futures:
+        return None
+    _, progress, _ = _shared()
+    job = dict(progress.get(job_id, {}))
+    if _futures[job_id].cancelled():
+        job["status"] = "cancelled"
+    now = time.time()
+    algorithms = {}
+    for code in job.get("algorithms", []):
+        status = dict(progress.get(f"{job_id}:{code}", {"status": "queued"}))
+        if "started_at" in status:
+            status["elapsed"] = status.get("finished_at", now) - status["started_at"]
+        algorithms[code] = status
+    scores = [a["best_score"] for a in algorithms.values() if a.get("best_score") is not None]
+    started = job.get("started_at")
+    return {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "best_score": min(scores) if scores else None,
+        "elapsed": job.get("finished_at", now) - started if started is not None else 0,
+        "time_limit": job.get("time_limit"),
+        "warm_start": job.get("warm_start"),
+        "lns": job.get("lns"),
+        "algorithms": algorithms,
+        "error": job.get("error"),
+    }
+
+def cancel_job(job_id):
+    """
+    Request cancellation of a job. Queued jobs never start; running jobs stop
+    at the end of their current iteration. Returns False if the id is unknown.
+    """
+    if job_id not in _futures:
+        return False
+    _, progress, cancelled = _shared()
+    cancelled[job_id] = True
+    if _futures[job_id].cancel():
+        _update(progress, job_id, status="cancelled")
+    return True
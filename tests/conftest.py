@@ -0,0 +1,37 @@
+import pytest
+from generator.problem import ProblemInstance
+
+@pytest.fixture
+def problem():
+    days = [{"_id": f"d{i}", "name": name} for i, name in enumerate(["Monday", "Tuesday"])]
+    periods = [{"_id": f"p{i}", "name": f"P{i + 1}", "index": i, "is_interval": False} for i in range(4)]
+    spaces = [
+        {"code": "LH1", "name": "Lecture Hall 1", "capacity": 120, "attributes": {}},
+        {"code": "LAB1", "name": "Lab 1", "capacity": 40, "attributes": {"computers": "Yes"}},
+    ]
+    activities = [
+        {"code": "AC-1", "name": "Lecture", "subject": "IT101", "type": "Lecture+Tutorial", "duration": 2,
+         "teacher_ids": ["FA0001"], "subgroup_ids": ["Y1S1.1"], "space_requirements": []},
+        {"code": "AC-2", "name": "Lab", "subject": "IT102", "type": "Lab", "duration": 2,
+         "teacher_ids": ["FA0002"], "subgroup_ids": ["Y1S1.2"], "space_requirements": []},
+    ]
+    return ProblemInstance(days, periods, spaces, activities)
+
+@pytest.fixture
+def rl_item(problem):
+    """
+    Builds scheduled items shaped like the ones generate_rl returns.
+    """
+    def build(code, day, periods, room, teacher, subgroup):
+        activity = problem.activities[problem.activity_index[code]]
+        return {
+            "activity": code,
+            "day": problem.days[day],
+            "period": [problem.periods[p] for p in periods],
+            "room": problem.rooms[problem.room_index[room]],
+            "teacher": teacher,
+            "subgroup": subgroup,
+            "duration": activity["duration"],
+            "subject": activity["subject"],
+        }
+    return build
@@ -0,0 +1,13 @@
+from generator.algorithms.lns.lns import optimize_lns
+from generator.solution import EncodedSolution
+
+def test_optimize_lns_takes_rl_items(problem, rl_item):
+    items = [
+        rl_item("AC-1", 0, [0, 1], "LH1", "FA0001", "Y1S1.1"),
+        rl_item("AC-2", 1, [3, 0], "LAB1", "FA0002", "Y1S1.2"),  # wraps around the end of the day
+    ]
+    solution, stats = optimize_lns(items, problem, time_limit=None, max_evaluations=200)
+    assert isinstance(solution, EncodedSolution)
+    assert stats["dropped_sessions"] == 1
+    assert stats["score_after"] <= stats["score_before"]
+    assert problem.activity_index["AC-1"] in solution.sessions["activity"].tolist()
@@ -0,0 +1,18 @@
+from generator.solution import encode_solution, item_resolves
+from generator.algorithms.eval.eval import timetable_breakdown
+
+def test_rl_items_resolve_and_encode(problem, rl_item):
+    item = rl_item("AC-1", 0, [1, 2], "LH1", "FA0001", "Y1S1.1")
+    assert item_resolves(problem, item)
+    sessions = encode_solution(problem, [item])
+    assert sessions["activity"].tolist() == [problem.activity_index["AC-1"]]
+    assert sessions["length"].tolist() == [2]
+
+def test_wrapped_and_unknown_rl_items_are_stale(problem, rl_item):
+    kept = rl_item("AC-1", 0, [0, 1], "LH1", "FA0001", "Y1S1.1")
+    wrapped = rl_item("AC-2", 1, [3, 0], "LAB1", "FA0002", "Y1S1.2")
+    deleted = dict(rl_item("AC-2", 1, [0, 1], "LAB1", "FA0002", "Y1S1.2"), activity="AC-9")
+    assert not item_resolves(problem, wrapped)
+    assert not item_resolves(problem, deleted)
+    breakdown = timetable_breakdown(problem, {"timetable": [kept, wrapped, deleted]})
+    assert breakdown["stale_sessions"] == 2